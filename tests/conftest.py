@@ -128,7 +128,9 @@ def httpd_server():
 
 @pytest.fixture(scope="session")
 def httpd_server_base(httpd_server: HTTPServer) -> str:
-    return f"http://{httpd_server.server_name}:{httpd_server.server_port}/"
+    # not the server_name, which takes a (dns) lookup of the fqdn
+    host = HTTPD_HOST or "localhost"
+    return f"http://{host}:{httpd_server.server_port}/"
 
 
 @pytest.fixture(scope="session")
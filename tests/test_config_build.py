@@ -5,6 +5,7 @@ from util4tests import run_single_test
 
 from travharv.config_build import (
     AssertPath,
+    AssertPathSet,
     LiteralSubjectDefinition,
     SPARQLSubjectDefinition,
     TravHarvConfigBuilder,
@@ -108,6 +109,32 @@ def test_assert_path():
     )
 
 
+def test_assert_path_trie():
+    NSM = makeNSM(yml_pfx_declarations)
+
+    assert_path_set = AssertPathSet(
+        NSM,
+        [
+            "ex:isPartOf/schema:geo/schema:latitude",
+            "ex:isPartOf/schema:geo/schema:longitude",
+            "ex:isPartOf",
+        ],
+    )
+    trie = assert_path_set.trie
+    assert trie.get_max_size() == 3
+    assert trie.assert_paths == assert_path_set.list_assertion_paths()
+
+    # the shared hops are only in there once
+    assert list(trie.children) == ["<https://example.org/isPartOf>"]
+    part_of = trie.children["<https://example.org/isPartOf>"]
+    assert len(part_of.assert_paths) == 3
+    geo = part_of.children["<https://schema.org#geo>"]
+    assert list(geo.children) == [
+        "<https://schema.org#latitude>",
+        "<https://schema.org#longitude>",
+    ]
+
+
 @pytest.mark.usefixtures("decorated_rdf_stores", "sample_file_graph")
 def test_travharvconfig(decorated_rdf_stores, sample_file_graph):
     for rdf_store in decorated_rdf_stores:
@@ -1,23 +1,117 @@
 #!/usr/bin/env python
+from functools import partial
+from http.server import HTTPServer, SimpleHTTPRequestHandler
+from pathlib import Path
+from threading import Thread
+
 import pytest
-from conftest import TEST_CONFIG_FOLDER
+from conftest import HTTPD_EXTENSION_MAP, TEST_CONFIG_FOLDER
+from pyrdfstore import create_rdf_store
 from util4tests import run_single_test
 
 from travharv.config_build import TravHarvConfigBuilder
 from travharv.executor import TravHarvExecutor
+from travharv.helper import Deadline
+from travharv.store import RDFStoreAccess
+from travharv.web_discovery import WebFetcher
 
+# paths over the documents served from tests/scenarios/input,
+# sharing their first hop (and passing through blank nodes)
+FRONTIER_CONFIG = """
+snooze-till-graph-age-minutes: 0
+prefix:
+  ex: http://www.example.org/
+assert:
+  - subjects:
+      literal:
+        - {base}DOC1.ttl
+    paths:
+      - "ex:resource / ex:subset / ex:id"
+      - "ex:resource / ex:part / ex:id"
+      - "ex:resource / ex:p4"
+      - "ex:resource / ex:missing"
+"""
 
-@pytest.mark.usefixtures("decorated_rdf_stores")
-def test_travharv_executor(decorated_rdf_stores):
+# as good_folder/base_test.yml, over the documents served
+# from tests/scenarios/input
+EXECUTOR_CONFIG = """
+snooze-till-graph-age-minutes: 0
+prefix:
+  ex: http://www.example.org/
+assert:
+  - subjects:
+      literal:
+        - {base}DOC1.ttl
+    paths:
+      - "ex:resource"
+      - "ex:resource / ex:subset / ex:id"
+  - subjects:
+      SPARQL: >
+        SELECT ?s
+        WHERE {{
+            ?s a ex:Blue .
+        }}
+    paths:
+      - "ex:part / ex:id"
+"""
+
+# two subjects, the document of the first one
+# also holding the path of the second one
+SATISFIED_CONFIG = """
+snooze-till-graph-age-minutes: 0
+prefix:
+  ex: http://www.example.org/
+assert:
+  - subjects:
+      literal:
+        - {base}a.ttl
+        - {base}b.ttl
+    paths:
+      - "ex:p"
+"""
+SATISFIED_DOCS = {
+    "a.ttl": "<a.ttl> <http://www.example.org/p> <c.ttl> .\n"
+    "<b.ttl> <http://www.example.org/p> <d.ttl> .",
+    "b.ttl": "<b.ttl> <http://www.example.org/q> <c.ttl> .",
+    "c.ttl": "<c.ttl> <http://www.example.org/q> <a.ttl> .",
+    "d.ttl": "<d.ttl> <http://www.example.org/q> <a.ttl> .",
+}
+
+
+class DocsRequestHandler(SimpleHTTPRequestHandler):
+    extensions_map = HTTPD_EXTENSION_MAP
+
+    def do_GET(self):
+        self.server.paths.append(self.path)
+        super().do_GET()
+
+
+@pytest.fixture()
+def docs_base(tmp_path: Path):
+    for name, doc in SATISFIED_DOCS.items():
+        (tmp_path / name).write_text(doc)
+    handler = partial(DocsRequestHandler, directory=str(tmp_path))
+    with HTTPServer(("localhost", 0), handler) as httpd:
+        httpd.paths = []
+        Thread(target=httpd.serve_forever, daemon=True).start()
+        yield f"http://localhost:{httpd.server_port}/", httpd.paths
+        httpd.shutdown()
+
+
+@pytest.mark.usefixtures("decorated_rdf_stores", "httpd_server_base")
+def test_travharv_executor(decorated_rdf_stores, httpd_server_base, tmp_path):
+    (tmp_path / "executor.yml").write_text(
+        EXECUTOR_CONFIG.format(base=httpd_server_base)
+    )
     for rdf_store in decorated_rdf_stores:
         # first make travharv_config_builder
         travharvconfigbuilder = TravHarvConfigBuilder(
             rdf_store,
-            str(TEST_CONFIG_FOLDER / "good_folder"),
+            str(tmp_path),
         )
 
         travharvobject = travharvconfigbuilder.build_from_config(
-            "base_test.yml"
+            "executor.yml"
         )
 
         # extract values from travharvobject and pass them to travharvexecutor
@@ -29,5 +123,168 @@ def test_travharv_executor(decorated_rdf_stores):
         ).assert_all_paths()
 
 
+@pytest.mark.usefixtures("decorated_rdf_stores", "httpd_server_base")
+def test_travharv_executor_jobs(
+    decorated_rdf_stores, httpd_server_base, tmp_path
+):
+    (tmp_path / "executor.yml").write_text(
+        EXECUTOR_CONFIG.format(base=httpd_server_base)
+    )
+    for rdf_store in decorated_rdf_stores:
+        travharvconfigbuilder = TravHarvConfigBuilder(
+            rdf_store,
+            str(tmp_path),
+        )
+
+        travharvobject = travharvconfigbuilder.build_from_config(
+            "executor.yml"
+        )
+
+        executor = TravHarvExecutor(
+            travharvobject.configname,
+            travharvobject.NSM,
+            travharvobject.tasks,
+            rdf_store,
+            jobs=4,
+        )
+        executor.assert_all_paths()
+        # the literal task has 1 subject and 2 paths, each reported once
+        first_task_report = executor.execution_report.task_reports[0]
+        assert len(first_task_report.assertion_reports) == 2
+
+
+@pytest.mark.usefixtures("decorated_rdf_stores")
+def test_travharv_executor_deadline(decorated_rdf_stores):
+    for rdf_store in decorated_rdf_stores:
+        travharvconfigbuilder = TravHarvConfigBuilder(
+            rdf_store,
+            str(TEST_CONFIG_FOLDER / "good_folder"),
+        )
+
+        travharvobject = travharvconfigbuilder.build_from_config(
+            "base_test.yml"
+        )
+
+        executor = TravHarvExecutor(
+            travharvobject.configname,
+            travharvobject.NSM,
+            travharvobject.tasks,
+            rdf_store,
+            deadline=Deadline(0),
+        )
+        executor.assert_all_paths()
+        # nothing gets asserted, but all is reported as skipped
+        first_task_report = executor.execution_report.task_reports[0]
+        assert len(first_task_report.assertion_reports) == 2
+        for assertion_report in first_task_report.assertion_reports:
+            assert not assertion_report.assertion_result
+            assert assertion_report.message.startswith("Assertion skipped")
+            assert assertion_report.graph_reports == []
+
+
+def _frontier_executor(rdf_store, folder, base, max_fanout):
+    (folder / "frontier.yml").write_text(FRONTIER_CONFIG.format(base=base))
+    travharvobject = TravHarvConfigBuilder(
+        rdf_store, str(folder)
+    ).build_from_config("frontier.yml")
+    return TravHarvExecutor(
+        travharvobject.configname,
+        travharvobject.NSM,
+        travharvobject.tasks,
+        rdf_store,
+        fetcher=WebFetcher(total_retry=0),
+        traversal="frontier",
+        max_fanout=max_fanout,
+    )
+
+
+def _reports(executor):
+    task_report = executor.execution_report.task_reports[0]
+    return sorted(
+        task_report.assertion_reports, key=lambda report: report.assertion_path
+    )
+
+
+RESOURCE = "<http://www.example.org/resource>"
+SUBSET_ID = (
+    f"{RESOURCE}/<http://www.example.org/subset>/<http://www.example.org/id>"
+)
+PART_ID = (
+    f"{RESOURCE}/<http://www.example.org/part>/<http://www.example.org/id>"
+)
+P4 = f"{RESOURCE}/<http://www.example.org/p4>"
+
+
+@pytest.mark.usefixtures("httpd_server_base")
+def test_travharv_executor_frontier(httpd_server_base, tmp_path):
+    # a fresh store, so what gets reached does not depend on other tests
+    rdf_store = RDFStoreAccess(create_rdf_store())
+    executor = _frontier_executor(
+        rdf_store, tmp_path, httpd_server_base, max_fanout=100
+    )
+    executor.assert_all_paths()
+    # DOC1, the 5 resources it links to, and DOC4 and DOC6 at the ends
+    # of the paths, each dereferenced once however many paths pass
+    assert executor.fetcher.stats["requests"] == 8
+    reports = _reports(executor)
+    # each path reported, as far as it got
+    assert [
+        (report.assertion_path, report.assertion_result) for report in reports
+    ] == [
+        (RESOURCE, False),
+        (P4, True),
+        (PART_ID, True),
+        (SUBSET_ID, True),
+    ]
+    assert reports[0].message.startswith("Assertion failed")
+    # the graphs added for the subject are listed with each path
+    for report in reports:
+        assert len(report.graph_reports) == 8
+    executor.fetcher.close()
+
+
+@pytest.mark.usefixtures("httpd_server_base")
+def test_travharv_executor_frontier_fanout(httpd_server_base, tmp_path):
+    rdf_store = RDFStoreAccess(create_rdf_store())
+    executor = _frontier_executor(
+        rdf_store, tmp_path, httpd_server_base, max_fanout=2
+    )
+    executor.assert_all_paths()
+    # only DOC2 and DOC3 get followed from DOC1, leading to DOC4
+    assert executor.fetcher.stats["requests"] == 4
+    assert [
+        (report.assertion_path, report.assertion_result)
+        for report in _reports(executor)
+    ] == [
+        (RESOURCE, False),
+        (RESOURCE, False),
+        (RESOURCE, False),
+        (SUBSET_ID, True),
+    ]
+    executor.fetcher.close()
+
+
+def test_travharv_executor_verified_batch_refresh(docs_base, tmp_path):
+    base, paths = docs_base
+    config = tmp_path / "config"
+    config.mkdir()
+    (config / "satisfied.yml").write_text(SATISFIED_CONFIG.format(base=base))
+    rdf_store = RDFStoreAccess(create_rdf_store())
+    travharvobject = TravHarvConfigBuilder(
+        rdf_store, str(config)
+    ).build_from_config("satisfied.yml")
+    with TravHarvExecutor(
+        travharvobject.configname,
+        travharvobject.NSM,
+        travharvobject.tasks,
+        rdf_store,
+    ) as executor:
+        executor.assert_all_paths()
+    # the batch was verified before a.ttl got inserted, which satisfies
+    # the path of b.ttl: so its end d.ttl is harvested right away,
+    # instead of after b.ttl itself (as for an unsatisfied path)
+    assert paths == ["/a.ttl", "/c.ttl", "/d.ttl", "/b.ttl"]
+
+
 if __name__ == "__main__":
     run_single_test(__file__)
@@ -7,8 +7,10 @@ from util4tests import run_single_test
 from travharv.__main__ import load_resource_into_graph
 
 
-def test_insert_resource_into_graph_uri():
-    uri = "https://www.w3.org/People/Berners-Lee/card.ttl"
+@pytest.mark.usefixtures("httpd_server")
+def test_insert_resource_into_graph_uri(httpd_server):
+    # the ip, as validators does not take localhost for an url
+    uri = f"http://127.0.0.1:{httpd_server.server_port}/DOC1.ttl"
     graph = load_resource_into_graph(Graph(), uri, format="text/turtle")
     assert isinstance(graph, Graph)
     assert len(graph) > 0
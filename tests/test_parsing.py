@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+from io import BytesIO
+
+import pytest
+from conftest import TEST_INPUT_FOLDER
+from rdflib import Graph, URIRef
+from rdflib.compare import isomorphic
+from util4tests import run_single_test
+
+from travharv.parsing import ParserPool, parse_into, parse_triples
+
+NQUADS = b"""<urn:a> <urn:p> "x"@en <urn:g1> .
+_:b <urn:p> "1"^^<http://www.w3.org/2001/XMLSchema#integer> <urn:g2> .
+_:b <urn:q> "plain" .
+"""
+
+RELATIVE = b"""@prefix ex: <https://example.org/> .
+<a> ex:p <b> ; ex:label "colour"@en .
+"""
+BASE = "https://example.org/doc"
+
+
+def test_parse_triples():
+    path = TEST_INPUT_FOLDER / "63523.ttl"
+    triples = parse_triples(path, "turtle")
+    assert len(triples) == len(Graph().parse(str(path), format="turtle"))
+
+
+@pytest.mark.parametrize(
+    "name", ["63523.ttl", "P01_2012_01_01_00_00_00_2012_12_31_00_00_00(1).ttl"]
+)
+def test_native_parsers(name: str):
+    pytest.importorskip("pyoxigraph")
+    path = TEST_INPUT_FOLDER / name
+    expected = parse_into(Graph(), path, "turtle", backend="rdflib")
+    graph = parse_into(Graph(), path, "turtle", backend="oxigraph")
+    assert isomorphic(graph, expected)
+    # and the same triples again as n-triples
+    ntriples = expected.serialize(format="nt", encoding="utf-8")
+    graph = parse_into(Graph(), ntriples, "application/n-triples")
+    assert isomorphic(graph, expected)
+
+
+@pytest.mark.parametrize("backend", ["rdflib", "auto"])
+def test_parse_relative_iris(backend: str, tmp_path):
+    path = tmp_path / "relative.ttl"
+    path.write_bytes(RELATIVE)
+    cases = [
+        (path, None, dict(source=str(path))),
+        (RELATIVE, BASE, dict(data=RELATIVE, publicID=BASE)),
+        # no base to resolve against natively, parsed again by rdflib
+        (RELATIVE, None, dict(data=RELATIVE)),
+        (BytesIO(RELATIVE), None, dict(data=RELATIVE)),
+    ]
+    for source, public_id, expected in cases:
+        graph = parse_into(Graph(), source, "turtle", public_id, backend)
+        expected = Graph().parse(format="turtle", **expected)
+        assert set(graph) == set(expected)
+
+
+@pytest.mark.parametrize("backend", ["rdflib", "auto"])
+def test_parse_language_tags(backend: str):
+    content = RELATIVE.replace(b"@en", b"@en-GB")
+    graph = parse_into(Graph(), content, "turtle", BASE, backend)
+    # the case is kept, where the native parsers lowercase it
+    (label,) = graph.objects(predicate=URIRef("https://example.org/label"))
+    assert label.language == "en-GB"
+
+
+@pytest.mark.parametrize("backend", ["rdflib", "auto"])
+def test_parse_nquads(backend: str):
+    # the graph names are dropped
+    graph = parse_into(Graph(), NQUADS, "nquads", backend=backend)
+    assert len(graph) == 3
+    assert len(set(graph.subjects())) == 2
+
+
+def test_parser_pool():
+    path = TEST_INPUT_FOLDER / "63523.ttl"
+    expected = Graph().parse(str(path), format="turtle")
+    pool = ParserPool(workers=2, min_bytes=0)
+    for source in [path, path.read_bytes(), BytesIO(path.read_bytes())]:
+        graph = pool.parse(Graph(), source, "turtle", "urn:test")
+        assert len(graph) == len(expected)
+    document = {"@id": "https://example.org/x", "@type": "urn:Thing"}
+    graph = pool.parse(Graph(), document, "json-ld")
+    assert len(graph) == 1
+    pool.close()
+
+    # small sources and no workers: parsed in the calling thread
+    pool = ParserPool(workers=0)
+    graph = pool.parse(Graph(), path, "turtle")
+    assert len(graph) == len(expected)
+
+    with pytest.raises(ValueError):
+        ParserPool(backend="raptor")
+
+
+if __name__ == "__main__":
+    run_single_test(__file__)
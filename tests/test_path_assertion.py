@@ -1,11 +1,15 @@
 #!/usr/bin/env python
+import logging
+
 import pytest
-from rdflib import URIRef
+from pyrdfstore import RDFStore, create_rdf_store
+from rdflib import Graph, URIRef
 from rdflib.query import ResultRow
 from util4tests import run_single_test
 
 from travharv.config_build import AssertPath
 from travharv.path_assertion import SubjPropPathAssertion
+from travharv.store import SUBJECT_PLACEHOLDER, PathQuery, RDFStoreAccess
 
 
 @pytest.mark.usefixtures("decorated_rdf_stores")
@@ -70,5 +74,190 @@ def test_subject_str_check(decorated_rdf_stores):
         )
 
 
+@pytest.mark.usefixtures("decorated_rdf_stores")
+def test_select_objects_for_ppaths(decorated_rdf_stores):
+    subject = "http://example.org/subject"
+    graph = Graph()
+    graph.add(
+        (
+            URIRef(subject),
+            URIRef("http://example.org/a"),
+            URIRef("http://example.org/middle"),
+        )
+    )
+    paths = {
+        1: "<http://example.org/a>",
+        2: "<http://example.org/a> / <http://example.org/b>",
+    }
+
+    nsm = graph.namespace_manager
+
+    for rdf_store in decorated_rdf_stores:
+        rdf_store.insert(graph, "urn:test:ppaths")
+        assert rdf_store.select_objects_for_ppaths(subject, {}, nsm) == {}
+        # only the first step of the path is in the store
+        objects = rdf_store.select_objects_for_ppaths(subject, paths, nsm)
+        assert objects == {1: URIRef("http://example.org/middle")}
+
+
+@pytest.mark.usefixtures("decorated_rdf_stores")
+def test_select_objects_for_ppaths_batch(decorated_rdf_stores):
+    subjects = ["http://example.org/one", "http://example.org/two"]
+    graph = Graph()
+    graph.add(
+        (
+            URIRef(subjects[0]),
+            URIRef("http://example.org/a"),
+            URIRef("http://example.org/middle"),
+        )
+    )
+    graph.add(
+        (
+            URIRef("http://example.org/middle"),
+            URIRef("http://example.org/b"),
+            URIRef("http://example.org/end"),
+        )
+    )
+    paths = {
+        1: "<http://example.org/a>",
+        2: "<http://example.org/a> / <http://example.org/b>",
+    }
+    nsm = graph.namespace_manager
+
+    for rdf_store in decorated_rdf_stores:
+        rdf_store.insert(graph, "urn:test:ppaths-batch")
+        objects = rdf_store.select_objects_for_ppaths_batch(
+            subjects, paths, nsm
+        )
+        # every subject gets a result, satisfied or not
+        assert objects == {
+            subjects[0]: {
+                1: URIRef("http://example.org/middle"),
+                2: URIRef("http://example.org/end"),
+            },
+            subjects[1]: {},
+        }
+
+
+@pytest.mark.usefixtures("decorated_rdf_stores")
+def test_select_next_hops(decorated_rdf_stores):
+    subjects = ["http://example.org/one", "http://example.org/two"]
+    graph = Graph()
+    for part in ("first", "second"):
+        graph.add(
+            (
+                URIRef(subjects[0]),
+                URIRef("http://example.org/hasPart"),
+                URIRef(f"http://example.org/{part}"),
+            )
+        )
+    nsm = graph.namespace_manager
+
+    for rdf_store in decorated_rdf_stores:
+        rdf_store.insert(graph, "urn:test:next-hops")
+        next_hops = rdf_store.select_next_hops(
+            subjects, "<http://example.org/hasPart>", nsm
+        )
+        # all objects are reached, not only the first
+        assert sorted(next_hops[subjects[0]]) == [
+            URIRef("http://example.org/first"),
+            URIRef("http://example.org/second"),
+        ]
+        assert next_hops[subjects[1]] == []
+
+
+def test_path_query():
+    graph = Graph()
+    for name in ("one", "two"):
+        graph.add(
+            (
+                URIRef(f"http://example.org/{name}"),
+                URIRef("http://example.org/a"),
+                URIRef(f"http://example.org/{name}-a"),
+            )
+        )
+    path_query = PathQuery(
+        f"SELECT ?s ?o WHERE {{ VALUES ?s {{ <{SUBJECT_PLACEHOLDER}> }} "
+        "?s <http://example.org/a> ?o . }"
+    )
+    subjects = ["http://example.org/one", "http://example.org/two"]
+    assert f"<{subjects[0]}> <{subjects[1]}>" in path_query.text(subjects)
+
+    # the prepared query gets parsed once, then bound to other subjects
+    for bound in (subjects[:1], subjects):
+        rows = graph.query(path_query.prepared(bound))
+        assert sorted(str(row[1]) for row in rows) == sorted(
+            f"{subject}-a" for subject in bound
+        )
+        assert {str(row[0]) for row in graph.query(path_query.text(bound))}
+    assert graph.query(path_query.prepared([])).bindings == []
+
+
+def test_prepared_path_queries(store_info_sets):
+    subject = "http://example.org/subject"
+    graph = Graph()
+    graph.add(
+        (
+            URIRef(subject),
+            URIRef("http://example.org/a"),
+            URIRef("http://example.org/middle"),
+        )
+    )
+    nsm = graph.namespace_manager
+
+    for store_info in store_info_sets:
+        core = create_rdf_store(*store_info)
+        core.insert(graph, "urn:test:path-queries")
+        for prepared_queries in (False, True):
+            rdf_store = RDFStoreAccess(core, prepared_queries=prepared_queries)
+            assert rdf_store.verify_path(
+                subject, "<http://example.org/a>", nsm
+            )
+            assert not rdf_store.verify_path(
+                "http://example.org/other", "<http://example.org/a>", nsm
+            )
+            assert rdf_store.select_subjects_for_ppath(
+                subject, "<http://example.org/a>", nsm
+            ) == [URIRef("http://example.org/middle")]
+            assert rdf_store.select_objects_for_ppaths(
+                subject, {1: "<http://example.org/a>"}, nsm
+            ) == {1: URIRef("http://example.org/middle")}
+            assert rdf_store.select_next_hops(
+                [subject, "http://example.org/other"],
+                "<http://example.org/a>",
+                nsm,
+            ) == {
+                subject: [URIRef("http://example.org/middle")],
+                "http://example.org/other": [],
+            }
+            # rendered once for each template and path
+            assert len(rdf_store._path_queries) == 3
+
+
+def test_prepared_queries_support(caplog):
+    # memory stores evaluate with rdflib, so they take prepared queries
+    assert RDFStoreAccess(
+        create_rdf_store(), prepared_queries=True
+    ).prepared_queries
+
+    class RemoteStore(RDFStore):
+        def select(self, sparql, *args, **kwargs):
+            assert isinstance(sparql, str)
+            raise ConnectionError("no endpoint")
+
+    # other stores get the query text, decided once up front
+    with caplog.at_level(logging.WARNING):
+        rdf_store = RDFStoreAccess(RemoteStore(), prepared_queries=True)
+    assert not rdf_store.prepared_queries
+    assert "does not take prepared queries" in caplog.text
+    # their failures are not taken for missing support
+    with pytest.raises(ConnectionError):
+        rdf_store.verify_path(
+            "http://example.org/subject",
+            "<http://example.org/a>",
+            Graph().namespace_manager,
+        )
+
+
 if __name__ == "__main__":
     run_single_test(__file__)
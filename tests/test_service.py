@@ -5,6 +5,7 @@ import pytest
 from util4tests import run_single_test
 
 from travharv import TravHarv
+from travharv.web_discovery import WebFetcher
 
 
 @pytest.mark.usefixtures("store_info_sets")
@@ -48,5 +49,23 @@ def test_travharv(store_info_sets):
         assert not travharv.error_occurred
 
 
+def test_travharv_close(monkeypatch):
+    closed = list()
+    monkeypatch.setattr(WebFetcher, "close", lambda f: closed.append(f))
+    config = Path(__file__).parent / "config" / "base_test.yml"
+
+    # the fetcher the service created is released on leaving
+    with TravHarv(config, []) as travharv:
+        assert closed == []
+    assert closed == [travharv.fetcher]
+
+    # a given fetcher is left to its owner
+    closed.clear()
+    fetcher = WebFetcher()
+    with TravHarv(config, [], fetcher=fetcher):
+        pass
+    assert closed == []
+
+
 if __name__ == "__main__":
     run_single_test(__file__)
@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+import time
+
+from util4tests import run_single_test
+
+from travharv.throttle import (
+    CircuitBreaker,
+    CircuitBreakers,
+    HostScheduler,
+    HostThrottle,
+    parse_retry_after,
+)
+
+
+def test_parse_retry_after():
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("") is None
+    assert parse_retry_after("120") == 120.0
+    # a date in the past means no need to wait
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+    assert parse_retry_after("not a date") is None
+
+
+def test_host_throttle_aimd():
+    # no backoff, the pacing after a 429/503 is tested below
+    throttle = HostThrottle(
+        "example.org", rate=0, initial_window=4, backoff_factor=0
+    )
+
+    # healthy responses grow the window additively
+    for _ in range(8):
+        throttle.acquire()
+        throttle.release(200, 0.01)
+    assert 5 < throttle.window < 7
+
+    # a 429 shrinks it multiplicatively
+    window = throttle.window
+    throttle.acquire()
+    throttle.release(429, 0.01)
+    assert throttle.window == window * throttle.decrease_factor
+
+    # and never below a single request
+    for _ in range(10):
+        throttle.acquire()
+        throttle.release(503, 0.01)
+    assert throttle.window >= 1.0
+
+
+def test_host_throttle_backoff():
+    throttle = HostThrottle("example.org", rate=0, backoff_factor=0.2)
+
+    # a 429 without Retry-After holds back the next request
+    throttle.acquire()
+    throttle.release(429, 0.01)
+    start = time.monotonic()
+    throttle.acquire()
+    assert time.monotonic() - start >= 0.15
+    # doubling for each one in a row
+    throttle.release(503, 0.01)
+    start = time.monotonic()
+    throttle.acquire()
+    assert time.monotonic() - start >= 0.35
+    # a healthy response resets it
+    throttle.release(200, 0.01)
+    throttle.acquire()
+    throttle.release(429, 0.01)
+    start = time.monotonic()
+    throttle.acquire()
+    assert 0.15 <= time.monotonic() - start < 0.35
+    throttle.release(200, 0.01)
+
+    # a Retry-After is honoured as is
+    throttle.acquire()
+    throttle.release(429, 0.01, retry_after=0.5)
+    start = time.monotonic()
+    throttle.acquire()
+    assert time.monotonic() - start >= 0.45
+
+
+def test_host_scheduler():
+    scheduler = HostScheduler(initial_window=2, max_window=8)
+    throttle = scheduler.for_url("https://example.org/a")
+    assert throttle is scheduler.for_url("https://example.org/b")
+    assert throttle is not scheduler.for_url("https://example.com/a")
+    assert scheduler.windows() == {"example.org": 2, "example.com": 2}
+
+
+def test_circuit_breaker():
+    breaker = CircuitBreaker("example.org", failure_threshold=2, cooldown=0)
+    assert breaker.allow()
+    assert not breaker.record(False)
+    assert breaker.record(True) is False  # success resets the count
+    assert not breaker.record(False)
+    assert breaker.record(False)  # second failure in a row trips it
+    assert breaker.is_open
+
+    # after the cooldown a single probe gets through
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record(False)  # failing probe keeps it open
+    assert breaker.is_open
+    assert breaker.allow()
+    breaker.record(True)  # succeeding probe closes it
+    assert not breaker.is_open
+
+    breaker = CircuitBreaker("example.org", failure_threshold=1, cooldown=60)
+    breaker.record(False)
+    assert not breaker.allow()
+
+
+def test_circuit_breakers():
+    breakers = CircuitBreakers(failure_threshold=1)
+    breakers.for_url("https://example.org/a").record(False)
+    assert breakers.for_url("https://example.org/b").is_open
+    assert not breakers.for_url("https://example.com/a").is_open
+    assert breakers.open_hosts() == ["example.org"]
+
+
+if __name__ == "__main__":
+    run_single_test(__file__)
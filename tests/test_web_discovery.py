@@ -1,10 +1,42 @@
 #!/usr/bin/env python
+import asyncio
+import json
 import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from http.server import HTTPServer, SimpleHTTPRequestHandler
+from io import BytesIO, StringIO
+from pathlib import Path
+from threading import Thread
+from urllib.parse import urlparse
 
-from rdflib import Graph
+import pytest
+import requests
+from conftest import HTTPD_EXTENSION_MAP
+from rdflib import Graph, Literal, URIRef
 from util4tests import run_single_test
 
-from travharv.web_discovery import get_graph_for_format
+from travharv.throttle import CircuitBreakers
+from travharv.web_discovery import (
+    AsyncDereferencer,
+    ContextCache,
+    DereferenceMemo,
+    DereferenceResult,
+    HostFormatStats,
+    LocalMirrors,
+    LODAwareHTMLParser,
+    NegativeCache,
+    ResponseCache,
+    WebFetcher,
+    accept_header,
+    accept_key,
+    dereference,
+    get_graph_for_format,
+    inline_contexts,
+    signposting_links,
+)
 
 log = logging.getLogger(__name__)
 
@@ -36,6 +68,38 @@ test_cases = [
 ]
 
 
+# html pages linking to each other (a cycle) and to the same turtle
+LINKED_PAGES = {
+    "a.html": ["b.html", "c.html"],
+    "b.html": ["a.html", "d.ttl"],
+    "c.html": ["a.html", "b.html", "d.ttl"],
+}
+
+
+class RecordingRequestHandler(SimpleHTTPRequestHandler):
+    extensions_map = HTTPD_EXTENSION_MAP
+
+    def do_GET(self):
+        self.server.accepts.append((self.path, self.headers.get("Accept")))
+        super().do_GET()
+
+
+@pytest.fixture()
+def pages_base(tmp_path: Path):
+    for name, links in LINKED_PAGES.items():
+        head = "".join(
+            f'<link rel="describedby" href="{link}">' for link in links
+        )
+        (tmp_path / name).write_text(f"<html><head>{head}</head></html>")
+    (tmp_path / "d.ttl").write_text("<urn:d> <urn:p> <urn:o> .")
+    handler = partial(RecordingRequestHandler, directory=str(tmp_path))
+    with HTTPServer(("localhost", 0), handler) as httpd:
+        httpd.accepts = []
+        Thread(target=httpd.serve_forever, daemon=True).start()
+        yield f"http://localhost:{httpd.server_port}/", httpd.accepts
+        httpd.shutdown()
+
+
 def test_download_uri_cases():
     for case in test_cases:
         uri = case["uri"]
@@ -48,5 +112,552 @@ def test_download_uri_cases():
         # Add more assertions as needed
 
 
+@pytest.mark.usefixtures("httpd_server_base")
+def test_shared_fetcher(httpd_server_base: str):
+    fetcher = WebFetcher(pool_maxsize=2, total_retry=1)
+    for doc in ["DOC1.ttl", "DOC2.ttl", "DOC1.ttl"]:
+        graph = get_graph_for_format(
+            f"{httpd_server_base}{doc}",
+            formats=["text/turtle"],
+            fetcher=fetcher,
+        )
+        assert isinstance(graph, Graph)
+        assert len(graph) > 0
+    fetcher.close()
+
+
+@pytest.mark.usefixtures("httpd_server_base")
+def test_httpx_backend(httpd_server_base: str):
+    pytest.importorskip("httpx")
+    fetcher = WebFetcher(total_retry=1, backend="httpx")
+    assert "gzip" in fetcher.session.headers["Accept-Encoding"]
+    for doc in ["DOC1.ttl", "DOC2.ttl"]:
+        result = dereference(
+            f"{httpd_server_base}{doc}", ["text/turtle"], fetcher=fetcher
+        )
+        assert result.outcome == "ok"
+        assert len(result.graph) > 0
+    result = dereference(
+        f"{httpd_server_base}NOT-THERE.ttl", ["text/turtle"], fetcher=fetcher
+    )
+    assert result.outcome == "httpError"
+    fetcher.close()
+
+    with pytest.raises(ValueError):
+        WebFetcher(backend="pycurl")
+
+
+@pytest.mark.usefixtures("httpd_server_base")
+def test_async_dereferencer(httpd_server_base: str):
+    docs = [f"DOC{n}.ttl" for n in range(1, 9)]
+    uris = [f"{httpd_server_base}{doc}" for doc in docs]
+    dereferencer = AsyncDereferencer(max_concurrency=4, max_per_host=2)
+    results = dereferencer.dereference_all(uris, ["text/turtle"])
+    assert set(results.keys()) == set(uris)
+    for uri in uris:
+        assert isinstance(results[uri].graph, Graph)
+        assert len(results[uri].graph) > 0
+
+    # it runs its own loop, so not from within one
+    async def nested():
+        dereferencer.dereference_all(uris, ["text/turtle"])
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(nested())
+
+
+@pytest.mark.usefixtures("httpd_server_base")
+def test_private_fetchers_closed(httpd_server_base: str, monkeypatch):
+    closed = list()
+    monkeypatch.setattr(WebFetcher, "close", lambda f: closed.append(f))
+    uri = f"{httpd_server_base}DOC1.ttl"
+
+    # one created for the call itself, and closed after it
+    assert dereference(uri, ["text/turtle"]).graph is not None
+    assert len(closed) == 1
+
+    with AsyncDereferencer() as dereferencer:
+        dereferencer.dereference_all([uri], ["text/turtle"])
+    assert closed[1:] == [dereferencer.fetcher]
+
+    # a shared one is left to its owner
+    with AsyncDereferencer(WebFetcher()):
+        pass
+    assert len(closed) == 2
+
+
+class SlowFetcher(WebFetcher):
+    """keeps track of the max number of fetches in flight"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.in_flight = self.max_in_flight = 0
+        self._flight_lock = threading.Lock()
+
+    def fetch(self, *args, **kwargs):
+        with self._flight_lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            time.sleep(0.05)
+            return super().fetch(*args, **kwargs)
+        finally:
+            with self._flight_lock:
+                self.in_flight -= 1
+
+
+@pytest.mark.usefixtures("httpd_server_base")
+def test_async_dereferencer_shared_limits(httpd_server_base: str):
+    uris = [f"{httpd_server_base}DOC{n}.ttl" for n in range(1, 9)]
+    fetcher = SlowFetcher(total_retry=0)
+    dereferencer = AsyncDereferencer(fetcher, max_per_host=2)
+    # as the jobs do, each dereferencing from its own thread
+    with ThreadPoolExecutor(max_workers=3) as jobs:
+        for results in jobs.map(
+            lambda _: dereferencer.dereference_all(uris, ["text/turtle"]),
+            range(3),
+        ):
+            assert len(results) == len(uris)
+    assert fetcher.max_in_flight == 2
+    fetcher.close()
+
+
+@pytest.mark.usefixtures("httpd_server_base")
+def test_response_cache(httpd_server_base: str, tmp_path: Path):
+    cache = ResponseCache(tmp_path / "cache")
+    fetcher = WebFetcher(cache=cache)
+    uri = f"{httpd_server_base}DOC1.ttl"
+    lengths = [
+        len(get_graph_for_format(uri, ["text/turtle"], fetcher=fetcher))
+        for _ in range(3)
+    ]
+    assert lengths[0] > 0
+    assert lengths == [lengths[0]] * 3
+    # the test server honours If-Modified-Since, so all but the first hit
+    assert fetcher.stats["cacheHits"] == 2
+    # the formats asked for in another order still hit the same entry
+    formats = ["text/turtle", "application/ld+json"]
+    for order in (formats, formats[::-1]):
+        dereference(uri, order, fetcher=fetcher)
+    assert fetcher.stats["cacheHits"] == 3
+
+    # a cache too small to hold anything keeps nothing
+    tiny_cache = ResponseCache(tmp_path / "tiny", max_bytes=1)
+    tiny_fetcher = WebFetcher(cache=tiny_cache)
+    get_graph_for_format(uri, ["text/turtle"], fetcher=tiny_fetcher)
+    assert tiny_cache.lookup(uri, accept_header(["text/turtle"])) is None
+
+
+def _etagged(content: bytes) -> requests.Response:
+    r = requests.Response()
+    r.status_code = 200
+    r.headers["ETag"] = '"1"'
+    r._content = content
+    return r
+
+
+def test_response_cache_eviction(tmp_path: Path, monkeypatch):
+    cache = ResponseCache(tmp_path / "cache", max_bytes=25)
+    # the folder is only listed once, when the index is built
+    monkeypatch.setattr(
+        Path, "glob", lambda *args: pytest.fail("folder listed again")
+    )
+    for url in ("urn:a", "urn:b"):
+        cache.store(url, "text/turtle", _etagged(b"0123456789"))
+    cache.response("urn:a", "text/turtle")  # a is now used more recently
+    cache.store("urn:c", "text/turtle", _etagged(b"0123456789"))
+    assert cache.lookup("urn:a", "text/turtle") is not None
+    assert cache.lookup("urn:b", "text/turtle") is None
+    assert cache.lookup("urn:c", "text/turtle") is not None
+    monkeypatch.undo()
+
+    # a new run picks up what is left on disk
+    reopened = ResponseCache(tmp_path / "cache", max_bytes=25)
+    assert reopened._size == 20
+    assert set(reopened._index) == set(cache._index)
+
+
+def test_accept_key():
+    assert accept_key(accept_header(["text/turtle", "text/html"])) == (
+        "text/html, text/turtle"
+    )
+    assert accept_key(
+        accept_header(["application/ld+json", "text/turtle"])
+    ) == accept_key(accept_header(["text/turtle", "application/ld+json"]))
+
+
+def test_accept_header():
+    assert accept_header(["text/turtle", "application/ld+json"]) == (
+        "text/turtle;q=1.0, application/ld+json;q=0.9, text/html;q=0.1"
+    )
+    # html is always the last resort, duplicates are ignored
+    assert accept_header(["text/html", "text/turtle", "text/turtle"]) == (
+        "text/turtle;q=1.0, text/html;q=0.1"
+    )
+
+
+@pytest.mark.usefixtures("httpd_server_base")
+def test_dereference_single_request(httpd_server_base: str):
+    fetcher = WebFetcher(total_retry=1)
+    result = dereference(
+        f"{httpd_server_base}DOC1.ttl",
+        ["application/ld+json", "text/turtle"],
+        fetcher=fetcher,
+    )
+    assert result.mime_type == "text/turtle"
+    assert len(result.graph) > 0
+    assert fetcher.stats["requests"] == 1
+
+    # a given graph is filled in place
+    graph = Graph()
+    result = dereference(
+        f"{httpd_server_base}DOC2.ttl", ["text/turtle"], graph, fetcher
+    )
+    assert result.graph is graph
+    assert len(graph) > 0
+    fetcher.close()
+
+
+@pytest.mark.usefixtures("httpd_server_base")
+def test_dereference_budgets(httpd_server_base: str):
+    uri = f"{httpd_server_base}DOC1.ttl"
+    # tiny spool: the body gets parsed from a file on disk
+    fetcher = WebFetcher(total_retry=1, spool_bytes=10)
+    result = dereference(uri, ["text/turtle"], fetcher=fetcher)
+    assert result.outcome == "ok"
+    assert len(result.graph) > 0
+
+    fetcher = WebFetcher(total_retry=1, max_bytes=10)
+    result = dereference(uri, ["text/turtle"], fetcher=fetcher)
+    assert result.outcome == "maxBytesExceeded"
+    assert result.graph is None
+    assert fetcher.stats["maxBytesExceeded"] == 1
+
+
+@pytest.mark.usefixtures("httpd_server_base")
+def test_negative_cache(httpd_server_base: str, tmp_path: Path):
+    negative_file = tmp_path / "negative.json"
+    fetcher = WebFetcher(
+        total_retry=1, negative_cache=NegativeCache(60, negative_file)
+    )
+    uri = f"{httpd_server_base}NOT-THERE.ttl"
+    for _ in range(3):
+        result = dereference(uri, ["text/turtle"], fetcher=fetcher)
+        assert result.outcome == "httpError"
+    assert fetcher.stats["requests"] == 1
+    assert fetcher.stats["negativeCacheHits"] == 2
+
+    # remembered across runs, regardless of the Accept header
+    assert NegativeCache(60, negative_file).lookup(uri, "*/*") == "httpError"
+    # failures tied to the Accept header only apply to it
+    negative_cache = NegativeCache(0.1)
+    negative_cache.remember(uri, "unsupportedFormat", "text/turtle")
+    assert negative_cache.lookup(uri, "text/turtle") == "unsupportedFormat"
+    assert negative_cache.lookup(uri, "*/*") is None
+    # whatever the order or weights of the formats asked for
+    accept = accept_header(["text/turtle", "application/ld+json"])
+    negative_cache.remember(uri, "unsupportedFormat", accept)
+    reordered = accept_header(["application/ld+json", "text/turtle"])
+    assert negative_cache.lookup(uri, reordered) == "unsupportedFormat"
+    # and are forgotten once the ttl passed
+    time.sleep(0.2)
+    assert negative_cache.lookup(uri, "text/turtle") is None
+
+
+def test_negative_cache_unsupported_format(pages_base, tmp_path: Path):
+    base, accepts = pages_base
+    (tmp_path / "notes.txt").write_text("no rdf in here")
+    fetcher = WebFetcher(total_retry=0, negative_cache=NegativeCache(60))
+    results = [
+        dereference(f"{base}notes.txt", fetcher=fetcher) for _ in range(2)
+    ]
+    assert [result.outcome for result in results] == ["unsupportedFormat"] * 2
+    assert results[0].mime_type == "text/plain"
+    # remembered after the first, so asked only once
+    assert fetcher.stats["requests"] == 1
+    assert len(accepts) == 1
+    fetcher.close()
+
+
+@pytest.mark.usefixtures("httpd_server_base")
+def test_host_format_stats(httpd_server_base: str, tmp_path: Path):
+    stats_file = tmp_path / "formats.json"
+    stats = HostFormatStats(stats_file, min_samples=2)
+    fetcher = WebFetcher(total_retry=1, format_stats=stats)
+    formats = ["application/ld+json", "text/turtle"]
+    for doc in ("DOC1.ttl", "DOC2.ttl"):
+        dereference(f"{httpd_server_base}{doc}", formats, fetcher=fetcher)
+    # this host serves turtle, so ask for that first from now on
+    uri = f"{httpd_server_base}DOC3.ttl"
+    assert fetcher.preferred_formats(uri, formats) == formats[::-1]
+    assert fetcher.stats["learnedFormats"] == 1
+    # other hosts are not affected
+    assert stats.preferred("https://example.org/x", formats) == formats
+    fetcher.close()
+
+    # failing formats go last, once there are enough samples
+    stats = HostFormatStats(stats_file, min_samples=2)
+    assert stats.preferred(uri, formats) == formats[::-1]
+    stats.record(uri, "text/turtle", False)
+    stats.record(uri, "text/turtle", False)
+    stats.record(uri, "text/turtle", False)
+    assert stats.preferred(uri, formats) == formats
+
+
+def test_host_format_stats_unsupported(pages_base, tmp_path: Path):
+    base, _ = pages_base
+    (tmp_path / "notes.txt").write_text("no rdf in here")
+    stats = HostFormatStats()
+    fetcher = WebFetcher(total_retry=0, format_stats=stats)
+    dereference(f"{base}notes.txt", fetcher=fetcher)
+    # the host is known to serve no rdf as text/plain
+    assert stats._hosts[urlparse(base).netloc] == {"text/plain": [0, 1]}
+    fetcher.close()
+
+
+def test_dereference_link_cycle(pages_base):
+    base, accepts = pages_base
+    fetcher = WebFetcher(total_retry=0)
+    result = dereference(f"{base}a.html", ["text/turtle"], fetcher=fetcher)
+    assert len(result.graph) == 1
+    # each page once, however often (and concurrently) it is linked to
+    paths = sorted(path for path, _ in accepts)
+    assert paths == ["/a.html", "/b.html", "/c.html", "/d.ttl"]
+    fetcher.close()
+
+
+def test_dereference_link_formats(pages_base):
+    base, accepts = pages_base
+    fetcher = WebFetcher(total_retry=0)
+    formats = ["application/n-triples", "text/turtle"]
+    dereference(f"{base}a.html", formats, fetcher=fetcher)
+    # the alternates are asked for in the formats given
+    assert {accept for _, accept in accepts} == {accept_header(formats)}
+    fetcher.close()
+
+
+class CountingFetcher(WebFetcher):
+    """keeps track of the number of body bytes read"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.bytes_read = 0
+
+    def _chunks(self, *args):
+        for chunk in super()._chunks(*args):
+            self.bytes_read += len(chunk)
+            yield chunk
+
+
+def test_dereference_links_only_streamed(pages_base, tmp_path: Path):
+    base, _ = pages_base
+    html = (
+        '<html><head><link rel="describedby" href="d.ttl"></head><body>'
+        + "<p>content</p>" * 100000
+        + "</body></html>"
+    )
+    (tmp_path / "big.html").write_text(html)
+
+    # links only: the head gets scanned straight from the response
+    fetcher = CountingFetcher(total_retry=0)
+    result = dereference(
+        f"{base}big.html", fetcher=fetcher, html_scripts=False
+    )
+    assert (URIRef("urn:d"), URIRef("urn:p"), URIRef("urn:o")) in result.graph
+    assert fetcher.bytes_read < len(html) / 10
+    fetcher.close()
+
+    # else the whole body is downloaded, to find the scripts
+    fetcher = CountingFetcher(total_retry=0)
+    result = dereference(f"{base}big.html", fetcher=fetcher)
+    assert len(result.graph) == 1
+    assert fetcher.bytes_read > len(html)
+    fetcher.close()
+
+
+def test_local_mirrors(tmp_path: Path):
+    folder = tmp_path / "vocab"
+    (folder / "terms").mkdir(parents=True)
+    (folder / "terms" / "Thing.ttl").write_text(
+        "<https://example.org/vocab/terms/Thing> a <urn:Class> ."
+    )
+    bundle = tmp_path / "bundle.ttl"
+    bundle.write_text(
+        "<https://example.org/dump/a> <urn:p> [ <urn:q> 1 ] .\n"
+        "<https://example.org/dump/b> <urn:p> 2 .\n"
+    )
+    mirrors = LocalMirrors(
+        {
+            "https://example.org/vocab/": str(folder),
+            "https://example.org/dump/": bundle.as_uri(),
+        }
+    )
+    fetcher = WebFetcher(total_retry=0, mirrors=mirrors)
+    result = dereference(
+        "https://example.org/vocab/terms/Thing#it", fetcher=fetcher
+    )
+    assert result.mime_type == "text/turtle"
+    assert len(result.graph) == 1
+    # the concise bounded description of a uri in the bundle
+    result = dereference("https://example.org/dump/a", fetcher=fetcher)
+    assert len(result.graph) == 2
+    assert fetcher.stats["mirrorHits"] == 2
+    assert fetcher.stats["requests"] == 0
+    # no document in the mirror, or outside of it, is not mirrored
+    assert mirrors.resolve("https://example.org/vocab/terms/Other") is None
+    assert mirrors.resolve("https://example.org/vocab/../bundle") is None
+    assert mirrors.resolve("https://example.com/vocab/terms/Thing") is None
+
+    with pytest.raises(FileNotFoundError):
+        mirrors.add("https://example.org/", str(tmp_path / "nothing"))
+
+
+def test_context_cache(tmp_path: Path):
+    context_url = "https://example.org/context.jsonld"
+    context = {"name": "https://schema.org/name"}
+    bundle = tmp_path / "bundle.json"
+    bundle.write_text(json.dumps({context_url: {"@context": context}}))
+    contexts = ContextCache(tmp_path / "contexts", bundles=[str(bundle)])
+    fetcher = WebFetcher(total_retry=0, contexts=contexts)
+    document = {
+        "@context": ["context.jsonld", {"id": "@id"}],
+        "id": "https://example.org/thing",
+        "name": "thing",
+    }
+    inlined = inline_contexts(
+        document, "https://example.org/", fetcher.jsonld_context
+    )
+    assert inlined["@context"] == [context, {"id": "@id"}]
+    graph = Graph().parse(data=inlined, format="json-ld")
+    assert len(graph) == 1
+    assert fetcher.stats["contextCacheHits"] == 1
+    assert fetcher.stats["requests"] == 0
+
+    # unavailable contexts are left to the parser
+    assert inline_contexts(
+        {"@context": "other.jsonld"}, "https://example.org/", lambda url: None
+    ) == {"@context": "https://example.org/other.jsonld"}
+
+    # fetched contexts are kept across runs
+    contexts.store(context_url, {"@context": context})
+    found, kept = ContextCache(tmp_path / "contexts").lookup(context_url)
+    assert found and kept == {"@context": context}
+
+
+def test_signposting_links():
+    r = requests.Response()
+    r.url = "https://example.org/landing/"
+    r.headers["Link"] = ", ".join(
+        [
+            '<meta.ttl>; rel="describedby"; type="text/turtle"',
+            '<paper.pdf>; rel="alternate"; type="application/pdf"',
+            '<https://example.org/meta.jsonld>; rel="alternate"; '
+            'type="application/ld+json"',
+            '<https://orcid.org/0000>; rel="author"',
+        ]
+    )
+    assert signposting_links(r) == [
+        "https://example.org/landing/meta.ttl",
+        "https://example.org/meta.jsonld",
+    ]
+    del r.headers["Link"]
+    assert signposting_links(r) == []
+
+
+def test_lod_aware_html_parser_scan():
+    html = (
+        '<html><head><link rel="describedby" href="meta.ttl">'
+        '<script type="application/ld+json">{"@id": "urn:a"}</script>'
+        "</head><body>" + "<p>content</p>" * 1000 + '<script type="text/'
+        'turtle"><urn:a> <urn:b> <urn:c> .</script></body></html>'
+    )
+    parser = LODAwareHTMLParser()
+    parser.scan(StringIO(html), chunk_size=7)
+    assert parser.links == ["meta.ttl"]
+    assert parser.scripts == [
+        {"application/ld+json": '{"@id": "urn:a"}'},
+        {"text/turtle": "<urn:a> <urn:b> <urn:c> ."},
+    ]
+    assert not parser.done
+
+    # links only: stops reading at the end of the head
+    html_stream = StringIO(html)
+    parser = LODAwareHTMLParser(capture_scripts=False)
+    parser.scan(html_stream, chunk_size=7)
+    assert parser.links == ["meta.ttl"]
+    assert parser.scripts == []
+    assert parser.done
+    assert html_stream.tell() < len(html) / 10
+
+    # fed as bytes, also when split within a character
+    parser = LODAwareHTMLParser()
+    data = BytesIO(html.replace("meta.ttl", "m\u00e9ta.ttl").encode())
+    parser.scan_chunks(iter(partial(data.read, 7), b""))
+    assert parser.links == ["m\u00e9ta.ttl"]
+    assert len(parser.scripts) == 2
+
+
+def test_dereference_memo():
+    def result_of(size: int) -> DereferenceResult:
+        graph = Graph()
+        for n in range(size):
+            graph.add((URIRef("urn:s"), URIRef("urn:p"), Literal(n)))
+        return DereferenceResult("urn:s", graph, "text/turtle")
+
+    memo = DereferenceMemo(max_triples=5)
+    assert memo.lookup("urn:a", "text/turtle") == (False, None)
+    memo.put("urn:a", "text/turtle", result_of(3))
+    memo.put("urn:none", "text/turtle", DereferenceResult("urn:none"))
+    found, result = memo.lookup("urn:none", "text/turtle")
+    assert found and result.graph is None
+    found, result = memo.lookup("urn:a", "text/turtle")
+    assert found and len(result.graph) == 3
+
+    # exceeding max_triples evicts the least recently used
+    memo.put("urn:b", "text/turtle", result_of(3))
+    assert not memo.lookup("urn:a", "text/turtle")[0]
+    assert memo.lookup("urn:b", "text/turtle")[0]
+
+    # insertion is remembered per config, independent of eviction
+    assert memo.inserted("urn:a", "text/turtle", "cfg") is None
+    memo.mark_inserted("urn:a", "text/turtle", "cfg", "text/turtle", 3)
+    assert memo.inserted("urn:a", "text/turtle", "cfg") == ("text/turtle", 3)
+    assert memo.inserted("urn:a", "text/turtle", "other") is None
+
+
+@pytest.mark.usefixtures("httpd_server_base")
+def test_dereference_memo_transient(httpd_server_base: str):
+    uri = f"{httpd_server_base}DOC1.ttl"
+    accept = accept_header(["text/turtle"])
+    breakers = CircuitBreakers(failure_threshold=1, cooldown=0.1)
+    fetcher = WebFetcher(total_retry=0, breakers=breakers)
+    memo = DereferenceMemo()
+    breakers.for_url(uri).record(False)  # as if the host just failed
+
+    # an open circuit is not memoized, so the uri is fetched again
+    result = dereference(uri, ["text/turtle"], fetcher=fetcher)
+    assert result.outcome == "hostUnavailable"
+    memo.put(uri, accept, result)
+    assert memo.lookup(uri, accept) == (False, None)
+    time.sleep(0.2)  # the probe after the cooldown gets through
+    result = dereference(uri, ["text/turtle"], fetcher=fetcher)
+    assert result.outcome == "ok"
+    memo.put(uri, accept, result)
+    assert memo.lookup(uri, accept) == (True, result)
+    fetcher.close()
+
+    # definitive failures are memoized, server errors are not
+    for status_code, memoized in ((404, True), (429, False), (503, False)):
+        result = DereferenceResult(uri, None, None, "httpError", status_code)
+        memo.put(f"urn:{status_code}", accept, result)
+        assert memo.lookup(f"urn:{status_code}", accept)[0] == memoized
+    memo.put(
+        "urn:slow",
+        accept,
+        DereferenceResult(uri, None, None, "maxSecondsExceeded"),
+    )
+    assert not memo.lookup("urn:slow", accept)[0]
+
+
 if __name__ == "__main__":
     run_single_test(__file__)
@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+import pytest
+from pyrdfstore import create_rdf_store
+from rdflib import BNode, Graph, Literal, URIRef
+from util4tests import run_single_test
+
+from travharv.config_build import AssertPath, AssertPathTrie
+from travharv.store import RDFStoreAccess
+from travharv.working_graph import WorkingGraphAccess, step_predicate
+
+EX = "http://example.org/"
+
+
+def test_step_predicate():
+    assert step_predicate(f"<{EX}geo>") == URIRef(f"{EX}geo")
+    assert step_predicate(f"<{EX}a>|<{EX}b>") is None
+    assert step_predicate(f"^<{EX}a>") is None
+
+    assert WorkingGraphAccess.supports(
+        AssertPathTrie([AssertPath(f"<{EX}isPartOf>/<{EX}geo>")])
+    )
+    assert not WorkingGraphAccess.supports(
+        AssertPathTrie([AssertPath(f"(<{EX}a>|<{EX}b>)")])
+    )
+
+
+@pytest.mark.usefixtures("decorated_rdf_stores")
+def test_working_graph(decorated_rdf_stores):
+    graph = Graph()
+    graph.add((URIRef(f"{EX}s"), URIRef(f"{EX}isPartOf"), URIRef(f"{EX}p")))
+    graph.add((URIRef(f"{EX}p"), URIRef(f"{EX}geo"), URIRef(f"{EX}g")))
+    graph.add((URIRef(f"{EX}s"), URIRef(f"{EX}unrelated"), Literal(1)))
+    nsm = graph.namespace_manager
+    path_trie = AssertPathTrie(
+        [
+            AssertPath(f"<{EX}isPartOf>/<{EX}geo>/<{EX}latitude>"),
+            AssertPath(f"<{EX}isPartOf>/<{EX}geo>/<{EX}longitude>"),
+        ]
+    )
+
+    for rdf_store in decorated_rdf_stores:
+        rdf_store.insert(graph, "urn:test:working-graph")
+        working_graph = WorkingGraphAccess(rdf_store)
+
+        # only the triples along the paths are copied, and only once
+        assert working_graph.seed([f"{EX}s"], path_trie, nsm) == 2
+        assert working_graph.seed([f"{EX}s"], path_trie, nsm) == 0
+        objects = working_graph.select_objects_for_ppaths(
+            f"{EX}s", {1: f"<{EX}isPartOf>"}, nsm
+        )
+        assert objects == {1: URIRef(f"{EX}p")}
+
+        # harvested triples are checked locally, and written back in bulk
+        harvested = Graph()
+        harvested.add((URIRef(f"{EX}g"), URIRef(f"{EX}latitude"), Literal(51)))
+        working_graph.insert_for_config(harvested, "test-working-graph")
+        next_hops = working_graph.select_next_hops(
+            [f"{EX}g"], f"<{EX}latitude>", nsm
+        )
+        assert next_hops == {f"{EX}g": [Literal(51)]}
+        assert rdf_store.select_next_hops(
+            [f"{EX}g"], f"<{EX}latitude>", nsm
+        ) == {f"{EX}g": []}
+        assert working_graph.write_back() == 1
+        assert working_graph.write_back() == 0
+        assert rdf_store.select_next_hops(
+            [f"{EX}g"], f"<{EX}latitude>", nsm
+        ) == {f"{EX}g": [Literal(51)]}
+
+
+def test_working_graph_blank_nodes():
+    graph = Graph()
+    geo = BNode()
+    graph.add((URIRef(f"{EX}s"), URIRef(f"{EX}isPartOf"), URIRef(f"{EX}p")))
+    graph.add((URIRef(f"{EX}p"), URIRef(f"{EX}geo"), geo))
+    graph.add((geo, URIRef(f"{EX}latitude"), Literal(51)))
+    graph.add((geo, URIRef(f"{EX}longitude"), Literal(3)))
+    nsm = graph.namespace_manager
+    paths = [
+        f"<{EX}isPartOf>/<{EX}geo>/<{EX}latitude>",
+        f"<{EX}isPartOf>/<{EX}geo>/<{EX}longitude>",
+    ]
+    path_trie = AssertPathTrie([AssertPath(path) for path in paths])
+
+    rdf_store = RDFStoreAccess(create_rdf_store())
+    rdf_store.insert(graph, "urn:test:working-graph-bnodes")
+    working_graph = WorkingGraphAccess(rdf_store)
+
+    # the hops through the blank node are copied too
+    assert working_graph.seed([f"{EX}s"], path_trie, nsm) > 0
+    assert working_graph.seed([f"{EX}s"], path_trie, nsm) == 0
+    for path in paths:
+        assert working_graph.verify_path(f"{EX}s", path, nsm)
+    assert working_graph.select_objects_for_ppaths(
+        f"{EX}s", {3: paths[0]}, nsm
+    ) == {3: Literal(51)}
+
+
+if __name__ == "__main__":
+    run_single_test(__file__)
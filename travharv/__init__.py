@@ -10,8 +10,18 @@ by dereferencing URIs and asserting paths.
 
 from travharv.config_build import TravHarvConfig, TravHarvConfigBuilder
 from travharv.executor import TravHarvExecutor
+from travharv.parsing import ParserPool
 from travharv.service import TravHarv
 from travharv.store import RDFStoreAccess
+from travharv.web_discovery import (
+    ContextCache,
+    DereferenceMemo,
+    HostFormatStats,
+    LocalMirrors,
+    NegativeCache,
+    ResponseCache,
+    WebFetcher,
+)
 
 __all__ = [
     "RDFStoreAccess",
@@ -19,4 +29,12 @@ __all__ = [
     "TravHarvConfig",
     "TravHarvExecutor",
     "TravHarv",
+    "WebFetcher",
+    "ResponseCache",
+    "NegativeCache",
+    "HostFormatStats",
+    "LocalMirrors",
+    "ContextCache",
+    "ParserPool",
+    "DereferenceMemo",
 ]
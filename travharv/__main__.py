@@ -8,8 +8,22 @@ import validators
 from rdflib import Graph
 
 from travharv import TravHarv
+from travharv.parsing import PARSER_BACKENDS, ParserPool
+from travharv.path_assertion import TRAVERSALS
 from travharv.store import RDFStore, RDFStoreAccess
-from travharv.web_discovery import get_graph_for_format
+from travharv.throttle import CircuitBreakers, HostScheduler
+from travharv.web_discovery import (
+    DEFAULT_FORMATS,
+    HTTP_BACKENDS,
+    ContextCache,
+    DereferenceMemo,
+    HostFormatStats,
+    LocalMirrors,
+    NegativeCache,
+    ResponseCache,
+    WebFetcher,
+    get_graph_for_format,
+)
 
 log = logging.getLogger(__name__)
 
@@ -89,6 +103,375 @@ def get_arg_parser():
         help=("Location of yml formatted logconfig file to apply."),
     )
 
+    parser.add_argument(
+        "--http-pool-size",
+        type=int,
+        default=10,
+        action="store",
+        required=False,
+        help=(
+            "Max number of keep-alive connections pooled per host "
+            "by the shared http client."
+        ),
+    )
+
+    parser.add_argument(
+        "--parse-workers",
+        type=int,
+        default=0,
+        action="store",
+        required=False,
+        help=(
+            "Number of worker processes parsing the bigger rdf documents, "
+            "so parsing runs on all cores next to the fetching "
+            "(0, the default, parses in the fetching threads)."
+        ),
+    )
+
+    parser.add_argument(
+        "--parser-backend",
+        choices=PARSER_BACKENDS,
+        default="auto",
+        action="store",
+        required=False,
+        help=(
+            "The parsers for turtle, n-triples and n-quads: the native ones "
+            "of pyoxigraph (oxigraph, needs it installed), the rdflib ones "
+            "(rdflib) or the native ones if installed (auto, the default)."
+        ),
+    )
+
+    parser.add_argument(
+        "--http-backend",
+        choices=HTTP_BACKENDS,
+        default="requests",
+        action="store",
+        required=False,
+        help=(
+            "The http client to use: requests (HTTP/1.1) or httpx "
+            "(HTTP/2 multiplexing per host, brotli/zstd if installed, "
+            "needs httpx[http2,brotli,zstd])."
+        ),
+    )
+
+    parser.add_argument(
+        "--http-retries",
+        type=int,
+        default=8,
+        action="store",
+        required=False,
+        help=(
+            "Max number of retries (with backoff) for failing "
+            "http requests."
+        ),
+    )
+
+    parser.add_argument(
+        "--connect-timeout",
+        type=float,
+        default=10.0,
+        action="store",
+        required=False,
+        help="Number of seconds to wait for a connection to a host.",
+    )
+
+    parser.add_argument(
+        "--read-timeout",
+        type=float,
+        default=60.0,
+        action="store",
+        required=False,
+        help=(
+            "Number of seconds to wait for a host to send (the next part "
+            "of) its response."
+        ),
+    )
+
+    parser.add_argument(
+        "--run-timeout",
+        type=float,
+        default=None,
+        action="store",
+        required=False,
+        help=(
+            "Max number of seconds for the whole run, assertions left "
+            "when it is over are skipped and reported as such. "
+            "No limit when not set."
+        ),
+    )
+
+    parser.add_argument(
+        "--config-timeout",
+        type=float,
+        default=None,
+        action="store",
+        required=False,
+        help="Max number of seconds for each config, see --run-timeout.",
+    )
+
+    parser.add_argument(
+        "--task-timeout",
+        type=float,
+        default=None,
+        action="store",
+        required=False,
+        help="Max number of seconds for each task, see --run-timeout.",
+    )
+
+    parser.add_argument(
+        "--cache-dir",
+        type=str,
+        default=None,
+        action="store",
+        required=False,
+        help=(
+            "Folder to keep a persistent http response cache in, "
+            "cached documents are revalidated with conditional requests. "
+            "No caching when not set."
+        ),
+    )
+
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=1024,
+        action="store",
+        required=False,
+        help="Max size (in MB) of the http response cache.",
+    )
+
+    parser.add_argument(
+        "--max-doc-size",
+        type=int,
+        default=None,
+        action="store",
+        required=False,
+        help=(
+            "Max size (in MB) of a single downloaded document, "
+            "bigger ones are skipped and reported. No limit when not set."
+        ),
+    )
+
+    parser.add_argument(
+        "--max-doc-seconds",
+        type=float,
+        default=None,
+        action="store",
+        required=False,
+        help=(
+            "Max number of seconds to spend downloading a single document, "
+            "slower ones are skipped and reported. No limit when not set."
+        ),
+    )
+
+    parser.add_argument(
+        "--html-links-only",
+        action="store_true",
+        required=False,
+        help=(
+            "Only scan the head of html pages for describedby links, "
+            "skipping the json-ld/turtle scripts embedded in them."
+        ),
+    )
+
+    parser.add_argument(
+        "--no-format-learning",
+        action="store_true",
+        required=False,
+        help=(
+            "Do not learn per host which rdf formats work to ask for those "
+            "first. Learned formats are kept across runs in the --cache-dir "
+            "if set."
+        ),
+    )
+
+    parser.add_argument(
+        "--mirror",
+        nargs=2,
+        metavar=("PREFIX", "LOCATION"),
+        action="append",
+        required=False,
+        help=(
+            "Resolve the uris starting with PREFIX from the local "
+            "directory or bundle file (path or file:// url) LOCATION "
+            "instead of over http. Can be repeated."
+        ),
+    )
+
+    parser.add_argument(
+        "--context-bundle",
+        action="append",
+        required=False,
+        help=(
+            "Json file mapping json-ld @context urls to their documents, "
+            "used instead of fetching those. Can be repeated. "
+            "Fetched contexts are kept across runs in the --cache-dir if set."
+        ),
+    )
+
+    parser.add_argument(
+        "--negative-ttl",
+        type=int,
+        default=24 * 60,
+        action="store",
+        required=False,
+        help=(
+            "Number of minutes urls that were not found (404/410) or "
+            "offered no rdf are not fetched again (0 to disable). "
+            "Kept across runs in the --cache-dir if set."
+        ),
+    )
+
+    parser.add_argument(
+        "--breaker-threshold",
+        type=int,
+        default=5,
+        action="store",
+        required=False,
+        help=(
+            "Number of consecutive failures after which requests to a "
+            "host fail fast (0 to disable)."
+        ),
+    )
+
+    parser.add_argument(
+        "--breaker-cooldown",
+        type=float,
+        default=300.0,
+        action="store",
+        required=False,
+        help=(
+            "Number of seconds a failing host is skipped before "
+            "it is probed again."
+        ),
+    )
+
+    parser.add_argument(
+        "--throttle",
+        action="store_true",
+        required=False,
+        help=(
+            "Pace the requests per host with a rate limit and an adaptive "
+            "concurrency window, backing off on 429/503 and Retry-After."
+        ),
+    )
+
+    parser.add_argument(
+        "--host-rate",
+        type=float,
+        default=10.0,
+        action="store",
+        required=False,
+        help=(
+            "Max number of requests per second to a single host "
+            "when throttling (0 for no rate limit)."
+        ),
+    )
+
+    parser.add_argument(
+        "--host-max-window",
+        type=int,
+        default=16,
+        action="store",
+        required=False,
+        help=(
+            "Max number of concurrent requests to a single host "
+            "the adaptive window can grow to when throttling."
+        ),
+    )
+
+    parser.add_argument(
+        "--memo-max-triples",
+        type=int,
+        default=1000000,
+        action="store",
+        required=False,
+        help=(
+            "Max number of triples of dereferenced documents kept "
+            "in memory for reuse during the run."
+        ),
+    )
+
+    parser.add_argument(
+        "--max-concurrency",
+        type=int,
+        default=1,
+        action="store",
+        required=False,
+        help=(
+            "Max number of subjects dereferenced concurrently. "
+            "Use 1 to dereference one subject at a time."
+        ),
+    )
+
+    parser.add_argument(
+        "--max-per-host",
+        type=int,
+        default=4,
+        action="store",
+        required=False,
+        help="Max number of concurrent fetches to a single host.",
+    )
+
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        action="store",
+        required=False,
+        help=(
+            "Number of threads asserting the paths of "
+            "different subjects in parallel."
+        ),
+    )
+
+    parser.add_argument(
+        "--verify-batch-size",
+        type=int,
+        default=100,
+        action="store",
+        required=False,
+        help=(
+            "Number of subjects whose paths are verified together, "
+            "in a single query per assertion path."
+        ),
+    )
+
+    parser.add_argument(
+        "--traversal",
+        choices=TRAVERSALS,
+        default="depth",
+        action="store",
+        required=False,
+        help=(
+            "How the assertion paths are traversed: 'depth' follows "
+            "a single object per hop, 'frontier' goes breadth-first "
+            "following all objects per hop (and the hops shared "
+            "by several paths only once)."
+        ),
+    )
+
+    parser.add_argument(
+        "--max-fanout",
+        type=int,
+        default=100,
+        action="store",
+        required=False,
+        help="Max number of nodes followed per hop (frontier traversal).",
+    )
+
+    parser.add_argument(
+        "--working-graph",
+        action="store_true",
+        required=False,
+        help=(
+            "Check the paths in a local working graph, seeded from the "
+            "store, and write the harvested triples back to the store "
+            "in bulk at the end of each task."
+        ),
+    )
+
     return parser
 
 
@@ -109,17 +492,22 @@ def enable_logging(args: argparse.Namespace):
     log.info(f"Logging enabled according to config in {args.logconf}")
 
 
-def load_resource_into_graph(graph: Graph, resource: str, format: str):
+def load_resource_into_graph(
+    graph: Graph, resource: str, format: str, fetcher: WebFetcher = None
+):
     """
     Insert a resource into a graph.
+    URI resources are fetched through the (optional) shared fetcher.
     """
     # resource can be a path or a URI
 
     # check if resource is a URI
     if validators.url(resource):
-        # get triples from the uri and add them
-        formats = ["text/turtle", "application/ld+json"]
-        return graph + get_graph_for_format(resource, formats=formats)
+        # get triples from the uri and add them (in place)
+        get_graph_for_format(
+            resource, formats=DEFAULT_FORMATS, graph=graph, fetcher=fetcher
+        )
+        return graph
 
     # else
     resource_path: Path = Path(resource)
@@ -130,7 +518,8 @@ def load_resource_into_graph(graph: Graph, resource: str, format: str):
         # determine the format of the file and use the correct parser
         ext = resource_path.suffix
         format = SUFFIX_TO_FORMAT.get(ext, "turtle")
-        graph.parse(resource, format=format)
+        parsers = fetcher.parsers if fetcher is not None else ParserPool()
+        parsers.parse(graph, resource_path, format)
         return graph
 
     # else
@@ -141,14 +530,16 @@ def load_resource_into_graph(graph: Graph, resource: str, format: str):
                 continue  # no recursion on folders, glob **/* does already
             # else
             format = SUFFIX_TO_FORMAT.get(sub.suffix, "text/turtle")
-            load_resource_into_graph(graph, sub, format)
+            load_resource_into_graph(graph, sub, format, fetcher)
         return graph
 
     # if resource is neither a URI nor a file then raise an error
     raise ValueError(f"Resource is not a valid URI or file path: {resource}")
 
 
-def init_load(args: argparse.Namespace, store: RDFStore):
+def init_load(
+    args: argparse.Namespace, store: RDFStore, fetcher: WebFetcher = None
+):
     """
     loads the suggested input into the store prior to execution
     """
@@ -159,16 +550,102 @@ def init_load(args: argparse.Namespace, store: RDFStore):
     log.debug(f"loading initial context from {len(args.init)=} files")
     graph: Graph = Graph()
     for inputfile in args.init:
-        load_resource_into_graph(graph, inputfile, format="text/turtle")
+        load_resource_into_graph(
+            graph, inputfile, format="text/turtle", fetcher=fetcher
+        )
     store.insert(graph, "urn:travharv:context")
 
 
-def make_service(args) -> TravHarv:
+def make_fetcher(args: argparse.Namespace) -> WebFetcher:
+    log.debug(f"make fetcher with {args.http_pool_size=} {args.http_retries=}")
+    cache = None
+    if args.cache_dir is not None:
+        log.debug(f"using response cache in {args.cache_dir=}")
+        cache = ResponseCache(
+            Path.cwd() / args.cache_dir,
+            max_bytes=args.cache_size * 1024 * 1024,
+        )
+    scheduler = None
+    if args.throttle:
+        log.debug(f"throttling with {args.host_rate=} {args.host_max_window=}")
+        scheduler = HostScheduler(
+            rate=args.host_rate,
+            burst=max(1, int(args.host_rate)),
+            max_window=args.host_max_window,
+        )
+    negative_cache = None
+    if args.negative_ttl > 0:
+        negative_file = None
+        if args.cache_dir is not None:
+            negative_file = Path.cwd() / args.cache_dir / "negative.json"
+        negative_cache = NegativeCache(
+            ttl=args.negative_ttl * 60, file=negative_file
+        )
+    format_stats = None
+    if not args.no_format_learning:
+        formats_file = None
+        if args.cache_dir is not None:
+            formats_file = Path.cwd() / args.cache_dir / "formats.json"
+        format_stats = HostFormatStats(file=formats_file)
+    context_folder = None
+    if args.cache_dir is not None:
+        context_folder = Path.cwd() / args.cache_dir / "contexts"
+    contexts = ContextCache(context_folder, bundles=args.context_bundle or ())
+    mirrors = None
+    if args.mirror:
+        mirrors = LocalMirrors(dict(args.mirror))
+    breakers = None
+    if args.breaker_threshold > 0:
+        breakers = CircuitBreakers(
+            failure_threshold=args.breaker_threshold,
+            cooldown=args.breaker_cooldown,
+        )
+    max_bytes = None
+    if args.max_doc_size is not None:
+        max_bytes = args.max_doc_size * 1024 * 1024
+    return WebFetcher(
+        pool_maxsize=args.http_pool_size,
+        total_retry=args.http_retries,
+        cache=cache,
+        scheduler=scheduler,
+        max_bytes=max_bytes,
+        max_seconds=args.max_doc_seconds,
+        breakers=breakers,
+        negative_cache=negative_cache,
+        connect_timeout=args.connect_timeout,
+        read_timeout=args.read_timeout,
+        format_stats=format_stats,
+        backend=args.http_backend,
+        mirrors=mirrors,
+        contexts=contexts,
+        parsers=ParserPool(
+            workers=args.parse_workers, backend=args.parser_backend
+        ),
+    )
+
+
+def make_service(args, fetcher: WebFetcher = None) -> TravHarv:
     store_info: list = args.store or []
     log.debug(f"make service for target store {store_info}")
     config = args.config[0]
     config = Path.cwd() / config
-    service: TravHarv = TravHarv(config, store_info)
+    service: TravHarv = TravHarv(
+        config,
+        store_info,
+        fetcher=fetcher,
+        memo=DereferenceMemo(max_triples=args.memo_max_triples),
+        max_concurrency=args.max_concurrency,
+        max_per_host=args.max_per_host,
+        jobs=args.jobs,
+        html_scripts=not args.html_links_only,
+        run_timeout=args.run_timeout,
+        config_timeout=args.config_timeout,
+        task_timeout=args.task_timeout,
+        verify_batch_size=args.verify_batch_size,
+        traversal=args.traversal,
+        max_fanout=args.max_fanout,
+        working_graph=args.working_graph,
+    )
     log.debug(
         f"target store core type {type(service.target_store._core).__name__}"
     )
@@ -181,6 +658,8 @@ SUFFIX_TO_FORMAT = {
     ".jsonld": "json-ld",
     ".json-ld": "json-ld",
     ".json": "json-ld",
+    ".nt": "nt",
+    ".nq": "nquads",
 }
 
 
@@ -222,13 +701,21 @@ def main(*cli_args):
     # enable logging
     enable_logging(args)
     # build the core service
-    service: TravHarv = make_service(args)
-    # load the store initially
-    init_load(args, service.target_store)
-    # do what needs to be done
-    service.process()
-    # dump the output
-    final_dump(args, service.target_store)
+    fetcher: WebFetcher = make_fetcher(args)
+    try:
+        service: TravHarv = make_service(args, fetcher)
+        try:
+            # load the store initially
+            init_load(args, service.target_store, service.fetcher)
+            # do what needs to be done
+            service.process()
+            # dump the output
+            final_dump(args, service.target_store)
+        finally:
+            service.close()
+    finally:
+        # release the connections, keep what was learned for the next run
+        fetcher.close()
 
 
 if __name__ == "__main__":
@@ -2,7 +2,7 @@ import logging
 import re
 from abc import ABC, abstractmethod
 from pathlib import Path
-from typing import List
+from typing import Dict, List
 
 import yaml
 from rdflib.namespace import NamespaceManager
@@ -129,6 +129,7 @@ class AssertPathSet:
         self.NSM = NSM
         self.pre_assert_paths = resolve_ppaths(assert_paths, self.NSM)
         self.assert_paths = [AssertPath(p) for p in self.pre_assert_paths]
+        self.trie = AssertPathTrie(self.assert_paths)
 
     def list_assertion_paths(self) -> List:
         """
@@ -195,6 +196,58 @@ class AssertPath:
         return re.split(REGEXP, assert_path)
 
 
+class AssertPathTrie:
+    """
+    A prefix trie of assert paths, so the hops they share
+    only need to be traversed once.
+    This class contains the following:
+    - part: the path part leading to this node (None for the root)
+    - children: the nodes one hop further, by their path part
+    - assert_paths: the paths passing through this node, in order
+    """
+
+    def __init__(self, assert_paths: List[AssertPath] = (), part=None):
+        """
+        Initialise the assert path trie
+
+        :param assert_paths: The paths to put in the trie.
+        :type assert_paths: list[AssertPath]
+        :param part: The path part leading to this node.
+        :type part: str
+        """
+        self.part = part
+        self.children: Dict[str, AssertPathTrie] = dict()
+        self.assert_paths: List[AssertPath] = list()
+        for assert_path in assert_paths:
+            self.add(assert_path)
+
+    def add(self, assert_path: AssertPath):
+        """
+        Add an assert path to the trie
+
+        :param assert_path: The path to add.
+        :type assert_path: AssertPath
+        """
+        node = self
+        node.assert_paths.append(assert_path)
+        for part in assert_path.get_path_parts():
+            if part not in node.children:
+                node.children[part] = AssertPathTrie(part=part)
+            node = node.children[part]
+            node.assert_paths.append(assert_path)
+
+    def get_max_size(self):
+        """
+        Get the max size, the number of hops of the longest path
+
+        return: int
+        rtype: int
+        """
+        return max(
+            (path.get_max_size() for path in self.assert_paths), default=0
+        )
+
+
 class TravHarvConfig:
     """
     Configuration for the travharv
@@ -202,6 +255,7 @@ class TravHarvConfig:
         - NSM: NamespaceManager object from rdflib
         - tasks: a list of tasks
         - configname: a string
+        - formats: the rdf mimetypes to ask for (None for the default)
     """
 
     def __init__(self, travharv_config):
@@ -230,6 +284,10 @@ class TravHarvConfig:
     def configname(self):
         return self.travharv_config["configname"]
 
+    @property
+    def formats(self):
+        return self.travharv_config.get("formats")
+
 
 class TravHarvConfigBuilder:
     def __init__(
@@ -318,6 +376,11 @@ class TravHarvConfigBuilder:
                 self._assert_valid_sparql_syntax(value)
         # Add more assertions as needed...
 
+    def _assert_formats(self, formats):
+        assert isinstance(formats, list) and all(
+            isinstance(format, str) for format in formats
+        ), "formats must be a list of mimetypes"
+
     def _assert_valid_sparql_syntax(self, sparql_query):
         parseQuery(sparql_query)
         assert isinstance(sparql_query, str), "SPARQL query must be a string"
@@ -355,6 +418,8 @@ class TravHarvConfigBuilder:
         assert "assert" in dict_object, "assert must be defined"
         for assert_task in dict_object["assert"]:
             self._assert_subjects(assert_task["subjects"])
+        if "formats" in dict_object:
+            self._assert_formats(dict_object["formats"])
         # Add more assertions as needed...
         try:
             # function here to check if the snooze-till-graph-age-minutes
@@ -382,6 +447,7 @@ class TravHarvConfigBuilder:
         travharvconfig = {
             "configname": name_config,
             "NSM": self.NSM,
+            "formats": dict_object.get("formats"),
             "tasks": [
                 TravHarvTask(
                     {
@@ -1,4 +1,5 @@
 import logging
+import threading
 from datetime import datetime
 from pathlib import Path
 from typing import List
@@ -27,6 +28,7 @@ class GraphAdditionReport:
     - the graph added
     - type of document added : text/turtle or application/ld+json or etc.
     - triple count of the graph added
+    - outcome of the download : ok or why it was (partly) skipped
     """
 
     def __init__(
@@ -34,6 +36,7 @@ class GraphAdditionReport:
         download_url: str,
         mime_type: str,
         triple_count: int,
+        outcome: str = "ok",
     ):
         """constructor
 
@@ -41,10 +44,12 @@ class GraphAdditionReport:
         :param graph: str
         :param mime_type: str
         :param triple_count: int
+        :param outcome: str (e.g. ok, maxBytesExceeded, maxSecondsExceeded)
         """
         self.download_url = download_url
         self.mime_type = mime_type
         self.triple_count = triple_count
+        self.outcome = outcome
         self.id = uuid4()
         log.debug("GraphAdditionReport initialized")
 
@@ -101,6 +106,7 @@ class TaskExecutionReport:
     A class to represent a TaskExecutionReport.
     This class will report the results of the assertions per task.
     e.g.: All AssertionReports will be stored in a dictionary
+    AssertionReports can safely be added from multiple threads.
     """
 
     def __init__(
@@ -116,6 +122,7 @@ class TaskExecutionReport:
             "last_mod": timestamp(),
         }
         self.assertion_reports = []
+        self._lock = threading.Lock()
 
     def add_path_assertion_report(self, assertion_report: PathAssertionReport):
         """
@@ -130,8 +137,9 @@ class TaskExecutionReport:
         log.debug(f"Assertion Report ID: {assertion_report_id}")
         log.debug(f"Last Modified: {last_mod}")
 
-        self.assertion_reports.append(assertion_report)
-        self.report_content["last_mod"] = last_mod
+        with self._lock:
+            self.assertion_reports.append(assertion_report)
+            self.report_content["last_mod"] = last_mod
 
 
 class ExecutionReport:
@@ -152,9 +160,18 @@ class ExecutionReport:
             "last_mod": timestamp(),
             "config_name": config_name,
             "id": uuid4(),
+            "fetch_stats": dict(),
         }
         self.task_reports = []
 
+    def set_fetch_stats(self, fetch_stats: dict):
+        """
+        Set the counters of the fetching done for this config
+        (e.g. {"cacheHits": 12}) to be included in the report.
+        """
+        log.debug(f"Fetch stats: {fetch_stats}")
+        self.report_content["fetch_stats"] = dict(fetch_stats)
+
     def add_task_report(self, task_execution_report: TaskExecutionReport):
         """
         Report the results of the assertions to the store.
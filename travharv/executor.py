@@ -1,9 +1,27 @@
 import logging
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from functools import partial
+from itertools import islice
+from typing import List
 
 from travharv.config_build import TravHarvConfig
 from travharv.execution_report import ExecutionReport, TaskExecutionReport
-from travharv.path_assertion import SubjPropPathAssertion
+from travharv.helper import Deadline
+from travharv.path_assertion import (
+    TRAVERSALS,
+    PathTrieAssertion,
+    SubjPropPathAssertion,
+)
 from travharv.store import RDFStoreAccess
+from travharv.web_discovery import (
+    DEFAULT_FORMATS,
+    AsyncDereferencer,
+    DereferenceMemo,
+    WebFetcher,
+    accept_header,
+)
+from travharv.working_graph import WorkingGraphAccess
 
 log = logging.getLogger(__name__)
 
@@ -21,6 +39,19 @@ class TravHarvExecutor:
         NSM: TravHarvConfig.NSM,
         tasks: list,
         rdf_store_access: RDFStoreAccess,
+        fetcher: WebFetcher = None,
+        memo: DereferenceMemo = None,
+        max_concurrency: int = 1,
+        max_per_host: int = 4,
+        jobs: int = 1,
+        formats: List[str] = None,
+        html_scripts: bool = True,
+        deadline: Deadline = None,
+        task_timeout: float = None,
+        verify_batch_size: int = 100,
+        traversal: str = "depth",
+        max_fanout: int = 100,
+        working_graph: bool = False,
     ):
         """constructor
 
@@ -28,17 +59,97 @@ class TravHarvExecutor:
         :param NSM: dict
         :param tasks: list
         :param rdf_store_access: RDFStoreAccess
+        :param fetcher: (optional) the shared WebFetcher for this run,
+         if None a private one is used, released by close()
+        :param memo: (optional) the DereferenceMemo shared for this run
+        :param max_concurrency: max number of subjects dereferenced at once,
+         1 (the default) keeps the strictly sequential behaviour
+        :param max_per_host: max number of concurrent fetches per host
+        :param jobs: number of threads asserting subject/path pairs
+         in parallel, 1 (the default) asserts them one after the other
+        :param formats: the rdf mimetypes to ask for, in order of preference
+         - If None, DEFAULT_FORMATS is used
+        :param html_scripts: harvest the rdf scripts embedded in html pages,
+         else only their head is scanned for links
+        :param deadline: the Deadline for this config, after which the
+         remaining assertions are skipped (and reported as such)
+        :param task_timeout: max number of seconds to spend per task
+        :param verify_batch_size: number of subjects whose paths are
+         verified together, in a single query per assertion path
+        :param traversal: how the assertion paths are traversed,
+         one of TRAVERSALS:
+         - "depth" (the default) follows a single object per hop
+         - "frontier" goes breadth-first, following all objects per hop,
+         along the trie of the paths (so shared hops are traversed once)
+        :param max_fanout: max number of nodes followed per hop
+         in the frontier traversal
+        :param working_graph: check the paths in a local working graph,
+         seeded from the store per batch of subjects, and write the
+         harvested triples back to the store in bulk at the end of each task
+         (only for paths of which each part is a plain iri)
         """
         self.config_filename = config_filename
         self.NSM = NSM
         self.tasks = tasks
         self.rdf_store_access = rdf_store_access
+        self._owns_fetcher = fetcher is None
+        self.fetcher = fetcher or WebFetcher()
+        self.memo = memo or DereferenceMemo()
+        self._fetch_stats_at_start = self.fetcher.stats_snapshot()
+        self.jobs = max(1, jobs)
+        self.formats = formats or DEFAULT_FORMATS
+        self.html_scripts = html_scripts
+        self.deadline = deadline or Deadline()
+        self.task_timeout = task_timeout
+        self.verify_batch_size = max(1, verify_batch_size)
+        if traversal not in TRAVERSALS:
+            raise ValueError(f"unknown {traversal=}")
+        self.traversal = traversal
+        self.max_fanout = max_fanout
+        self.dereferencer = None
+        if max_concurrency > 1:
+            self.dereferencer = AsyncDereferencer(
+                self.fetcher, max_concurrency, max_per_host
+            )
+        # the store the paths are checked in
+        self.path_store = self.rdf_store_access
+        if working_graph:
+            self._use_working_graph()
         self.execution_report = ExecutionReport(config_filename)
         log.debug("TravHarvExecutor initialized")
         log.debug(f"Config filename: {self.config_filename}")
         log.debug(f"NSM set: {self.NSM}")
         log.debug(f"Tasks: {self.tasks}")
 
+    def close(self):
+        """
+        Release the private fetcher (a shared one is left open).
+        """
+        if self._owns_fetcher:
+            self.fetcher.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _use_working_graph(self):
+        """
+        Check the paths in a local working graph instead of the store,
+        if it can be seeded for the paths of all tasks.
+        """
+        for task in self.tasks:
+            if not WorkingGraphAccess.supports(task.assert_path_set.trie):
+                log.warning(
+                    f"not using a working graph for {self.config_filename}, "
+                    f"not all paths can be seeded for task {task}"
+                )
+                return
+        self.path_store = WorkingGraphAccess(
+            self.rdf_store_access, batch_size=self.verify_batch_size
+        )
+
     def assert_all_paths(self):
         """
         Assert all paths for all subjects given for each task per config.
@@ -47,50 +158,255 @@ class TravHarvExecutor:
             """Asserting all paths for all
                subjects given for each task per config"""
         )
-        for task in self.tasks:
-            task_execution_report = TaskExecutionReport()
-            log.debug(f"Task: {task}")
-            # check if subject is a URI or a SPARQL query
-            log.debug(f"Info task: {task}")
-            subject_definition = task.subject_definition
-            assertion_path_set = task.assert_path_set
-            log.debug(f"Subject definition: {subject_definition}")
-            log.debug(f"Assertion path set: {assertion_path_set}")
-            for subject in subject_definition.list_subjects():
-                log.debug(f"Subject: {subject}")
-                for (
-                    assertion_path
-                ) in assertion_path_set.list_assertion_paths():
-                    log.debug(f"Assertion path: {str(assertion_path)}")
-                    try:
-                        SubjPropPathAssertion(
-                            subject,
-                            assertion_path,
-                            self.rdf_store_access,
-                            self.NSM,
-                            self.config_filename,
-                            task_execution_report,
-                        )
-                    except Exception as e:
-                        log.error(
-                            f"""
-                            {subject} has an error: {e}
-                            for assertion path: {assertion_path}
-                            """
-                        )
-                        log.exception(e)
-                    finally:
-                        log.debug(
-                            f"Assertion path: {str(assertion_path)} asserted"
+        pool = None
+        if self.jobs > 1:
+            pool = ThreadPoolExecutor(max_workers=self.jobs)
+        with pool or nullcontext():
+            for task in self.tasks:
+                self._assert_task(task, pool)
+
+        log.debug("All paths asserted for all tasks")
+
+    def _assert_task(self, task, pool: ThreadPoolExecutor = None):
+        """
+        Assert all paths for all subjects given for a single task.
+        """
+        task_execution_report = TaskExecutionReport()
+        log.debug(f"Task: {task}")
+        # check if subject is a URI or a SPARQL query
+        log.debug(f"Info task: {task}")
+        subject_definition = task.subject_definition
+        assertion_path_set = task.assert_path_set
+        log.debug(f"Subject definition: {subject_definition}")
+        log.debug(f"Assertion path set: {assertion_path_set}")
+        deadline = Deadline(self.task_timeout, parent=self.deadline)
+        subjects = iter(subject_definition.list_subjects())
+        try:
+            while batch := list(islice(subjects, self.verify_batch_size)):
+                self._seed(batch, assertion_path_set, deadline)
+                verified, verified_at = dict(), None
+                size, rest = self.chunk_size, batch
+                while chunk := rest[:size]:
+                    if verified_at != self.path_store.inserts:
+                        # the inserts for the previous chunks may satisfy
+                        # the paths of the rest of the batch, so verify again
+                        verified_at = self.path_store.inserts
+                        verified = self._verify_batch(
+                            rest, assertion_path_set, deadline
                         )
+                    rest = rest[size:]
+                    if not deadline.expired:
+                        self._prefetch(chunk)
+                    self._assert_chunk(
+                        chunk,
+                        assertion_path_set,
+                        task_execution_report,
+                        deadline,
+                        pool,
+                        verified,
+                        verified_at,
+                    )
+        finally:
+            if isinstance(self.path_store, WorkingGraphAccess):
+                self.path_store.write_back()
+        if deadline.expired:
+            log.warning(
+                f"deadline expired for task {task} of "
+                f"{self.config_filename}, remaining assertions were skipped"
+            )
 
-            # TODO figure out if the task_execution_report object
-            # is a pointer or a copy of the object
-            # so add_task_report can be done earlier
-            # and the report can happen per assertion basis
-            # and not per task basis
-            self.execution_report.add_task_report(task_execution_report)
-            self.execution_report.report_to_store(self.rdf_store_access)
-            log.debug(f"All paths asserted for task: {task}")
+        # TODO figure out if the task_execution_report object
+        # is a pointer or a copy of the object
+        # so add_task_report can be done earlier
+        # and the report can happen per assertion basis
+        # and not per task basis
+        self.execution_report.add_task_report(task_execution_report)
+        self.execution_report.set_fetch_stats(
+            self.fetcher.stats_snapshot() - self._fetch_stats_at_start
+        )
+        self.execution_report.report_to_store(self.rdf_store_access)
+        host_windows = self.fetcher.host_windows()
+        if host_windows:
+            log.info(f"concurrency window per host: {host_windows}")
+        open_hosts = self.fetcher.open_hosts()
+        if open_hosts:
+            log.warning(f"failing fast for unavailable hosts: {open_hosts}")
+        log.debug(f"All paths asserted for task: {task}")
 
-        log.debug("All paths asserted for all tasks")
+    @property
+    def chunk_size(self) -> int:
+        """number of subjects that get dereferenced together
+        (and thus kept in memory together) before asserting their paths
+        """
+        concurrency = self.jobs
+        if self.dereferencer is not None:
+            concurrency = max(concurrency, self.dereferencer.max_concurrency)
+        return concurrency * 4
+
+    def _prefetch(self, subjects: list) -> None:
+        """
+        Dereference the given subjects all at once (if concurrency is enabled)
+        and keep the results in the memo, ready for the path assertions
+
+        :param subjects: list
+        """
+        if self.dereferencer is None:
+            return
+        accept = accept_header(self.formats)
+        uris = [
+            str(subject)
+            for subject in subjects
+            if not self.memo.lookup(str(subject), accept)[0]
+        ]
+        results = self.dereferencer.dereference_all(
+            uris, self.formats, self.html_scripts
+        )
+        for uri, result in results.items():
+            self.memo.put(uri, accept, result)
+
+    def _seed(self, subjects: list, assertion_path_set, deadline: Deadline):
+        """
+        Seed the working graph (if used) with the triples the store
+        holds along the paths of the assertion_path_set for the subjects.
+
+        :param subjects: list
+        """
+        if not isinstance(self.path_store, WorkingGraphAccess):
+            return
+        if deadline.expired:
+            return
+        self.path_store.seed(subjects, assertion_path_set.trie, self.NSM)
+
+    def _verify_batch(
+        self, subjects: list, assertion_path_set, deadline: Deadline
+    ) -> dict:
+        """
+        Verify all paths of the assertion_path_set for a batch of subjects,
+        with a single query per assertion path (instead of one per subject).
+        Subjects that could not be verified in batch are left out,
+        their assertions query the store themselves.
+        The verdicts hold until the next insert: the rest of the batch is
+        verified again before each chunk that follows an insert,
+        and within a chunk the subjects after an insert query themselves.
+
+        :param subjects: list
+        :return: the objects reached per assertion path, subject and depth
+        :rtype: dict
+        """
+        verified = dict()
+        if deadline.expired or self.traversal != "depth":
+            return verified
+        uris = [
+            str(subject) for subject in subjects if isinstance(subject, str)
+        ]
+        for assertion_path in assertion_path_set.list_assertion_paths():
+            property_paths = {
+                length: assertion_path.get_path_for_depth(length)
+                for length in range(assertion_path.get_max_size(), 0, -1)
+            }
+            try:
+                verified[assertion_path] = (
+                    self.path_store.select_objects_for_ppaths_batch(
+                        uris, property_paths, self.NSM
+                    )
+                )
+            except Exception as e:
+                log.warning(
+                    f"could not verify {len(uris)} subjects in batch "
+                    f"for assertion path: {assertion_path}, "
+                    f"verifying them one by one: {e}"
+                )
+        return verified
+
+    def _assert_chunk(
+        self,
+        subjects: list,
+        assertion_path_set,
+        task_execution_report,
+        deadline: Deadline,
+        pool: ThreadPoolExecutor = None,
+        verified: dict = None,
+        verified_at: int = None,
+    ):
+        """
+        Assert all paths of the assertion_path_set for all given subjects.
+        The independent subject/path pairs run on the pool if one is given.
+        The verified objects are used as long as the store holds
+        the number of inserts it was verified at.
+        """
+        verified = verified or dict()
+        assertion_paths = assertion_path_set.list_assertion_paths()
+        if self.traversal == "frontier":
+            # all paths at once, so the hops they share are traversed once
+            assertion_paths = [assertion_path_set.trie]
+        work = [
+            partial(
+                self._assert_subject_path,
+                subject,
+                assertion_path,
+                task_execution_report,
+                deadline,
+                verified.get(assertion_path, dict()).get(str(subject)),
+                verified_at,
+            )
+            for subject in subjects
+            for assertion_path in assertion_paths
+        ]
+        if pool is None:
+            for assert_subject_path in work:
+                assert_subject_path()
+            return
+        # else
+        for future in [pool.submit(w) for w in work]:
+            future.result()
+
+    def _assert_subject_path(
+        self,
+        subject,
+        assertion_path,
+        task_execution_report,
+        deadline: Deadline = None,
+        objects: dict = None,
+        verified_at: int = None,
+    ):
+        """
+        Assert a single assertion path for a given subject
+        (or the trie of all paths, in the frontier traversal).
+        The objects verified in batch (if any) spare the first query,
+        unless triples got inserted since (at verified_at inserts).
+        """
+        log.debug(f"Subject: {subject}")
+        log.debug(f"Assertion path: {str(assertion_path)}")
+        if verified_at != self.path_store.inserts:
+            objects = None  # the store changed, so query again
+        assertion = partial(SubjPropPathAssertion, objects=objects)
+        if self.traversal == "frontier":
+            assertion = partial(
+                PathTrieAssertion,
+                max_fanout=self.max_fanout,
+                dereferencer=self.dereferencer,
+            )
+        try:
+            assertion(
+                subject,
+                assertion_path,
+                self.path_store,
+                self.NSM,
+                self.config_filename,
+                task_execution_report,
+                fetcher=self.fetcher,
+                memo=self.memo,
+                formats=self.formats,
+                html_scripts=self.html_scripts,
+                deadline=deadline,
+            )
+        except Exception as e:
+            log.error(
+                f"""
+                {subject} has an error: {e}
+                for assertion path: {assertion_path}
+                """
+            )
+            log.exception(e)
+        finally:
+            log.debug(f"Assertion path: {str(assertion_path)} asserted")
@@ -1,6 +1,9 @@
 import re
+import threading
+import time
+from contextlib import contextmanager
 from datetime import datetime, timezone
-from typing import Dict, List
+from typing import Dict, List, Optional
 
 from pyrdfstore.clean import check_valid_uri
 from rdflib import Graph, Namespace, URIRef
@@ -56,3 +59,63 @@ def resolve_ppaths(ppaths: List[str], nsm: NamespaceManager):
         " / ".join(resolve_uri(part, nsm).n3() for part in ppath_split(ppath))
         for ppath in ppaths
     ]
+
+
+class ReadWriteLock:
+    """lock allowing many concurrent readers or one single writer
+    (writers waiting get preference over new readers)
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writing = False
+        self._writers_waiting = 0
+
+    @contextmanager
+    def reading(self):
+        with self._cond:
+            while self._writing or self._writers_waiting > 0:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if self._readers == 0:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def writing(self):
+        with self._cond:
+            self._writers_waiting += 1
+            while self._writing or self._readers > 0:
+                self._cond.wait()
+            self._writers_waiting -= 1
+            self._writing = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writing = False
+                self._cond.notify_all()
+
+
+class Deadline:
+    """wall-clock deadline, expired when its own time is up
+    or when the one of its parent is (None seconds means no limit)
+    """
+
+    def __init__(
+        self, seconds: Optional[float] = None, parent: "Deadline" = None
+    ):
+        self.seconds = seconds
+        self.parent = parent
+        self._ends = None if seconds is None else time.monotonic() + seconds
+
+    @property
+    def expired(self) -> bool:
+        if self.parent is not None and self.parent.expired:
+            return True
+        return self._ends is not None and time.monotonic() >= self._ends
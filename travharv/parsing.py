@@ -0,0 +1,304 @@
+import logging
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from pathlib import Path
+from typing import IO, Any, Dict, List, Optional, Tuple, Union
+
+from rdflib import BNode, Dataset, Graph, Literal, URIRef
+from rdflib.namespace import XSD
+from rdflib.parser import InputSource
+from rdflib.term import Node
+
+try:
+    import pyoxigraph
+except ImportError:  # optional, only needed for the native parsers
+    pyoxigraph = None
+
+log = logging.getLogger(__name__)
+
+# the parsers to choose from, auto takes the native ones when installed
+PARSER_BACKENDS = ("auto", "rdflib", "oxigraph")
+
+# the formats (rdflib names and mimetypes) the native parsers handle,
+# json-ld stays with rdflib, its contexts are handled differently
+NATIVE_FORMATS = {
+    "turtle": "TURTLE",
+    "text/turtle": "TURTLE",
+    "nt": "N_TRIPLES",
+    "nt11": "N_TRIPLES",
+    "application/n-triples": "N_TRIPLES",
+    "nquads": "N_QUADS",
+    "application/n-quads": "N_QUADS",
+}
+
+# hints of literals explicitly typed as xsd:string, which the native
+# parsers do not tell apart from plain literals (where rdflib does)
+XSD_STRING_HINTS = (b"XMLSchema#string", b":string")
+
+# language tags holding capitals, which the native parsers lowercase
+# (where rdflib keeps them as written)
+MIXED_CASE_LANG = re.compile(rb"[\"']@[A-Za-z0-9-]*[A-Z]")
+
+# the formats holding quads, their graph names are dropped when parsing
+QUAD_FORMATS = {"nquads", "application/n-quads", "trig"}
+
+# what can be parsed: the (binary) content, a file or a json-ld document
+Source = Union[IO[bytes], bytes, Path, dict, list]
+Triple = Tuple[Node, Node, Node]
+
+
+def parse_into(
+    graph: Graph,
+    source: Source,
+    format: str,
+    public_id: str = None,
+    backend: str = "auto",
+) -> Graph:
+    """parse the source into the graph, with the native parsers
+    of pyoxigraph if installed (and the backend allows), else rdflib
+
+    :param graph: the graph to add the triples to
+    :type graph: rdflib.Graph
+    :param source: the content (file or bytes), the path of a file,
+     or an already loaded json-ld document
+    :type source: Source
+    :param format: the rdflib format (or mimetype) to parse as
+    :type format: str
+    :param public_id: (optional) the base uri of the content
+    :type public_id: str
+    :param backend: the parsers to use, one of PARSER_BACKENDS
+    :type backend: str
+    :returns: the graph
+    :rtype: rdflib.Graph
+    """
+    if backend != "rdflib" and pyoxigraph is not None:
+        native_format = NATIVE_FORMATS.get(format)
+        if native_format is not None and not _needs_rdflib(source):
+            try:
+                return _parse_native(graph, source, native_format, public_id)
+            except (SyntaxError, ValueError) as e:
+                log.debug(f"native parser failed ({e}), trying rdflib")
+                if hasattr(source, "seek"):
+                    source.seek(0)
+    if format in QUAD_FORMATS:
+        dataset = Dataset()
+        _parse_rdflib(dataset, source, format, public_id)
+        graph.addN((s, p, o, graph) for s, p, o, _ in dataset.quads())
+        return graph
+    # else
+    return _parse_rdflib(graph, source, format, public_id)
+
+
+def _parse_rdflib(
+    graph: Graph, source: Source, format: str, public_id: str = None
+) -> Graph:
+    if isinstance(source, Path):
+        return graph.parse(str(source), format=format, publicID=public_id)
+    if isinstance(source, (dict, list)):
+        return graph.parse(data=source, format=format, publicID=public_id)
+    # else
+    if isinstance(source, bytes):
+        source = BytesIO(source)
+    input_source = InputSource(system_id=public_id)
+    input_source.setByteStream(source)
+    input_source.setPublicId(public_id)
+    return graph.parse(source=input_source, format=format)
+
+
+def _parse_native(
+    graph: Graph, source: Source, native_format: str, public_id: str = None
+) -> Graph:
+    if isinstance(source, Path):
+        # relative iris resolve against the file, as rdflib does
+        public_id = public_id or source.resolve().as_uri()
+        source = dict(path=source)
+    else:
+        source = dict(input=source)
+    quads = pyoxigraph.parse(
+        format=getattr(pyoxigraph.RdfFormat, native_format),
+        base_iri=public_id,
+        rename_blank_nodes=True,  # labels are only unique per document
+        **source,
+    )
+    # the same nodes keep coming back, convert those only once
+    nodes: Dict[Any, Node] = dict()
+
+    def node(term) -> Node:
+        converted = nodes.get(term)
+        if converted is None:
+            converted = nodes[term] = _rdflib_term(term)
+        return converted
+
+    # all parsed before adding any, so a failing parse adds nothing
+    quads = [
+        (
+            node(quad.subject),
+            node(quad.predicate),
+            (
+                _rdflib_term(quad.object)
+                if isinstance(quad.object, pyoxigraph.Literal)
+                else node(quad.object)
+            ),
+            graph,
+        )
+        for quad in quads
+    ]
+    graph.addN(quads)
+    return graph
+
+
+def _has_hints(block: bytes) -> bool:
+    return (
+        any(hint in block for hint in XSD_STRING_HINTS)
+        or MIXED_CASE_LANG.search(block) is not None
+    )
+
+
+def _needs_rdflib(source: Source, chunk_size: int = 1024 * 1024) -> bool:
+    """check if the content might hold xsd:string typed literals
+    or mixed case language tags, which only rdflib keeps as written"""
+    if isinstance(source, bytes):
+        return _has_hints(source)
+    # else scan the file, chunk by chunk
+    stream = open(source, "rb") if isinstance(source, Path) else source
+    try:
+        tail = b""
+        while chunk := stream.read(chunk_size):
+            block = tail + chunk
+            if _has_hints(block):
+                return True
+            tail = block[-64:]  # hints spanning two chunks
+        return False
+    finally:
+        if isinstance(source, Path):
+            stream.close()
+        else:
+            stream.seek(0)
+
+
+def _rdflib_term(term) -> Node:
+    """the rdflib equivalent of the pyoxigraph term"""
+    if isinstance(term, pyoxigraph.NamedNode):
+        return URIRef(term.value)
+    if isinstance(term, pyoxigraph.BlankNode):
+        return BNode(term.value)
+    if not isinstance(term, pyoxigraph.Literal):
+        raise ValueError(f"rdflib does not support {term=}")
+    # else
+    if term.language:
+        return Literal(term.value, lang=term.language)
+    if term.datatype.value == str(XSD.string):
+        return Literal(term.value)  # rdflib keeps these plain
+    return Literal(term.value, datatype=URIRef(term.datatype.value))
+
+
+def parse_triples(
+    source: Source, format: str, public_id: str = None, backend: str = "auto"
+) -> List[Triple]:
+    """parse the source into a batch of triples (in a worker process)
+
+    :returns: the parsed triples
+    :rtype: List[Triple]
+    """
+    return list(parse_into(Graph(), source, format, public_id, backend))
+
+
+class ParserPool:
+    """
+    Pool of worker processes parsing rdf, so the cpu bound parsing
+    runs on all cores and out of the way of the threads doing the
+    network i/o. The workers send back the parsed triples in a batch.
+    Sources smaller than min_bytes are parsed in the calling thread,
+    as for those shipping them to a worker costs more than it gains.
+    Without workers all parsing is done in the calling thread.
+    Turtle, n-triples and n-quads are parsed natively with pyoxigraph
+    if installed, unless the backend is "rdflib" or the content seems
+    to type literals as xsd:string or to hold mixed case language tags
+    (which only rdflib keeps as written). Content the native parsers
+    fail on is parsed again with rdflib.
+    """
+
+    def __init__(
+        self,
+        workers: Optional[int] = 0,
+        min_bytes: int = 256 * 1024,
+        backend: str = "auto",
+    ):
+        """constructor
+
+        :param workers: number of worker processes,
+         0 to parse in the calling thread, None for one per cpu
+        :type workers: int
+        :param min_bytes: size from which sources go to the workers
+        :type min_bytes: int
+        :param backend: the parsers to use, one of PARSER_BACKENDS
+        :type backend: str
+        """
+        if backend not in PARSER_BACKENDS:
+            raise ValueError(f"unknown parser {backend=}")
+        if backend == "oxigraph" and pyoxigraph is None:
+            raise ImportError(
+                "the oxigraph parsers need pyoxigraph, "
+                "e.g. pip install pyoxigraph"
+            )
+        self.backend = backend
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.min_bytes = min_bytes
+        self._executor: Optional[ProcessPoolExecutor] = None
+        if self.workers > 0:
+            # spawn, forking a process that runs threads is not safe
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        log.debug(
+            f"ParserPool with {self.workers=} {self.min_bytes=} "
+            f"{self.backend=} native={pyoxigraph is not None}"
+        )
+
+    def _offload(self, source: Source) -> bool:
+        if self._executor is None:
+            return False
+        if isinstance(source, Path):
+            return source.stat().st_size >= self.min_bytes
+        if isinstance(source, bytes):
+            return len(source) >= self.min_bytes
+        if isinstance(source, (dict, list)):
+            return True  # json-ld documents are slow to parse anyhow
+        # else a file
+        size = source.seek(0, os.SEEK_END)
+        source.seek(0)
+        return size >= self.min_bytes
+
+    def parse(
+        self,
+        graph: Graph,
+        source: Source,
+        format: str,
+        public_id: str = None,
+    ) -> Graph:
+        """parse the source into the graph, see parse_into,
+        in a worker process if the source is big enough
+
+        :returns: the graph
+        :rtype: rdflib.Graph
+        """
+        if not self._offload(source):
+            return parse_into(graph, source, format, public_id, self.backend)
+        # else
+        if not isinstance(source, (Path, bytes, dict, list)):
+            source = source.read()
+        triples = self._executor.submit(
+            parse_triples, source, format, public_id, self.backend
+        ).result()
+        log.debug(f"worker parsed {len(triples)} triples of {public_id}")
+        graph.addN((s, p, o, graph) for s, p, o in triples)
+        return graph
+
+    def close(self) -> None:
+        """stops the worker processes"""
+        if self._executor is not None:
+            self._executor.shutdown()
@@ -1,22 +1,34 @@
 import logging
+from typing import Any, Dict, List
 from uuid import uuid4
 
 import rdflib
 import validators
 from rdflib.namespace import NamespaceManager
 
-from travharv.config_build import AssertPath
+from travharv.config_build import AssertPath, AssertPathTrie
 from travharv.execution_report import (
     GraphAdditionReport,
     PathAssertionReport,
     TaskExecutionReport,
 )
-from travharv.helper import timestamp
+from travharv.helper import Deadline, timestamp
 from travharv.store import RDFStoreAccess
-from travharv.web_discovery import get_graph_for_format
+from travharv.web_discovery import (
+    DEFAULT_FORMATS,
+    AsyncDereferencer,
+    DereferenceMemo,
+    DereferenceResult,
+    WebFetcher,
+    accept_header,
+    dereference,
+)
 
 log = logging.getLogger(__name__)
 
+# the ways to traverse an assertion path, see TravHarvExecutor
+TRAVERSALS = ("depth", "frontier")
+
 
 class SubjPropPathAssertion:
     """
@@ -32,6 +44,12 @@ class SubjPropPathAssertion:
         NSM: NamespaceManager,
         config_name: str,
         task_execution_report: TaskExecutionReport,
+        fetcher: WebFetcher = None,
+        memo: DereferenceMemo = None,
+        formats: List[str] = None,
+        html_scripts: bool = True,
+        deadline: Deadline = None,
+        objects: Dict[int, Any] = None,
     ):
         """
         Construct a SubjPropPathAssertion object.
@@ -43,6 +61,19 @@ class SubjPropPathAssertion:
         :param rdf_store_access: RDFStoreAccess
         :param NSM: dict
         :param config_name: str
+        :param task_execution_report: TaskExecutionReport
+        :param fetcher: (optional) the shared WebFetcher for this run
+        :param memo: (optional) the run-scoped DereferenceMemo,
+         consulted before hitting the network
+        :param formats: (optional) the rdf mimetypes to ask for,
+         in order of preference, defaults to DEFAULT_FORMATS
+        :param html_scripts: (optional) harvest the rdf scripts embedded
+         in html pages, else only their head is scanned for links
+        :param deadline: (optional) the Deadline after which the assertion
+         is given up (and reported as skipped)
+        :param objects: (optional) the objects reached by the path prefixes
+         (by their length) as queried up front for a batch of subjects,
+         so the first verification needs no query of its own
 
         """
         log.debug(subject)
@@ -59,29 +90,68 @@ class SubjPropPathAssertion:
         self.config_name = config_name
         self.succesful_assertion_depth = 0
         self.task_execution_report = task_execution_report
+        # a private fetcher (none shared given) is closed when done
+        self._owns_fetcher = fetcher is None
+        self.fetcher = fetcher or WebFetcher()
+        self.memo = memo or DereferenceMemo()
+        self.formats = formats or DEFAULT_FORMATS
+        self.accept = accept_header(self.formats)
+        self.html_scripts = html_scripts
+        self.deadline = deadline or Deadline()
+        self.skipped = False
         self.assertion_report_info = {
             "subject_uri": self.subject,
             "id": uuid4(),
         }
         self.bounced = False
         self.graph_reports = []
+        # objects reached by the path prefixes, None when (to be) queried
+        self._objects = objects
         # TODO: test if it is needed to really assert the path
         # During testing it came out that sometimes this is needed
         # since sometimes the subject is the beginning one for the path
         # and sometimes it is not
         # self._harvest_uri(self.subject)
-        self.assert_path()
+        try:
+            self.assert_path()
+            self._report()
+        finally:
+            if self._owns_fetcher:
+                self.fetcher.close()
+
+    def _report(self):
+        """
+        Report the outcome of the assertion to the task_execution_report.
+        """
+        self._report_path(
+            self.assertion_path,
+            self.succesful_assertion_depth,
+            self.assertion_report_info["id"],
+        )
+
+    def _report_path(self, assertion_path, succesful_assertion_depth, id):
+        """
+        Report the outcome for a single assertion path.
 
+        :param assertion_path: AssertPath
+        :param succesful_assertion_depth: the depth the path got asserted to
+        :param id: the id of the report
+        """
         # based on the self.successfull assertion depth determine
         # the property path that was successfull asserted
-        pp_for_report = self.assertion_path.get_path_for_depth(
-            self.succesful_assertion_depth
+        pp_for_report = assertion_path.get_path_for_depth(
+            succesful_assertion_depth
         )
         assertion_result = False
         message = f"Assertion failed, last path: {pp_for_report}"
-        if self.succesful_assertion_depth == self.max_depth:
+        if succesful_assertion_depth == assertion_path.get_max_size():
             assertion_result = True
             message = "Assertion successful"
+        elif self.skipped:
+            message = (
+                f"Assertion skipped, deadline expired, last path: "
+                f"{pp_for_report}"
+            )
 
         self.task_execution_report.add_path_assertion_report(
             PathAssertionReport(
@@ -89,7 +159,7 @@ class SubjPropPathAssertion:
                 assertion_path=pp_for_report,
                 assertion_result=assertion_result,
                 assertion_time=timestamp(),
-                id=self.assertion_report_info["id"],
+                id=id,
                 message=message,
                 graph_reports=self.graph_reports,
             )
@@ -142,6 +212,10 @@ class SubjPropPathAssertion:
         log.debug(f"Subject: {self.subject}")
         # Implement method to assert a property path for a given subject
         while self.depth <= self.max_depth:
+            if self.deadline.expired:
+                log.warning(f"deadline expired, skipping {self.subject}")
+                self.skipped = True
+                return
             # first check if last_succesful_depth is not
             # the same as the current depth
             # if it is not the same, then we have to assert the path
@@ -164,14 +238,11 @@ class SubjPropPathAssertion:
         log.debug(f"Subject: {self.subject}")
         log.debug(f"Depth: {self.path_length}")
         log.debug(f"""ppath: {self.path_for_depth}""")
-        if self.rdf_store_access.verify_path(
-            self.subject,
-            self.path_for_depth,
-            self.NSM,
-        ):
+        uri = self._objects_for_depths().get(self.path_length)
+        if uri is not None:
             if self.depth != self.max_depth:
                 log.debug("Subjects for property path assertion found")
-                self._harvest()
+                self._harvest(uri)
                 self.succesful_assertion_depth = self.depth
                 return
             log.debug("Path assertion successful")
@@ -185,36 +256,97 @@ class SubjPropPathAssertion:
 
         :param uri: str
         """
-        # TODO in a next update this will be config driven
-        MIMETYPES_TO_GET = {
-            "text/turtle",
-        }
-        # doubting if this is really needed
-        # here as a mimetype to get
-
         log.debug(f"Beginning harvesting of URI: {uri}")
 
-        for mimetype in MIMETYPES_TO_GET:
-            # do a get of the uri with the mimetype
-            graph = get_graph_for_format(uri, [mimetype])
-            log.debug(f"Graph: {graph}")
-            if graph is not None:
-                self.rdf_store_access.insert_for_config(
-                    graph, self.config_name
+        inserted = self.memo.inserted(uri, self.accept, self.config_name)
+        if inserted is not None:
+            log.debug(f"{uri=} already inserted")
+            self.fetcher.count("memoHits")
+            mime_type, triple_count = inserted
+            self.graph_reports.append(
+                GraphAdditionReport(
+                    download_url=uri,
+                    mime_type=mime_type,
+                    triple_count=triple_count,
                 )
-
+            )
+            return
+        # do a single content-negotiated get of the uri
+        result = self._dereference(uri)
+        log.debug(f"Graph: {result.graph}")
+        if result.graph is None:
+            log.debug(f"{uri=} did not return graph ({result.outcome})")
+            if result.outcome in (
+                "maxBytesExceeded",
+                "maxSecondsExceeded",
+                "hostUnavailable",
+            ):
+                # report the skipped download, so it can be looked into
                 self.graph_reports.append(
                     GraphAdditionReport(
                         download_url=uri,
-                        mime_type=mimetype,
-                        triple_count=len(graph),
+                        mime_type=result.mime_type,
+                        triple_count=0,
+                        outcome=result.outcome,
                     )
                 )
+            return
 
-            else:
-                log.debug(f"{uri=}, {mimetype=} did not return graph")
-                return
-        return
+        self.rdf_store_access.insert_for_config(result.graph, self.config_name)
+        self._objects = None  # the store changed, so query again
+        self.memo.mark_inserted(
+            uri,
+            self.accept,
+            self.config_name,
+            result.mime_type,
+            len(result.graph),
+        )
+        self.graph_reports.append(
+            GraphAdditionReport(
+                download_url=uri,
+                mime_type=result.mime_type,
+                triple_count=len(result.graph),
+                outcome=result.outcome,
+            )
+        )
+
+    def _dereference(self, uri) -> DereferenceResult:
+        """
+        Get the graph for a given uri in the configured formats,
+        taking it from the memo if it was dereferenced before
+
+        :param uri: str
+        """
+        found, result = self.memo.lookup(uri, self.accept)
+        if found:
+            log.debug(f"using memoized graph for {uri=}")
+            self.fetcher.count("memoHits")
+            return result
+        result = dereference(
+            uri,
+            self.formats,
+            fetcher=self.fetcher,
+            html_scripts=self.html_scripts,
+        )
+        self.memo.put(uri, self.accept, result)
+        return result
+
+    def _objects_for_depths(self):
+        """
+        Get the objects reached by the path prefixes still to be asserted
+        (from the current depth on) in a single query,
+        repeated only after new triples got inserted.
+        """
+        if self._objects is None:
+            self._objects = self.rdf_store_access.select_objects_for_ppaths(
+                self.subject,
+                {
+                    length: self.assertion_path.get_path_for_depth(length)
+                    for length in range(self.path_length, 0, -1)
+                },
+                self.NSM,
+            )
+        return self._objects
 
     @property
     def path_length(self):
@@ -239,19 +371,182 @@ class SubjPropPathAssertion:
         self.previous_bounce_depth = self.depth
         self.depth = 0
         self.bounced = True
+        self._objects = None
 
-    def _harvest(self):
+    def _harvest(self, uri):
         """
         Harvest the property path.
+
+        :param uri: the object reached by the path trajectory
         """
         log.debug("Harvesting the property path")
-        # get the uri to harvest by getting
-        # the first element of the path trajectory
-        uri = self.rdf_store_access.select_subjects_for_ppath(
-            self.subject,
-            self.path_for_depth,
-            self.NSM,
-        )[0]
-
         log.debug(f"uri: {self._subject_str_check(uri)}")
         self._harvest_uri(self._subject_str_check(uri))
+
+
+class PathTrieAssertion(SubjPropPathAssertion):
+    """
+    A class to represent the breadth-first assertion of all paths
+    of an AssertPathSet for a given subject, along their AssertPathTrie.
+    Hop by hop a deduplicated frontier of nodes is kept per trie node:
+    all its nodes are dereferenced (concurrently, if a dereferencer
+    is given), after which the objects reached through each next part
+    of the paths are selected, all in a single query per hop.
+    So all objects of multi-valued properties get followed,
+    up to max_fanout nodes per hop.
+    Only uris get dereferenced, but the objects are selected along
+    the path from the subject, so blank nodes are passed through.
+    As in the depth traversal, which harvests the object a path reaches
+    once it holds, the end objects of the paths are dereferenced too:
+    their descriptions are what the paths get asserted for.
+    The hops the paths share are traversed (queried and dereferenced)
+    once, while each path still gets its own PathAssertionReport
+    (listing the graphs added for the subject along all paths).
+    """
+
+    def __init__(
+        self,
+        subject: str,
+        path_trie: AssertPathTrie,
+        *args,
+        max_fanout: int = 100,
+        dereferencer: AsyncDereferencer = None,
+        **kwargs,
+    ):
+        """
+        Construct a PathTrieAssertion object.
+        Automatically asserts all paths in the trie for a given subject,
+        see SubjPropPathAssertion for the other arguments.
+
+        :param subject: str
+        :param path_trie: AssertPathTrie
+        :param max_fanout: (optional) max number of nodes followed per hop,
+         the rest (in order of their uri) is not dereferenced
+        :param dereferencer: (optional) the AsyncDereferencer to fetch
+         the nodes of a frontier with concurrently
+        """
+        self.max_fanout = max(1, max_fanout)
+        self.dereferencer = dereferencer
+        # the depth reached by each path, filled in while traversing
+        self.reached_depths = dict()
+        super().__init__(subject, path_trie, *args, **kwargs)
+
+    def assert_path(self):
+        """
+        Assert all paths in the trie for the subject, hop by hop.
+        Put the results in a RDFStoreAccess.
+        """
+        log.debug("Asserting a trie of property paths breadth-first")
+        log.debug(f"Subject: {self.subject}")
+        # the trie nodes reached, with their path and frontier
+        level = [(self.assertion_path, None, [rdflib.URIRef(self.subject)])]
+        visited = set()
+        while level:
+            if self.deadline.expired:
+                log.warning(f"deadline expired, skipping {self.subject}")
+                self.skipped = True
+                return
+            for trie_node, _, _ in level:
+                for assertion_path in trie_node.assert_paths:
+                    self.reached_depths[assertion_path] = self.depth
+            self._harvest_frontier(
+                [node for _, _, frontier in level for node in frontier],
+                visited,
+            )
+            children = [
+                (child, part if path is None else f"{path} / {part}")
+                for trie_node, path, _ in level
+                for part, child in trie_node.children.items()
+            ]
+            if not children:
+                break
+            reached = self.rdf_store_access.select_all_objects_for_ppaths(
+                self.subject,
+                {key: path for key, (_, path) in enumerate(children)},
+                self.NSM,
+            )
+            level = [
+                (child, path, frontier)
+                for key, (child, path) in enumerate(children)
+                if (frontier := self._next_frontier(reached[key]))
+            ]
+            if level:
+                self._increase_depth()
+        self.succesful_assertion_depth = self.depth
+
+    def _next_frontier(self, reached):
+        """
+        Get the deduplicated objects reached by the hop,
+        sorted (for a stable cut-off) and capped at max_fanout.
+
+        :param reached: the objects reached by the hop
+        """
+        reached = sorted(set(reached), key=str)
+        if len(reached) > self.max_fanout:
+            log.warning(
+                f"{len(reached)} nodes reached from {self.subject} "
+                f"after {self.depth + 1} hops, "
+                f"only following the first {self.max_fanout}"
+            )
+            reached = reached[: self.max_fanout]
+        return reached
+
+    def _harvest_frontier(self, frontier, visited):
+        """
+        Harvest the nodes of the frontier not visited before.
+
+        :param frontier: the nodes reached by the last hop
+        :param visited: the nodes harvested before, updated in place
+        """
+        uris = [uri for uri in self._uris(frontier) if uri not in visited]
+        visited.update(uris)
+        self._prefetch(uris)
+        for uri in uris:
+            try:
+                self._harvest_uri(uri)
+            except Exception as e:
+                # one failing node should not hold up the rest of the hop
+                log.error(f"could not harvest {uri=}: {e}")
+
+    def _uris(self, nodes):
+        """
+        Get the nodes that are uris, as str.
+        """
+        return [
+            str(node)
+            for node in nodes
+            if isinstance(node, rdflib.URIRef)
+            and self._subject_str_check(node)
+        ]
+
+    def _prefetch(self, uris):
+        """
+        Dereference the uris all at once (if a dereferencer is given)
+        and keep the results in the memo, ready to be harvested
+
+        :param uris: list
+        """
+        if self.dereferencer is None:
+            return
+        uris = [
+            uri for uri in uris if not self.memo.lookup(uri, self.accept)[0]
+        ]
+        if len(uris) < 2:
+            return
+        results = self.dereferencer.dereference_all(
+            uris, self.formats, self.html_scripts
+        )
+        for uri, result in results.items():
+            self.memo.put(uri, self.accept, result)
+
+    def _report(self):
+        """
+        Report the outcome of each path in the trie
+        to the task_execution_report.
+        """
+        for assertion_path in self.assertion_path.assert_paths:
+            self._report_path(
+                assertion_path,
+                self.reached_depths.get(assertion_path, 0),
+                uuid4(),
+            )
@@ -7,7 +7,9 @@ from pyrdfstore import RDFStore, create_rdf_store
 
 from travharv.config_build import TravHarvConfig, TravHarvConfigBuilder
 from travharv.executor import TravHarvExecutor
+from travharv.helper import Deadline
 from travharv.store import RDFStoreAccess
+from travharv.web_discovery import DereferenceMemo, WebFetcher
 
 log = logging.getLogger(__name__)
 
@@ -22,6 +24,20 @@ class TravHarv:
         self,
         config: str,
         target_store_info: Optional[List[str]] = None,
+        fetcher: Optional[WebFetcher] = None,
+        memo: Optional[DereferenceMemo] = None,
+        max_concurrency: int = 1,
+        max_per_host: int = 4,
+        jobs: int = 1,
+        html_scripts: bool = True,
+        run_timeout: Optional[float] = None,
+        config_timeout: Optional[float] = None,
+        task_timeout: Optional[float] = None,
+        http_backend: str = "requests",
+        verify_batch_size: int = 100,
+        traversal: str = "depth",
+        max_fanout: int = 100,
+        working_graph: bool = False,
     ):
         """Assert all paths for given subjects.
         Given a configuration file, assert all paths
@@ -33,6 +49,58 @@ class TravHarv:
         :param target_store_info: (optional) The target store information.
          - If None, a memory store will be used.
         :type target_store_info: List[str]
+        :param fetcher: (optional) The http client shared by the whole run.
+         - If None, a WebFetcher with default pooling and retries is used,
+           released by close().
+        :type fetcher: WebFetcher
+        :param memo: (optional) The memo of dereferenced uris for the run,
+         shared across all tasks and configs.
+         - If None, a DereferenceMemo with default bounds is used.
+        :type memo: DereferenceMemo
+        :param max_concurrency: (optional) The max number of subjects
+         that are dereferenced concurrently.
+         - If 1 (the default), subjects are dereferenced one by one.
+        :type max_concurrency: int
+        :param max_per_host: (optional) The max number of concurrent
+         fetches to a single host.
+        :type max_per_host: int
+        :param jobs: (optional) The number of threads asserting
+         subject/path pairs in parallel.
+         - If 1 (the default), they are asserted one after the other.
+        :type jobs: int
+        :param html_scripts: (optional) Harvest the json-ld/turtle scripts
+         embedded in html pages.
+         - If False, only the head of html pages is scanned for links.
+        :type html_scripts: bool
+        :param run_timeout: (optional) Max number of seconds for the whole
+         run, after which the remaining assertions are skipped
+         (and reported as such).
+         - If None, there is no limit.
+        :type run_timeout: float
+        :param config_timeout: (optional) Max number of seconds per config.
+        :type config_timeout: float
+        :param task_timeout: (optional) Max number of seconds per task.
+        :type task_timeout: float
+        :param http_backend: (optional) The http client the default
+         fetcher sends with: "requests" or "httpx" (HTTP/2, brotli/zstd).
+         - Ignored when a fetcher is given.
+        :type http_backend: str
+        :param verify_batch_size: (optional) The number of subjects
+         whose paths are verified together in a single query.
+        :type verify_batch_size: int
+        :param traversal: (optional) How the assertion paths are traversed.
+         - "depth" (the default) follows a single object per hop.
+         - "frontier" goes breadth-first, following all objects per hop,
+           traversing the hops shared by several paths only once.
+        :type traversal: str
+        :param max_fanout: (optional) The max number of nodes followed
+         per hop in the frontier traversal.
+        :type max_fanout: int
+        :param working_graph: (optional) Check the paths in a local
+         working graph, seeded from the target store, and write the
+         harvested triples back in bulk at the end of each task.
+         - If False (the default), each check queries the target store.
+        :type working_graph: bool
         """
 
         log.debug(f"config for travharv service set to {config=}")
@@ -40,7 +108,10 @@ class TravHarv:
 
         log.debug(f"creating core store with {target_store_info=}")
         core_store: RDFStore = create_rdf_store(*target_store_info)
-        self.target_store = RDFStoreAccess(core_store)
+        # memory stores evaluate with rdflib, so take prepared queries
+        self.target_store = RDFStoreAccess(
+            core_store, prepared_queries=not target_store_info
+        )
 
         if Path(self.config).is_dir():
             self.travharv_config_builder = TravHarvConfigBuilder(
@@ -52,10 +123,62 @@ class TravHarv:
             self.travharv_config_builder = TravHarvConfigBuilder(
                 self.target_store, self.config_folder
             )
+        self._owns_fetcher = fetcher is None
+        self.fetcher = fetcher or WebFetcher(backend=http_backend)
+        self.memo = memo or DereferenceMemo()
+        self.max_concurrency = max_concurrency
+        self.max_per_host = max_per_host
+        self.jobs = jobs
+        self.html_scripts = html_scripts
+        self.run_timeout = run_timeout
+        self.config_timeout = config_timeout
+        self.task_timeout = task_timeout
+        self.verify_batch_size = verify_batch_size
+        self.traversal = traversal
+        self.max_fanout = max_fanout
+        self.working_graph = working_graph
+        self.run_deadline = Deadline(run_timeout)
         self.travharvexecutor = None
         self.error_occurred = False
 
+    def close(self):
+        """Release the connections of the fetcher the service created,
+        saving what it learned for the next run (a given one is left open).
+        """
+        if self._owns_fetcher:
+            self.fetcher.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _make_executor(
+        self, trav_harv_config: TravHarvConfig
+    ) -> TravHarvExecutor:
+        return TravHarvExecutor(
+            trav_harv_config.configname,
+            trav_harv_config.NSM,
+            trav_harv_config.tasks,
+            self.target_store,
+            fetcher=self.fetcher,
+            memo=self.memo,
+            max_concurrency=self.max_concurrency,
+            max_per_host=self.max_per_host,
+            jobs=self.jobs,
+            formats=trav_harv_config.formats,
+            html_scripts=self.html_scripts,
+            deadline=Deadline(self.config_timeout, parent=self.run_deadline),
+            task_timeout=self.task_timeout,
+            verify_batch_size=self.verify_batch_size,
+            traversal=self.traversal,
+            max_fanout=self.max_fanout,
+            working_graph=self.working_graph,
+        )
+
     def process(self):
+        self.run_deadline = Deadline(self.run_timeout)
         try:
             log.debug("running dereference tasks")
             trav_harv_config: Optional[TravHarvConfig] = None
@@ -73,11 +196,8 @@ class TravHarv:
                     if trav_harv_config is None:
                         continue
 
-                    self.travharvexecutor = TravHarvExecutor(
-                        trav_harv_config.configname,
-                        trav_harv_config.NSM,
-                        trav_harv_config.tasks,
-                        self.target_store,
+                    self.travharvexecutor = self._make_executor(
+                        trav_harv_config
                     )
                     self.travharvexecutor.assert_all_paths()
             else:
@@ -90,12 +210,7 @@ class TravHarv:
                         f"No configuration found with name: {self.config}"
                     )
                     return
-                self.travharvexecutor = TravHarvExecutor(
-                    trav_harv_config.configname,
-                    trav_harv_config.NSM,
-                    trav_harv_config.tasks,
-                    self.target_store,
-                )
+                self.travharvexecutor = self._make_executor(trav_harv_config)
                 self.travharvexecutor.assert_all_paths()
         except Exception as e:
             log.error(e)
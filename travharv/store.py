@@ -1,14 +1,18 @@
 import logging
+import threading
 from pathlib import Path
-from typing import Iterable, List
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 
 from pyrdfj2 import J2RDFSyntaxBuilder
 from pyrdfstore import GraphNameMapper, RDFStore
-from pyrdfstore.store import RDFStoreDecorator
-from rdflib import Graph
+from pyrdfstore.store import MemoryRDFStore, RDFStoreDecorator
+from rdflib import Graph, URIRef
+from rdflib.plugins.sparql import prepareQuery
+from rdflib.plugins.sparql.parserutils import CompValue
 from rdflib.plugins.sparql.processor import Result
+from rdflib.plugins.sparql.sparql import Query
 
-from travharv.helper import resolve_sparql
+from travharv.helper import ReadWriteLock, resolve_sparql
 
 log = logging.getLogger(__name__)
 
@@ -21,18 +25,144 @@ QUERY_BUILDER: J2RDFSyntaxBuilder = J2RDFSyntaxBuilder(
 # The default URN BASE fopr travharv
 DEFAULT_URN_BASE = "urn:traversal-harvesting:"
 
+# The subject the path queries are compiled with, to be bound to others
+SUBJECT_PLACEHOLDER = f"{DEFAULT_URN_BASE}subject"
+_PLACEHOLDER_TERM = URIRef(SUBJECT_PLACEHOLDER)
+
+
+def _bind_subjects(part, subjects: List[URIRef]):
+    """copy of the (query algebra) part with the placeholder bound
+    to the subjects, rows of VALUES blocks take one or more subjects,
+    terms elsewhere just one (only the parts changing get copied)
+    """
+    if isinstance(part, CompValue) and part.name == "values":
+        res = [
+            {
+                var: subject if term == _PLACEHOLDER_TERM else term
+                for var, term in row.items()
+            }
+            for row in part.res
+            for subject in subjects
+        ]
+        return CompValue(part.name, **dict(part, res=res))
+    if isinstance(part, CompValue):
+        bound = {
+            key: _bind_subjects(val, subjects) for key, val in part.items()
+        }
+        if all(bound[key] is val for key, val in part.items()):
+            return part
+        return CompValue(part.name, **bound)
+    if isinstance(part, (list, tuple)):
+        bound = [_bind_subjects(val, subjects) for val in part]
+        if all(new is val for new, val in zip(bound, part)):
+            return part
+        return type(part)(bound)
+    if isinstance(part, URIRef) and part == _PLACEHOLDER_TERM:
+        if len(subjects) != 1:
+            raise ValueError("only VALUES blocks take more than one subject")
+        return subjects[0]
+    return part
+
+
+class PathQuery:
+    """
+    A path query, rendered once from its template (with the prefixes
+    of the config resolved) for SUBJECT_PLACEHOLDER as the subject.
+    It is bound to the subjects of each call either as query text,
+    for any store, or as an rdflib prepared query that is parsed once,
+    for stores evaluating queries in memory.
+    Only templates taking the subjects in a VALUES block can be bound
+    to more than one subject at once.
+    """
+
+    def __init__(self, sparql: str):
+        """constructor
+
+        :param sparql: the query, with SUBJECT_PLACEHOLDER as the subject
+        :type sparql: str
+        """
+        self.sparql = sparql
+        self._prepared: Optional[Query] = None
+
+    def text(self, subjects: Iterable[str]) -> str:
+        """the query text, bound to the subjects
+
+        :param subjects: the uris of the subjects
+        :type subjects: Iterable[str]
+        :rtype: str
+        """
+        values = " ".join(f"<{subject}>" for subject in subjects)
+        return self.sparql.replace(f"<{SUBJECT_PLACEHOLDER}>", values)
+
+    def prepared(self, subjects: Iterable[str]) -> Query:
+        """the prepared query, bound to the subjects
+
+        :param subjects: the uris of the subjects
+        :type subjects: Iterable[str]
+        :rtype: Query
+        """
+        if self._prepared is None:
+            self._prepared = prepareQuery(self.sparql)
+        return Query(
+            self._prepared.prologue,
+            _bind_subjects(
+                self._prepared.algebra, [URIRef(s) for s in subjects]
+            ),
+        )
+
 
 class RDFStoreAccess(RDFStoreDecorator):
-    """Decorator class adding some trav-harv specific features"""
+    """Decorator class adding some trav-harv specific features
+
+    Access is made safe for concurrent use by multiple threads:
+    selects can run in parallel, while inserts are serialized
+    (and never overlap with running selects).
+
+    The inserts are counted, so results selected before
+    can be told to be stale (see inserts).
+
+    The path queries are rendered once per template and path,
+    see PathQuery. With prepared_queries they are also parsed only once,
+    if the store takes them (memory stores, which evaluate with rdflib).
+    """
 
     def __init__(
         self,
         core: RDFStore,
         name_mapper: GraphNameMapper = GraphNameMapper(base=DEFAULT_URN_BASE),
+        prepared_queries: bool = False,
     ):
         super().__init__(core)
         self._qryBuilder = QUERY_BUILDER
         self._nmapper = name_mapper
+        self._lock = ReadWriteLock()
+        # number of inserts done through this access
+        self.inserts = 0
+        self.prepared_queries = prepared_queries and self._takes_prepared(core)
+        if prepared_queries and not self.prepared_queries:
+            log.warning(
+                f"{type(core).__name__} does not take prepared queries, "
+                "sending query text instead"
+            )
+        self._path_queries: Dict[tuple, Tuple[Any, PathQuery]] = dict()
+        self._path_queries_lock = threading.Lock()
+
+    @staticmethod
+    def _takes_prepared(core: RDFStore) -> bool:
+        """if the (decorated) core store evaluates with rdflib,
+        so it takes prepared queries"""
+        while isinstance(core, RDFStoreDecorator):
+            core = core._core
+        return isinstance(core, MemoryRDFStore)
+
+    def select(self, *args, **kwargs):
+        with self._lock.reading():
+            return super().select(*args, **kwargs)
+
+    def insert(self, *args, **kwargs):
+        with self._lock.writing():
+            self.inserts += 1
+            return super().insert(*args, **kwargs)
 
     def select_subjects(self, sparql) -> List[str]:
         result: Result = self.select(sparql)
@@ -43,28 +173,204 @@ class RDFStoreAccess(RDFStoreDecorator):
         log.debug(f"list_of_subjects: {list_of_subjects}")
         return list_of_subjects
 
-    def select_subjects_for_ppath(self, subject, property_path, NSM):
+    def _path_query(self, template: str, NSM, **params) -> PathQuery:
+        """the PathQuery for the template and params, rendered only once"""
+        # the NSM is kept along in the cache, so its id can not be reused
+        key = (template, id(NSM), tuple(sorted(map(repr, params.items()))))
+        cached = self._path_queries.get(key)
+        if cached is not None:
+            return cached[1]
+        # else
         pre_sparql = self._qryBuilder.build_syntax(
+            template,
+            subject=SUBJECT_PLACEHOLDER,
+            subjects=[SUBJECT_PLACEHOLDER],
+            **params,
+        )
+        path_query = PathQuery(resolve_sparql(pre_sparql, NSM))
+        log.debug(f"compiled {template} into {path_query.sparql=}")
+        with self._path_queries_lock:
+            return self._path_queries.setdefault(key, (NSM, path_query))[1]
+
+    def select_path(
+        self, template: str, subjects: List[str], NSM, **params
+    ) -> Result:
+        """selects with the path query of the template,
+        bound to the subjects
+
+        :param template: the name of the path query template
+        :type template: str
+        :param subjects: the uris of the subjects
+        :type subjects: List[str]
+        :param NSM: the namespaces to resolve the paths with
+        :type NSM: NamespaceManager
+        :param params: the other parameters of the template
+        :return: the result of the query
+        :rtype: Result
+        """
+        path_query = self._path_query(template, NSM, **params)
+        if self.prepared_queries:
+            return self.select(path_query.prepared(subjects))
+        return self.select(path_query.text(subjects))
+
+    def select_subjects_for_ppath(self, subject, property_path, NSM):
+        result: Result = self.select_path(
             "trajectory.sparql",
-            subject=subject,
+            [subject],
+            NSM,
             property_trajectory=property_path,
         )
-        sparql = resolve_sparql(pre_sparql, NSM)
-        log.debug(f"{sparql=}")
-        return self.select_subjects(sparql)
+        list_of_subjects = [row[0] for row in result]
+        log.debug(f"length list_of_subjects: {len(list_of_subjects)}")
+        return list_of_subjects
 
     def verify_path(self, subject, property_path, NSM):
-        pre_sparql = self._qryBuilder.build_syntax(
+        result: Result = self.select_path(
             "trajectory.sparql",
-            subject=subject,
+            [subject],
+            NSM,
             property_trajectory=property_path,
         )
-        sparql = resolve_sparql(pre_sparql, NSM)
-        result: Result = self.select(sparql)
 
         list_of_bindings = [row for row in result]
         return bool(len(list_of_bindings) > 0)
 
+    def select_objects_for_ppaths(
+        self, subject, property_paths: Dict[int, str], NSM
+    ) -> Dict[int, Any]:
+        """checks all property paths from the subject in one query
+
+        :param subject: the uri of the subject
+        :type subject: str
+        :param property_paths: the property paths to check, by depth
+        :type property_paths: Dict[int, str]
+        :param NSM: the namespaces to resolve the paths with
+        :type NSM: NamespaceManager
+        :return: an object reached by the property path,
+         for each depth of which the path reaches one
+        :rtype: Dict[int, Any]
+        """
+        if not property_paths:
+            return dict()
+        result: Result = self.select_path(
+            "trajectories.sparql",
+            [subject],
+            NSM,
+            property_trajectories=property_paths,
+        )
+        objects = dict()
+        for row in result:
+            objects.setdefault(int(row[0]), row[1])
+        return objects
+
+    def select_objects_for_ppaths_batch(
+        self, subjects: List[str], property_paths: Dict[int, str], NSM
+    ) -> Dict[str, Dict[int, Any]]:
+        """checks all property paths from a batch of subjects in one query,
+        the subjects are bound through a VALUES block
+
+        :param subjects: the uris of the subjects
+        :type subjects: List[str]
+        :param property_paths: the property paths to check, by depth
+        :type property_paths: Dict[int, str]
+        :param NSM: the namespaces to resolve the paths with
+        :type NSM: NamespaceManager
+        :return: for each subject, an object reached by the property path
+         for each depth of which the path reaches one
+         (so the full path is satisfied if its depth is in there)
+        :rtype: Dict[str, Dict[int, Any]]
+        """
+        objects = {str(subject): dict() for subject in subjects}
+        if not objects or not property_paths:
+            return objects
+        for row in self._select_batch(list(objects), property_paths, NSM):
+            reached = objects.setdefault(str(row[0]), dict())
+            reached.setdefault(int(row[1]), row[2])
+        return objects
+
+    def select_all_objects_for_ppaths(
+        self, subject, property_paths: Dict[int, str], NSM
+    ) -> Dict[int, List[Any]]:
+        """selects all objects reached by each of the property paths
+        from the subject in one query
+
+        :param subject: the uri of the subject
+        :type subject: str
+        :param property_paths: the property paths to follow, by an int key
+        :type property_paths: Dict[int, str]
+        :param NSM: the namespaces to resolve the paths with
+        :type NSM: NamespaceManager
+        :return: for each key, all objects its path reaches
+        :rtype: Dict[int, List[Any]]
+        """
+        objects = {key: list() for key in property_paths}
+        if not objects:
+            return objects
+        for row in self._select_batch([str(subject)], property_paths, NSM):
+            objects[int(row[1])].append(row[2])
+        return objects
+
+    def select_next_hops(
+        self, subjects: List[str], property_path: str, NSM
+    ) -> Dict[str, List[Any]]:
+        """selects all objects reached by the property path
+        from a batch of subjects in one query
+
+        :param subjects: the uris of the subjects
+        :type subjects: List[str]
+        :param property_path: the property path to follow
+        :type property_path: str
+        :param NSM: the namespaces to resolve the path with
+        :type NSM: NamespaceManager
+        :return: for each subject, all objects the path reaches from it
+        :rtype: Dict[str, List[Any]]
+        """
+        objects = {str(subject): list() for subject in subjects}
+        if not objects:
+            return objects
+        for row in self._select_batch(list(objects), {1: property_path}, NSM):
+            objects.setdefault(str(row[0]), list()).append(row[2])
+        return objects
+
+    def select_chains(
+        self, subjects: List[str], property_paths: List[str], NSM
+    ) -> Dict[str, List[Tuple]]:
+        """selects the chains of nodes reached by following the property
+        paths one after the other from a batch of subjects in one query,
+        so blank nodes along the way come with what they lead to
+
+        :param subjects: the uris of the subjects
+        :type subjects: List[str]
+        :param property_paths: the property paths to follow, one per hop
+        :type property_paths: List[str]
+        :param NSM: the namespaces to resolve the paths with
+        :type NSM: NamespaceManager
+        :return: for each subject, the nodes reached per hop, per chain
+        :rtype: Dict[str, List[Tuple]]
+        """
+        chains = {str(subject): list() for subject in subjects}
+        if not chains:
+            return chains
+        result = self.select_path(
+            "trajectory_chains_batch.sparql",
+            list(chains),
+            NSM,
+            property_trajectories=list(property_paths),
+        )
+        for row in result:
+            chains.setdefault(str(row[0]), list()).append(tuple(row[1:]))
+        return chains
+
+    def _select_batch(
+        self, subjects: List[str], property_paths: Dict[int, str], NSM
+    ) -> Result:
+        return self.select_path(
+            "trajectories_batch.sparql",
+            subjects,
+            NSM,
+            property_trajectories=property_paths,
+        )
+
     def all_triples(self):
         return self.select("SELECT ?s ?p ?o WHERE { ?s ?p ?o }")
 
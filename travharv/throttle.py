@@ -0,0 +1,347 @@
+import logging
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+
+from travharv.helper import timestamp
+
+log = logging.getLogger(__name__)
+
+# http status codes signalling the server wants us to slow down
+THROTTLE_STATUSES = (429, 503)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """convert a Retry-After header value (seconds or http-date)
+    into the number of seconds to wait
+
+    :param value: the Retry-After header value
+    :type value: str
+    :returns: seconds to wait, or None if absent or not understood
+    :rtype: float
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        log.warning(f"could not understand Retry-After: {value}")
+        return None
+    return max(0.0, (retry_at - timestamp()).total_seconds())
+
+
+class HostThrottle:
+    """
+    Throttle for the requests to a single host.
+    Combines a token-bucket (max rate of requests) with an AIMD window
+    (max number of requests in flight).
+    The window grows additively on healthy responses and shrinks
+    multiplicatively on 429/503, on errors or when latency rises.
+    A Retry-After from the server holds back all requests till it passed.
+    A 429/503 without Retry-After holds them back for an exponential
+    backoff instead, growing with each such response in a row.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        rate: float = 10.0,
+        burst: int = 10,
+        initial_window: float = 4.0,
+        max_window: float = 16.0,
+        decrease_factor: float = 0.5,
+        latency_factor: float = 2.0,
+        backoff_factor: float = 0.4,
+        max_backoff: float = 60.0,
+    ):
+        """constructor
+
+        :param host: the host being throttled
+        :type host: str
+        :param rate: max number of requests per second, 0 for no limit
+        :type rate: float
+        :param burst: max number of requests in a burst
+        :type burst: int
+        :param initial_window: number of requests in flight to start with
+        :type initial_window: float
+        :param max_window: max number of requests in flight
+        :type max_window: float
+        :param decrease_factor: factor applied to the window when shrinking
+        :type decrease_factor: float
+        :param latency_factor: how many times the best observed latency
+         the average latency may rise before the window is shrunk
+        :type latency_factor: float
+        :param backoff_factor: seconds to hold back after a 429/503
+         without Retry-After, doubled with each such response in a row
+        :type backoff_factor: float
+        :param max_backoff: max seconds to hold back after a 429/503
+         without Retry-After
+        :type max_backoff: float
+        """
+        self.host = host
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.window = min(initial_window, max_window)
+        self.max_window = max_window
+        self.decrease_factor = decrease_factor
+        self.latency_factor = latency_factor
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.in_flight = 0
+        self.latency: Optional[float] = None  # moving average
+        self.base_latency: Optional[float] = None  # best moving average
+        self._tokens = float(self.burst)
+        self._refilled = time.monotonic()
+        self._not_before = 0.0
+        self._decreased = 0.0
+        self._throttled = 0  # 429/503 responses in a row
+        self._cond = threading.Condition()
+
+    def _refill(self, now: float) -> None:
+        if self.rate > 0:
+            self._tokens = min(
+                self.burst, self._tokens + (now - self._refilled) * self.rate
+            )
+        self._refilled = now
+
+    def acquire(self) -> None:
+        """block till a request to this host is allowed"""
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self._not_before:
+                    self._cond.wait(self._not_before - now)
+                elif self.in_flight >= int(self.window):
+                    self._cond.wait()
+                elif self.rate > 0 and self._tokens < 1:
+                    self._cond.wait((1 - self._tokens) / self.rate)
+                else:
+                    break
+            self._tokens -= 1
+            self.in_flight += 1
+
+    def release(
+        self,
+        status: Optional[int],
+        latency: float,
+        retry_after: Optional[float] = None,
+    ) -> None:
+        """report the outcome of a request acquired before
+
+        :param status: the http status, None if the request failed
+        :type status: int
+        :param latency: the duration of the request in seconds
+        :type latency: float
+        :param retry_after: (optional) seconds the server asked to wait
+        :type retry_after: float
+        """
+        with self._cond:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if status in THROTTLE_STATUSES and retry_after is None:
+                retry_after = self._backoff()
+            if retry_after is not None:
+                self._not_before = max(self._not_before, now + retry_after)
+            if status is None or status in THROTTLE_STATUSES:
+                self._decrease(now, f"got {status=}")
+            else:
+                self._throttled = 0
+                self._observe_latency(now, latency)
+            self._cond.notify_all()
+
+    def _backoff(self) -> float:
+        # exponential, as the retries without a scheduler would wait
+        backoff = self.backoff_factor * (2 ** min(self._throttled, 16))
+        self._throttled += 1
+        return min(self.max_backoff, backoff)
+
+    def _observe_latency(self, now: float, latency: float) -> None:
+        if self.latency is None:
+            self.latency = latency
+        else:
+            self.latency = 0.8 * self.latency + 0.2 * latency
+        if self.base_latency is None or self.latency < self.base_latency:
+            self.base_latency = self.latency
+        # small absolute slack, so jitter on very fast hosts is no signal
+        max_latency = self.base_latency * self.latency_factor + 0.05
+        if self.latency > max_latency:
+            self._decrease(now, f"latency rose to {self.latency:.3f}s")
+            return
+        # additive increase: +1 after a full window of healthy responses
+        previous = int(self.window)
+        self.window = min(self.max_window, self.window + 1 / self.window)
+        if int(self.window) > previous:
+            log.debug(f"widening {self.host} to window {self.window:.1f}")
+
+    def _decrease(self, now: float, reason: str) -> None:
+        # shrink at most once per round-trip, one bad burst is one signal
+        if now - self._decreased < (self.latency or 0):
+            return
+        self._decreased = now
+        self.window = max(1.0, self.window * self.decrease_factor)
+        log.info(
+            f"throttling {self.host} to window {self.window:.1f}: {reason}"
+        )
+
+
+class HostScheduler:
+    """
+    Keeps a HostThrottle per host, all set up with the same settings.
+    """
+
+    def __init__(self, **throttle_settings):
+        """constructor
+
+        :param throttle_settings: keyword arguments for each HostThrottle
+        """
+        self.throttle_settings = throttle_settings
+        self._throttles: Dict[str, HostThrottle] = dict()
+        self._lock = threading.Lock()
+
+    def for_url(self, url: str) -> HostThrottle:
+        """the throttle for the host of the url"""
+        host = urlparse(url).netloc
+        with self._lock:
+            if host not in self._throttles:
+                self._throttles[host] = HostThrottle(
+                    host, **self.throttle_settings
+                )
+            return self._throttles[host]
+
+    def windows(self) -> Dict[str, float]:
+        """the current window per host"""
+        with self._lock:
+            return {
+                host: throttle.window
+                for host, throttle in self._throttles.items()
+            }
+
+
+class CircuitOpen(Exception):
+    """
+    Raised when a request is refused because the circuit breaker
+    of its host is open.
+    """
+
+    def __init__(self, host: str):
+        super().__init__(f"circuit open for {host}, failing fast")
+        self.host = host
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker for the requests to a single host.
+    After failure_threshold consecutive failures (connection errors,
+    server errors) the circuit opens and requests fail fast.
+    After the cooldown a single probe request is let through:
+    if it succeeds the circuit closes again, else it stays open
+    for another cooldown.
+    """
+
+    def __init__(
+        self, host: str, failure_threshold: int = 5, cooldown: float = 300.0
+    ):
+        """constructor
+
+        :param host: the host being guarded
+        :type host: str
+        :param failure_threshold: consecutive failures that open the circuit
+        :type failure_threshold: int
+        :param cooldown: seconds to wait before probing an open circuit
+        :type cooldown: float
+        """
+        self.host = host
+        self.failure_threshold = max(1, failure_threshold)
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        return self.opened_at is not None
+
+    def allow(self) -> bool:
+        """check if a request to the host may be sent now"""
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if self._probing:
+                return False  # only one probe at a time
+            if time.monotonic() - self.opened_at < self.cooldown:
+                return False
+            log.info(f"probing {self.host} after cooldown")
+            self._probing = True
+            return True
+
+    def record(self, success: bool) -> bool:
+        """report the outcome of an allowed request
+
+        :param success: whether the host responded sanely
+        :type success: bool
+        :returns: True if this outcome made the circuit open (trip)
+        :rtype: bool
+        """
+        with self._lock:
+            probing, self._probing = self._probing, False
+            if success:
+                if self.opened_at is not None:
+                    log.info(f"closing circuit for {self.host}")
+                self.failures = 0
+                self.opened_at = None
+                return False
+            # else
+            self.failures += 1
+            if probing or (
+                self.opened_at is None
+                and self.failures >= self.failure_threshold
+            ):
+                tripped = self.opened_at is None
+                self.opened_at = time.monotonic()
+                log.warning(
+                    f"opening circuit for {self.host} after "
+                    f"{self.failures} failures, cooldown {self.cooldown}s"
+                )
+                return tripped
+            return False
+
+
+class CircuitBreakers:
+    """
+    Keeps a CircuitBreaker per host, all set up with the same settings.
+    """
+
+    def __init__(self, **breaker_settings):
+        """constructor
+
+        :param breaker_settings: keyword arguments for each CircuitBreaker
+        """
+        self.breaker_settings = breaker_settings
+        self._breakers: Dict[str, CircuitBreaker] = dict()
+        self._lock = threading.Lock()
+
+    def for_url(self, url: str) -> CircuitBreaker:
+        """the circuit breaker for the host of the url"""
+        host = urlparse(url).netloc
+        with self._lock:
+            if host not in self._breakers:
+                self._breakers[host] = CircuitBreaker(
+                    host, **self.breaker_settings
+                )
+            return self._breakers[host]
+
+    def open_hosts(self) -> List[str]:
+        """the hosts with an open circuit"""
+        with self._lock:
+            return [
+                host
+                for host, breaker in self._breakers.items()
+                if breaker.is_open
+            ]
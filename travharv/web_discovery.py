@@ -1,12 +1,64 @@
+import asyncio
 import cgi
+import codecs
+import importlib.util
+import json
 import logging
+import os
+import shutil
+import threading
+import time
+from collections import Counter, OrderedDict, defaultdict
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Future,
+    ThreadPoolExecutor,
+    wait,
+)
+from functools import partial
+from hashlib import sha256
 from html.parser import HTMLParser
-from urllib.parse import urljoin
+from io import BytesIO, TextIOWrapper
+from pathlib import Path
+from tempfile import SpooledTemporaryFile
+from typing import (
+    IO,
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    TextIO,
+    Tuple,
+)
+from urllib.parse import urljoin, urlparse
+from urllib.request import url2pathname
 
 import requests
-from rdflib import Graph
-from requests.adapters import HTTPAdapter
+from rdflib import Graph, URIRef
+from rdflib.util import guess_format
+from requests.adapters import BaseAdapter, HTTPAdapter
 from requests.packages.urllib3.util.retry import Retry
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers, parse_header_links
+from urllib3.util.request import ACCEPT_ENCODING
+
+from travharv.parsing import ParserPool, parse_into
+from travharv.throttle import (
+    THROTTLE_STATUSES,
+    CircuitBreakers,
+    CircuitOpen,
+    HostScheduler,
+    parse_retry_after,
+)
+
+try:
+    import httpx
+except ImportError:  # optional, only needed for the httpx backend
+    httpx = None
 
 log = logging.getLogger(__name__)
 
@@ -14,32 +66,1221 @@ log = logging.getLogger(__name__)
 RDF_MIME_TO_FORMAT = {
     "application/ld+json": "json-ld",
     "text/turtle": "turtle",
+    "application/n-triples": "nt",
+    "application/n-quads": "nquads",
+}
+
+
+# the rdf mimetypes that can be parsed when returned
+ACCEPTABLE_MIMETYPES = {
+    "application/ld+json",
+    "text/turtle",
+    "application/json",
+    "application/n-triples",
+    "application/n-quads",
 }
 
+# the rdf mimetypes asked for (in order of preference) unless configured
+DEFAULT_FORMATS = [
+    "text/turtle",
+    "application/ld+json",
+    "application/n-triples",
+]
+
+# http status codes telling the url will not work any time soon
+GONE_STATUSES = (404, 410)
+
+# outcomes that will not change when asked again within the run
+DEFINITIVE_OUTCOMES = ("ok", "parseError", "unsupportedFormat")
+
+# client errors that may well be gone when asked again
+TRANSIENT_STATUSES = (408, 429)
+
+# max number of alternates (describedby links) of one page fetched at once
+ALTERNATES_CONCURRENCY = 4
+
+# the suffixes tried for documents in a local mirror directory
+MIRROR_SUFFIXES = (".ttl", ".jsonld", ".json", ".nt", ".nq")
+
+# max nesting of remote json-ld contexts referring to other ones
+MAX_CONTEXT_DEPTH = 8
+
+# the http client libraries the WebFetcher can send its requests with
+HTTP_BACKENDS = ("requests", "httpx")
+
 
 def ctype_to_rdf_format(ctype: str) -> str:
     return RDF_MIME_TO_FORMAT.get(ctype, None)
 
 
+def rdf_format_to_ctype(format: str) -> str:
+    for ctype, rdf_format in RDF_MIME_TO_FORMAT.items():
+        if rdf_format == format:
+            return ctype
+    return format
+
+
+class BudgetExceeded(Exception):
+    """
+    Raised when downloading a document exceeds the max-bytes or
+    max-seconds budget of the fetcher.
+    The outcome ("maxBytesExceeded" or "maxSecondsExceeded") tells which.
+    """
+
+    def __init__(self, outcome: str, message: str):
+        super().__init__(message)
+        self.outcome = outcome
+
+
+def accept_key(accept: str) -> str:
+    """the mimetypes asked for in the Accept header, without their order
+    or weights, so reordering the formats keeps hitting the same entries
+
+    :param accept: the Accept header
+    :type accept: str
+    :returns: e.g. "application/ld+json, text/html, text/turtle"
+    :rtype: str
+    """
+    mime_types = {part.split(";")[0].strip() for part in accept.split(",")}
+    return ", ".join(
+        sorted(mime_type for mime_type in mime_types if mime_type)
+    )
+
+
+class ResponseCache:
+    """
+    Disk-backed cache of http responses, keyed by url and the mimetypes
+    asked for in the Accept header (see accept_key).
+    Next to the body it keeps the Content-Type, ETag and Last-Modified
+    headers, so the fetcher can revalidate entries with a conditional GET.
+    The total size of the cached bodies is kept under max_bytes by evicting
+    the least recently used entries, tracked in an index kept in memory
+    (built from the folder once, ordered by the mtime of the bodies).
+    """
+
+    def __init__(self, folder: str, max_bytes: int = 1024 * 1024 * 1024):
+        """constructor
+
+        :param folder: the folder to keep the cached responses in
+        :type folder: str
+        :param max_bytes: max total size of the cached bodies
+        :type max_bytes: int
+        """
+        self.folder = Path(folder)
+        self.folder.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # key -> (size, mtime) of the bodies, least recently used first
+        self._index: OrderedDict[str, Tuple[int, float]] = OrderedDict()
+        bodies = []
+        for body_path in self.folder.glob("*.body"):
+            stat = body_path.stat()
+            bodies.append((stat.st_mtime, body_path.stem, stat.st_size))
+        for mtime, key, size in sorted(bodies):
+            self._index[key] = (size, mtime)
+        self._size = sum(size for size, _ in self._index.values())
+        log.debug(
+            f"ResponseCache in {self.folder} holding {self._size} bytes "
+            f"(max {self.max_bytes})"
+        )
+
+    @staticmethod
+    def _key(url: str, accept: str) -> str:
+        key = f"{url}\n{accept_key(accept)}"
+        return sha256(key.encode("utf-8")).hexdigest()
+
+    def _paths(self, key: str) -> Tuple[Path, Path]:
+        return self.folder / f"{key}.body", self.folder / f"{key}.json"
+
+    def lookup(self, url: str, accept: str) -> Optional[dict]:
+        """get the cached metadata for url and accept header (if any)
+
+        :returns: dict with content_type, etag, last_modified or None
+        :rtype: dict
+        """
+        _, meta_path = self._paths(self._key(url, accept))
+        try:
+            with open(meta_path, "r") as meta_file:
+                return json.load(meta_file)
+        except (OSError, ValueError):
+            return None
+
+    def response(self, url: str, accept: str) -> Optional[requests.Response]:
+        """rebuild the cached response for url and accept header,
+        marking the entry as recently used
+
+        :rtype: requests.Response
+        """
+        meta = self.lookup(url, accept)
+        if meta is None:
+            return None
+        key = self._key(url, accept)
+        body_path, _ = self._paths(key)
+        try:
+            os.utime(body_path)  # mark as recently used, also for next runs
+            body = body_path.read_bytes()
+        except OSError:
+            return None  # evicted in the meantime
+        with self._lock:
+            if key in self._index:
+                self._index[key] = (self._index[key][0], time.time())
+                self._index.move_to_end(key)
+        response = requests.Response()
+        response.url = url
+        response.status_code = 200
+        response.headers = CaseInsensitiveDict(
+            {"Content-Type": meta["content_type"]}
+        )
+        if meta.get("link"):
+            response.headers["Link"] = meta["link"]
+        response.encoding = get_encoding_from_headers(response.headers)
+        response._content = body
+        response._content_consumed = True
+        return response
+
+    def store(
+        self,
+        url: str,
+        accept: str,
+        response: requests.Response,
+        body: IO[bytes] = None,
+    ):
+        """store a (200 OK) response that carries ETag or Last-Modified
+
+        :param body: (optional) file holding the already read body,
+         by default the content of the response is taken
+        :type body: IO[bytes]
+        """
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if etag is None and last_modified is None:
+            return  # no way to revalidate this later, so no use keeping it
+        if body is None:
+            body = BytesIO(response.content)
+        body_size = body.seek(0, os.SEEK_END)
+        body.seek(0)
+        if body_size > self.max_bytes:
+            return
+        meta = {
+            "url": url,
+            "accept": accept,
+            "content_type": response.headers.get("Content-Type", ""),
+            "link": response.headers.get("Link"),
+            "etag": etag,
+            "last_modified": last_modified,
+        }
+        key = self._key(url, accept)
+        body_path, meta_path = self._paths(key)
+        with self._lock:
+            if key in self._index:
+                self._size -= self._index.pop(key)[0]
+            with open(body_path, "wb") as body_file:
+                shutil.copyfileobj(body, body_file)
+            body.seek(0)
+            with open(meta_path, "w") as meta_file:
+                json.dump(meta, meta_file)
+            self._index[key] = (body_size, time.time())
+            self._size += body_size
+            self._evict()
+
+    def _evict(self):
+        """drop least recently used entries till we fit in max_bytes"""
+        while self._size > self.max_bytes and self._index:
+            key, (size, _) = self._index.popitem(last=False)
+            self._size -= size
+            body_path, meta_path = self._paths(key)
+            body_path.unlink(missing_ok=True)
+            meta_path.unlink(missing_ok=True)
+            log.debug(f"evicted {body_path.name} from the response cache")
+
+
+class NegativeCache:
+    """
+    Remembers the urls that recently failed for good (gone, not found,
+    no rdf to be had) so they are not fetched again till ttl passed.
+    Failures tied to the Accept header (e.g. unsupported content) are
+    kept per mimetypes asked for (see accept_key), the others for the url
+    as such.
+    When a file is given, the entries are kept in it across runs.
+    """
+
+    def __init__(self, ttl: float = 24 * 60 * 60, file: str = None):
+        """constructor
+
+        :param ttl: number of seconds a failure is remembered
+        :type ttl: float
+        :param file: (optional) json file to persist the entries in
+        :type file: str
+        """
+        self.ttl = ttl
+        self.file = None if file is None else Path(file)
+        self._entries: Dict[str, Tuple[float, str]] = dict()
+        self._lock = threading.Lock()
+        if self.file is not None and self.file.exists():
+            try:
+                with open(self.file, "r") as entries_file:
+                    self._entries = {
+                        key: (expires, reason)
+                        for key, (expires, reason) in json.load(
+                            entries_file
+                        ).items()
+                        if expires > time.time()
+                    }
+            except (OSError, ValueError) as e:
+                log.warning(f"ignoring unreadable {self.file}: {e}")
+        log.debug(f"NegativeCache with {len(self._entries)} entries")
+
+    @staticmethod
+    def _key(url: str, accept: str = None) -> str:
+        return url if accept is None else f"{url}\n{accept_key(accept)}"
+
+    def lookup(self, url: str, accept: str) -> Optional[str]:
+        """the reason url failed recently (if it did)
+
+        :returns: the reason (outcome) of the failure or None
+        :rtype: str
+        """
+        now = time.time()
+        with self._lock:
+            for key in (self._key(url), self._key(url, accept)):
+                expires, reason = self._entries.get(key, (0, None))
+                if expires > now:
+                    return reason
+        return None
+
+    def remember(self, url: str, reason: str, accept: str = None) -> None:
+        """remember url failed for reason (only with this accept, if given)"""
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries[self._key(url, accept)] = (
+                time.time() + self.ttl,
+                reason,
+            )
+            self._save()
+
+    def _save(self) -> None:
+        if self.file is None:
+            return
+        now = time.time()
+        entries = {
+            key: entry
+            for key, entry in self._entries.items()
+            if entry[0] > now
+        }
+        temp_file = self.file.with_suffix(".tmp")
+        with open(temp_file, "w") as entries_file:
+            json.dump(entries, entries_file)
+        os.replace(temp_file, self.file)
+
+
+class HostFormatStats:
+    """
+    Learns per host which of the served mimetypes turned into rdf,
+    so the Accept header for later requests to that host can put
+    the formats that worked first and those that keep failing last.
+    Served html (e.g. with signposting) is tracked as well.
+    When a file is given, the statistics are kept in it across runs.
+    """
+
+    def __init__(self, file: str = None, min_samples: int = 3):
+        """constructor
+
+        :param file: (optional) json file to persist the statistics in
+        :type file: str
+        :param min_samples: number of responses from a host needed
+         before its statistics change the order of the formats
+        :type min_samples: int
+        """
+        self.file = None if file is None else Path(file)
+        self.min_samples = min_samples
+        # host -> mimetype -> [successes, failures]
+        self._hosts: Dict[str, Dict[str, List[int]]] = defaultdict(dict)
+        self._lock = threading.Lock()
+        if self.file is not None and self.file.exists():
+            try:
+                with open(self.file, "r") as stats_file:
+                    self._hosts.update(json.load(stats_file))
+            except (OSError, ValueError) as e:
+                log.warning(f"ignoring unreadable {self.file}: {e}")
+        log.debug(f"HostFormatStats for {len(self._hosts)} hosts")
+
+    def record(self, url: str, mime_type: str, success: bool) -> None:
+        """count a response from the host of url served as mime_type
+
+        :param success: whether it yielded (parseable) rdf
+        :type success: bool
+        """
+        if not mime_type:
+            return
+        host = urlparse(url).netloc
+        with self._lock:
+            counts = self._hosts[host].setdefault(mime_type, [0, 0])
+            counts[0 if success else 1] += 1
+
+    def preferred(self, url: str, formats: List[str]) -> List[str]:
+        """the formats reordered for the host of url: the ones that
+        worked (most successes first), then the untried ones and last
+        the ones that mostly failed, each group keeping the given order
+
+        :param formats: the rdf mimetypes, in order of preference
+        :type formats: List[str]
+        :rtype: List[str]
+        """
+        host = urlparse(url).netloc
+        with self._lock:
+            stats = {
+                mime_type: tuple(counts)
+                for mime_type, counts in self._hosts.get(host, {}).items()
+            }
+        if sum(ok + failed for ok, failed in stats.values()) < (
+            self.min_samples
+        ):
+            return list(formats)
+
+        def rank(format: str) -> Tuple[int, int]:
+            ok, failed = stats.get(format, (0, 0))
+            if ok > failed:
+                return 0, -ok
+            if failed > ok:
+                return 2, 0
+            return 1, 0
+
+        return sorted(formats, key=rank)  # stable, so ties keep their order
+
+    def hosts(self) -> Dict[str, Dict[str, List[int]]]:
+        """a copy of the statistics per host"""
+        with self._lock:
+            return {
+                host: {mime: list(counts) for mime, counts in mimes.items()}
+                for host, mimes in self._hosts.items()
+            }
+
+    def save(self) -> None:
+        """write the statistics to the file (if any)"""
+        if self.file is None:
+            return
+        temp_file = self.file.with_suffix(".tmp")
+        with open(temp_file, "w") as stats_file:
+            json.dump(self.hosts(), stats_file)
+        os.replace(temp_file, self.file)
+
+
+class ContextCache:
+    """
+    Cache of remote JSON-LD @context documents, so the contexts json-ld
+    documents refer to by url can be inlined before parsing,
+    instead of being fetched again for every document.
+    Next to in memory, the contexts are optionally kept in a folder
+    across runs, and can be preloaded from offline bundles:
+    json files mapping context urls to their documents.
+    """
+
+    def __init__(self, folder: str = None, bundles: Iterable[str] = ()):
+        """constructor
+
+        :param folder: (optional) folder to persist the contexts in
+        :type folder: str
+        :param bundles: (optional) the bundles to preload
+        :type bundles: Iterable[str]
+        """
+        self.folder = None if folder is None else Path(folder)
+        if self.folder is not None:
+            self.folder.mkdir(parents=True, exist_ok=True)
+        # url -> context document, None if it could not be had
+        self._contexts: Dict[str, Optional[dict]] = dict()
+        self._lock = threading.Lock()
+        for bundle in bundles:
+            self.preload(bundle)
+
+    def preload(self, bundle: str) -> int:
+        """add the contexts in the bundle (a json file mapping
+        context urls to their documents)
+
+        :returns: the number of contexts added
+        :rtype: int
+        """
+        with open(bundle, "r") as bundle_file:
+            contexts = json.load(bundle_file)
+        with self._lock:
+            self._contexts.update(contexts)
+        log.debug(f"preloaded {len(contexts)} json-ld contexts from {bundle}")
+        return len(contexts)
+
+    def _path(self, url: str) -> Path:
+        return self.folder / f"{sha256(url.encode('utf-8')).hexdigest()}.json"
+
+    def lookup(self, url: str) -> Tuple[bool, Optional[dict]]:
+        """the context document known for url (if any)
+
+        :returns: whether it is known, and the document
+         (None if it is known to be unavailable)
+        :rtype: Tuple[bool, Optional[dict]]
+        """
+        with self._lock:
+            if url in self._contexts:
+                return True, self._contexts[url]
+        if self.folder is None:
+            return False, None
+        try:
+            with open(self._path(url), "r") as context_file:
+                context = json.load(context_file)
+        except (OSError, ValueError):
+            return False, None
+        with self._lock:
+            self._contexts[url] = context
+        return True, context
+
+    def store(self, url: str, context: Optional[dict]) -> None:
+        """keep the context document for url, None if it is unavailable
+        (which is only remembered in memory)"""
+        with self._lock:
+            self._contexts[url] = context
+        if self.folder is None or context is None:
+            return
+        path = self._path(url)
+        temp_file = path.with_suffix(".tmp")
+        with open(temp_file, "w") as context_file:
+            json.dump(context, context_file)
+        os.replace(temp_file, path)
+
+
+class LocalMirrors:
+    """
+    Rewrite table mapping uri prefixes to local copies, so the uris
+    starting with them are resolved from disk instead of over http.
+    A prefix can map to a directory, the rest of the uri then is the
+    path of the document in it (also trying the MIRROR_SUFFIXES),
+    uris without a document there are still fetched over http.
+    Or it can map to a single file (a bundle, e.g. the dump of a whole
+    vocabulary), of which the concise bounded description of the uri
+    is taken.
+    Each file is parsed once and kept in memory.
+    """
+
+    def __init__(self, table: Dict[str, str] = None):
+        """constructor
+
+        :param table: (optional) the local directory or file
+         (path or file:// url) per uri prefix
+        :type table: Dict[str, str]
+        """
+        self._table: List[Tuple[str, Path]] = []
+        self._graphs: Dict[Path, Graph] = dict()
+        self._lock = threading.Lock()
+        for prefix, location in (table or {}).items():
+            self.add(prefix, location)
+
+    def add(self, prefix: str, location: str) -> None:
+        """map the uris starting with prefix to the local location
+
+        :param prefix: the uri prefix
+        :type prefix: str
+        :param location: the directory or file (path or file:// url)
+        :type location: str
+        """
+        if location.startswith("file://"):
+            location = url2pathname(urlparse(location).path)
+        path = Path(location)
+        if not path.exists():
+            raise FileNotFoundError(f"no local mirror of {prefix} at {path}")
+        self._table.append((prefix, path))
+        # longest prefix first, so the most specific mirror wins
+        self._table.sort(key=lambda entry: len(entry[0]), reverse=True)
+        log.debug(f"mirroring {prefix} from {path}")
+
+    def resolve(self, uri: str) -> Optional[Tuple[Graph, str]]:
+        """the triples for uri from its local mirror
+
+        :param uri: the uri to resolve
+        :type uri: str
+        :returns: the graph and its mimetype, None if not mirrored
+        :rtype: Tuple[Graph, str]
+        """
+        for prefix, path in self._table:
+            if not uri.startswith(prefix):
+                continue
+            if path.is_file():
+                return self._parsed(path).cbd(URIRef(uri)), self._ctype(path)
+            # else
+            rest = uri.removeprefix(prefix)
+            document = self._document(path, rest)
+            if document is None:
+                log.debug(f"no document for {uri} in mirror {path}")
+                return None
+            return self._parsed(document), self._ctype(document)
+        return None
+
+    @staticmethod
+    def _document(folder: Path, rest: str) -> Optional[Path]:
+        rest = rest.split("#")[0].split("?")[0]
+        if not rest or rest.endswith("/"):
+            rest += "index"
+        base = folder / rest
+        if not base.resolve().is_relative_to(folder.resolve()):
+            return None  # no escaping the mirror with ../
+        for candidate in [base] + [
+            base.with_name(base.name + suffix) for suffix in MIRROR_SUFFIXES
+        ]:
+            if candidate.is_file():
+                return candidate
+        return None
+
+    @staticmethod
+    def _format(path: Path) -> str:
+        return guess_format(str(path)) or "turtle"
+
+    def _ctype(self, path: Path) -> str:
+        return rdf_format_to_ctype(self._format(path))
+
+    def _parsed(self, path: Path) -> Graph:
+        with self._lock:
+            if path not in self._graphs:
+                graph = Graph()
+                try:
+                    parse_into(graph, path, self._format(path))
+                except Exception as e:
+                    log.warning(f"failed to parse mirror {path}: {e}")
+                log.info(f"parsed mirror {path}: {len(graph)} triples")
+                self._graphs[path] = graph
+            return self._graphs[path]
+
+
+class _HttpxRaw:
+    """the streamed body of an httpx response, posing as the raw
+    (urllib3) response requests reads its content from"""
+
+    def __init__(self, response: "httpx.Response"):
+        self._response = response
+
+    def stream(self, chunk_size: int = 64 * 1024, decode_content=True):
+        try:
+            yield from self._response.iter_bytes(chunk_size)
+        except httpx.HTTPError as e:
+            raise requests.ConnectionError(e)
+
+    def read(self, amt: int = None, decode_content=True) -> bytes:
+        return b"".join(self.stream())
+
+    def close(self) -> None:
+        self._response.close()
+
+
+class HttpxAdapter(BaseAdapter):
+    """
+    Transport adapter for a requests.Session sending over httpx,
+    so the requests to a host are multiplexed over a single HTTP/2
+    connection (if the server speaks it, else HTTP/1.1 is used)
+    and gzip, brotli and zstd encoded responses get decoded
+    (the latter two if brotli and zstandard are installed).
+    Failing connections and the statuses in status_forcelist
+    are retried with exponential backoff.
+    Needs httpx, best installed as httpx[http2,brotli,zstd].
+    """
+
+    def __init__(
+        self,
+        pool_maxsize: int = 10,
+        total_retry: int = 8,
+        backoff_factor: float = 0.4,
+        status_forcelist: Iterable[int] = (500, 502, 503, 504, 429),
+        respect_retry_after: bool = True,
+        http2: bool = True,
+    ):
+        """constructor
+
+        :param pool_maxsize: max number of connections kept alive
+        :type pool_maxsize: int
+        :param total_retry: max number of retries per request
+        :type total_retry: int
+        :param backoff_factor: backoff factor applied between retries
+        :type backoff_factor: float
+        :param status_forcelist: http status codes that trigger a retry
+        :type status_forcelist: Iterable[int]
+        :param respect_retry_after: wait as long as Retry-After asks
+        :type respect_retry_after: bool
+        :param http2: negotiate HTTP/2 (needs the h2 package)
+        :type http2: bool
+        """
+        if httpx is None:
+            raise ImportError(
+                "the httpx backend needs httpx, "
+                "e.g. pip install 'httpx[http2,brotli,zstd]'"
+            )
+        super().__init__()
+        if http2 and importlib.util.find_spec("h2") is None:
+            log.warning("h2 is not installed, falling back to HTTP/1.1")
+            http2 = False
+        self.total_retry = total_retry
+        self.backoff_factor = backoff_factor
+        self.status_forcelist = set(status_forcelist)
+        self.respect_retry_after = respect_retry_after
+        self.client = httpx.Client(
+            transport=httpx.HTTPTransport(
+                http2=http2,
+                retries=total_retry,  # only applies to connecting
+                limits=httpx.Limits(max_keepalive_connections=pool_maxsize),
+            ),
+        )
+        # the encodings httpx is able to decode here
+        self.accept_encoding = self.client.headers["Accept-Encoding"]
+        log.debug(f"HttpxAdapter with {http2=} {self.accept_encoding=}")
+
+    def send(
+        self,
+        request: requests.PreparedRequest,
+        stream: bool = False,
+        timeout=None,
+        verify=True,
+        cert=None,
+        proxies=None,
+    ) -> requests.Response:
+        """send the prepared request over httpx, see BaseAdapter.send"""
+        connect, read = (
+            timeout if isinstance(timeout, tuple) else (timeout,) * 2
+        )
+        for attempt in range(self.total_retry + 1):
+            try:
+                hr = self.client.send(
+                    self.client.build_request(
+                        request.method,
+                        request.url,
+                        headers=dict(request.headers),
+                        content=request.body,
+                        timeout=httpx.Timeout(read, connect=connect),
+                    ),
+                    stream=True,
+                )
+            except httpx.ConnectTimeout as e:
+                raise requests.ConnectTimeout(e, request=request)
+            except httpx.TimeoutException as e:
+                raise requests.ReadTimeout(e, request=request)
+            except httpx.HTTPError as e:
+                raise requests.ConnectionError(e, request=request)
+            if (
+                hr.status_code not in self.status_forcelist
+                or attempt == self.total_retry
+            ):
+                break
+            # else
+            wait = None
+            if self.respect_retry_after:
+                wait = parse_retry_after(hr.headers.get("Retry-After"))
+            if wait is None:
+                wait = self.backoff_factor * (2**attempt)
+            log.debug(f"{request.url} got {hr.status_code}, retry in {wait}s")
+            hr.close()
+            time.sleep(wait)
+        return self._build_response(request, hr)
+
+    def _build_response(
+        self, request: requests.PreparedRequest, hr: "httpx.Response"
+    ) -> requests.Response:
+        response = requests.Response()
+        response.status_code = hr.status_code
+        response.reason = hr.reason_phrase
+        response.headers = CaseInsensitiveDict(hr.headers.items())
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.url = str(hr.url)
+        response.raw = _HttpxRaw(hr)
+        response.request = request
+        response.connection = self
+        return response
+
+    def close(self) -> None:
+        self.client.close()
+
+
+class WebFetcher:
+    """
+    Shared HTTP client for all dereferencing done during a run.
+    Keeps one requests.Session with keep-alive connection pools per host
+    so repeated fetches to the same host reuse their TCP/TLS connections.
+    Optionally revalidates against a ResponseCache, so unchanged documents
+    only cost a 304.
+    Optionally paces the requests per host through a HostScheduler,
+    which then also takes over the retries on 429/503 (honouring
+    Retry-After) so it can adapt to them.
+    Documents are streamed into a spooled temporary file (kept in memory
+    up to spool_bytes, on disk beyond) within max_bytes and max_seconds.
+    Optionally fails fast for hosts that keep failing (CircuitBreakers)
+    and for urls that failed for good recently (NegativeCache).
+    Optionally learns which formats work per host (HostFormatStats).
+    Optionally resolves uris from local copies instead (LocalMirrors).
+    The remote JSON-LD contexts are kept in a ContextCache.
+    The documents are parsed through a ParserPool, optionally using
+    worker processes.
+    Counts of notable events (e.g. cacheHits) are kept in stats.
+    The requests are sent with requests (HTTP/1.1) or, when backend is
+    "httpx", over HTTP/2 through the HttpxAdapter.
+    """
+
+    def __init__(
+        self,
+        pool_connections: int = 10,
+        pool_maxsize: int = 10,
+        total_retry: int = 8,
+        backoff_factor: float = 0.4,
+        status_forcelist: Iterable[int] = (500, 502, 503, 504, 429),
+        cache: ResponseCache = None,
+        scheduler: HostScheduler = None,
+        max_bytes: int = None,
+        max_seconds: float = None,
+        spool_bytes: int = 8 * 1024 * 1024,
+        breakers: CircuitBreakers = None,
+        negative_cache: NegativeCache = None,
+        connect_timeout: float = 10.0,
+        read_timeout: float = 60.0,
+        format_stats: HostFormatStats = None,
+        backend: str = "requests",
+        mirrors: LocalMirrors = None,
+        contexts: ContextCache = None,
+        parsers: ParserPool = None,
+    ):
+        """constructor
+
+        :param pool_connections: number of hosts to keep a pool for
+        :type pool_connections: int
+        :param pool_maxsize: max number of connections kept per host
+        :type pool_maxsize: int
+        :param total_retry: max number of retries per request
+        :type total_retry: int
+        :param backoff_factor: backoff factor applied between retries
+        :type backoff_factor: float
+        :param status_forcelist: http status codes that trigger a retry
+        :type status_forcelist: Iterable[int]
+        :param cache: (optional) the response cache to revalidate against
+        :type cache: ResponseCache
+        :param scheduler: (optional) the per host throttling to apply
+        :type scheduler: HostScheduler
+        :param max_bytes: (optional) max size of a single document
+        :type max_bytes: int
+        :param max_seconds: (optional) max duration of fetching a document
+        :type max_seconds: float
+        :param spool_bytes: size above which documents are spooled to disk
+        :type spool_bytes: int
+        :param breakers: (optional) the per host circuit breakers to apply
+        :type breakers: CircuitBreakers
+        :param negative_cache: (optional) the urls known to fail
+        :type negative_cache: NegativeCache
+        :param connect_timeout: seconds to wait for a connection
+        :type connect_timeout: float
+        :param read_timeout: seconds to wait for (the next bytes of) a response
+        :type read_timeout: float
+        :param format_stats: (optional) the per host format statistics
+        :type format_stats: HostFormatStats
+        :param backend: the http client to send with, one of HTTP_BACKENDS
+        :type backend: str
+        :param mirrors: (optional) the local copies to resolve uris from
+        :type mirrors: LocalMirrors
+        :param contexts: (optional) the cache of remote json-ld contexts
+         - If None, they are only cached in memory.
+        :type contexts: ContextCache
+        :param parsers: (optional) the pool to parse the documents with
+         - If None, they are parsed in the calling thread.
+        :type parsers: ParserPool
+        """
+        if backend not in HTTP_BACKENDS:
+            raise ValueError(
+                f"unknown http {backend=}, not in {HTTP_BACKENDS}"
+            )
+        self.cache = cache
+        self.scheduler = scheduler
+        self.max_bytes = max_bytes
+        self.max_seconds = max_seconds
+        self.spool_bytes = spool_bytes
+        self.breakers = breakers
+        self.negative_cache = negative_cache
+        self.format_stats = format_stats
+        self.mirrors = mirrors
+        self.contexts = contexts or ContextCache()
+        self.parsers = parsers or ParserPool()
+        self.timeout = (connect_timeout, read_timeout)
+        self.total_retry = total_retry
+        if scheduler is not None:
+            # the scheduler needs to see these to adapt, so it retries them
+            status_forcelist = [
+                status
+                for status in status_forcelist
+                if status not in THROTTLE_STATUSES
+            ]
+        self.stats = Counter()
+        self._stats_lock = threading.Lock()
+        self.session = requests.Session()
+        if backend == "httpx":
+            adapter = HttpxAdapter(
+                pool_maxsize=pool_maxsize,
+                total_retry=total_retry,
+                backoff_factor=backoff_factor,
+                status_forcelist=status_forcelist,
+                respect_retry_after=scheduler is None,
+            )
+            accept_encoding = adapter.accept_encoding
+        else:
+            retry = Retry(
+                total=total_retry,
+                backoff_factor=backoff_factor,
+                status_forcelist=list(status_forcelist),
+                respect_retry_after_header=scheduler is None,
+            )
+            adapter = HTTPAdapter(
+                pool_connections=pool_connections,
+                pool_maxsize=pool_maxsize,
+                max_retries=retry,
+            )
+            accept_encoding = ACCEPT_ENCODING
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        # ask for every compression the backend is able to decode
+        self.session.headers["Accept-Encoding"] = accept_encoding
+        self.backend = backend
+        log.debug(
+            f"WebFetcher initialized with {backend=} {pool_connections=} "
+            f"{pool_maxsize=} {total_retry=} {accept_encoding=}"
+        )
+
+    def get(self, url: str, headers: dict = None) -> requests.Response:
+        """perform a GET over the pooled session
+
+        :param url: the url to get
+        :type url: str
+        :param headers: (optional) the request headers to send
+        :type headers: dict
+        :returns: the response
+        :rtype: requests.Response
+        """
+        r, cached = self._revalidate(url, headers)
+        if r.status_code == 200 and self.cache is not None and not cached:
+            self.cache.store(url, (headers or {}).get("Accept", ""), r)
+        return r
+
+    def fetch(
+        self,
+        url: str,
+        headers: dict = None,
+        wants_body: Callable[[requests.Response], bool] = None,
+        scanner: "LODAwareHTMLParser" = None,
+    ) -> Tuple[requests.Response, Optional[IO[bytes]]]:
+        """perform a streaming GET, reading the body of a 200 OK response
+        into a spooled temporary file within the max_bytes and max_seconds
+
+        :param url: the url to get
+        :type url: str
+        :param headers: (optional) the request headers to send
+        :type headers: dict
+        :param wants_body: (optional) check on the response headers
+         deciding if the body is needed at all, if not it is never read
+        :type wants_body: Callable[[requests.Response], bool]
+        :param scanner: (optional) parser to feed an html body to straight
+         from the stream (within the same budgets) instead of spooling it,
+         the rest of the body is not read once the parser is done
+        :type scanner: LODAwareHTMLParser
+        :returns: the (closed) response and the body file positioned at
+         its start, the body is None if the status was not 200,
+         if it was not wanted or if it was scanned
+        :rtype: Tuple[requests.Response, Optional[IO[bytes]]]
+        :raises BudgetExceeded: when the document is too big or too slow
+        """
+        start = time.monotonic()
+        r, cached = self._revalidate(url, headers, stream=True)
+        with r:
+            if r.status_code != 200:
+                return r, None
+            if wants_body is not None and not wants_body(r):
+                log.debug(f"{url=} body not needed, not downloading it")
+                return r, None
+            mime_type, _ = cgi.parse_header(r.headers.get("Content-Type", ""))
+            if scanner is not None and mime_type == "text/html":
+                scanner.scan_chunks(
+                    self._chunks(url, r, start), r.encoding or "utf-8"
+                )
+                return r, None
+            body = self._spool(url, r, start)
+        if self.cache is not None and not cached:
+            self.cache.store(
+                url, (headers or {}).get("Accept", ""), r, body=body
+            )
+        return r, body
+
+    def _spool(
+        self, url: str, r: requests.Response, start: float
+    ) -> IO[bytes]:
+        """read the body of r into a spooled file, minding the budgets"""
+        body = SpooledTemporaryFile(max_size=self.spool_bytes)
+        try:
+            for chunk in self._chunks(url, r, start):
+                body.write(chunk)
+        except BudgetExceeded:
+            body.close()
+            raise
+        body.seek(0)
+        return body
+
+    def _chunks(
+        self, url: str, r: requests.Response, start: float
+    ) -> Iterator[bytes]:
+        """stream the body of r, within the max_bytes and max_seconds"""
+        length = r.headers.get("Content-Length", "")
+        if (
+            self.max_bytes
+            and length.isdigit()
+            and int(length) > self.max_bytes
+        ):
+            self.count("maxBytesExceeded")
+            raise BudgetExceeded(
+                "maxBytesExceeded",
+                f"{url} announces {length} bytes (max {self.max_bytes})",
+            )
+        size = 0
+        for chunk in r.iter_content(chunk_size=64 * 1024):
+            size += len(chunk)
+            if self.max_bytes and size > self.max_bytes:
+                self.count("maxBytesExceeded")
+                raise BudgetExceeded(
+                    "maxBytesExceeded",
+                    f"{url} exceeds {self.max_bytes} bytes",
+                )
+            if (
+                self.max_seconds
+                and time.monotonic() - start > self.max_seconds
+            ):
+                self.count("maxSecondsExceeded")
+                raise BudgetExceeded(
+                    "maxSecondsExceeded",
+                    f"{url} takes over {self.max_seconds} seconds",
+                )
+            yield chunk
+
+    def _revalidate(
+        self, url: str, headers: dict = None, stream: bool = False
+    ) -> Tuple[requests.Response, bool]:
+        """send the GET, conditional if a cached response is available
+
+        :returns: the response and whether it came from the cache
+        :rtype: Tuple[requests.Response, bool]
+        """
+        if self.cache is None:
+            return self._send(url, headers, stream), False
+        # else
+        headers = dict(headers or {})
+        accept = headers.get("Accept", "")
+        cached = self.cache.lookup(url, accept)
+        if cached is not None:
+            if cached.get("etag"):
+                headers["If-None-Match"] = cached["etag"]
+            if cached.get("last_modified"):
+                headers["If-Modified-Since"] = cached["last_modified"]
+        r = self._send(url, headers, stream)
+        if r.status_code == 304 and cached is not None:
+            response = self.cache.response(url, accept)
+            if response is not None:
+                log.debug(f"{url=} not modified, using cached response")
+                self.count("cacheHits")
+                r.close()
+                return response, True
+            # cache entry vanished (evicted) - get it fully once more
+            headers.pop("If-None-Match", None)
+            headers.pop("If-Modified-Since", None)
+            r.close()
+            r = self._send(url, headers, stream)
+        return r, False
+
+    def _send(
+        self, url: str, headers: dict = None, stream: bool = False
+    ) -> requests.Response:
+        """send the GET, guarded by the circuit breaker of the host (if any)
+
+        :raises CircuitOpen: when the host is failing, without sending
+        """
+        if self.breakers is None:
+            return self._send_paced(url, headers, stream)
+        # else
+        breaker = self.breakers.for_url(url)
+        if not breaker.allow():
+            self.count("circuitOpen")
+            raise CircuitOpen(breaker.host)
+        try:
+            r = self._send_paced(url, headers, stream)
+        except requests.RequestException:
+            if breaker.record(False):
+                self.count("circuitTrips")
+            raise
+        if breaker.record(r.status_code < 500):
+            self.count("circuitTrips")
+        return r
+
+    def _send_paced(
+        self, url: str, headers: dict = None, stream: bool = False
+    ) -> requests.Response:
+        """send the GET, paced by the throttle of the host (if any)"""
+        self.count("requests")
+        if self.scheduler is None:
+            return self.session.get(
+                url, headers=headers, stream=stream, timeout=self.timeout
+            )
+        # else
+        throttle = self.scheduler.for_url(url)
+        for attempt in range(self.total_retry + 1):
+            throttle.acquire()
+            start, status, retry_after = time.monotonic(), None, None
+            try:
+                r = self.session.get(
+                    url, headers=headers, stream=stream, timeout=self.timeout
+                )
+                status = r.status_code
+                retry_after = parse_retry_after(r.headers.get("Retry-After"))
+            finally:
+                throttle.release(status, time.monotonic() - start, retry_after)
+            if status not in THROTTLE_STATUSES or attempt == self.total_retry:
+                return r
+            # else
+            log.debug(f"{url=} got {status=}, retry {attempt + 1}")
+            self.count("throttled")
+            r.close()
+
+    def mirrored(self, url: str) -> Optional[Tuple[Graph, str]]:
+        """the triples for url from a local mirror (if any),
+        see LocalMirrors.resolve"""
+        if self.mirrors is None:
+            return None
+        mirrored = self.mirrors.resolve(url)
+        if mirrored is not None:
+            self.count("mirrorHits")
+        return mirrored
+
+    def jsonld_context(self, url: str) -> Optional[dict]:
+        """the remote json-ld context document at url, from the cache
+        or else fetched (following a Link to an ld+json alternate)
+
+        :returns: the context document or None if it is unavailable
+        :rtype: dict
+        """
+        found, context = self.contexts.lookup(url)
+        if found:
+            self.count("contextCacheHits")
+            return context
+        # else
+        headers = {"Accept": "application/ld+json, application/json;q=0.9"}
+        try:
+            r = self.get(url, headers=headers)
+            alternate = r.links.get("alternate", {})
+            mime_type, _ = cgi.parse_header(r.headers.get("Content-Type", ""))
+            if (
+                mime_type not in ACCEPTABLE_MIMETYPES
+                and alternate.get("type") == "application/ld+json"
+            ):
+                r = self.get(urljoin(r.url, alternate["url"]), headers=headers)
+            r.raise_for_status()
+            context = r.json()
+        except (requests.RequestException, CircuitOpen, ValueError) as e:
+            log.warning(f"failed to get json-ld context {url}: {e}")
+            context = None
+        self.count("contextFetches")
+        self.contexts.store(url, context)
+        return context
+
+    def known_failure(self, url: str, accept: str) -> Optional[str]:
+        """the reason url recently failed for good (if it did)"""
+        if self.negative_cache is None:
+            return None
+        reason = self.negative_cache.lookup(url, accept)
+        if reason is not None:
+            self.count("negativeCacheHits")
+        return reason
+
+    def remember_failure(
+        self, url: str, reason: str, accept: str = None
+    ) -> None:
+        """remember url failed for good, see NegativeCache.remember"""
+        if self.negative_cache is not None:
+            self.negative_cache.remember(url, reason, accept)
+
+    def preferred_formats(self, url: str, formats: List[str]) -> List[str]:
+        """the formats in the order that works best for the host of url,
+        see HostFormatStats.preferred"""
+        if self.format_stats is None:
+            return formats
+        preferred = self.format_stats.preferred(url, formats)
+        if preferred != list(formats):
+            self.count("learnedFormats")
+        return preferred
+
+    def record_format(self, url: str, mime_type: str, success: bool) -> None:
+        """count the host of url served mime_type, see HostFormatStats"""
+        if self.format_stats is not None:
+            self.format_stats.record(url, mime_type, success)
+
+    def open_hosts(self) -> List[str]:
+        """the hosts currently failing fast (if using circuit breakers)"""
+        if self.breakers is None:
+            return []
+        return self.breakers.open_hosts()
+
+    def host_windows(self) -> Dict[str, float]:
+        """the current concurrency window per host (if throttling)"""
+        if self.scheduler is None:
+            return dict()
+        return self.scheduler.windows()
+
+    def count(self, key: str, amount: int = 1) -> None:
+        """increase the stats counter for key"""
+        with self._stats_lock:
+            self.stats[key] += amount
+
+    def stats_snapshot(self) -> Counter:
+        """a copy of the current stats counters"""
+        with self._stats_lock:
+            return Counter(self.stats)
+
+    def close(self) -> None:
+        """releases all pooled connections and parser workers,
+        saves the learned formats"""
+        self.session.close()
+        self.parsers.close()
+        if self.format_stats is not None:
+            self.format_stats.save()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
 class LODAwareHTMLParser(HTMLParser):
     """
     HTMLParser that knows about LOD embedding and linking techniques.
+    Can be fed incrementally, when scripts are not captured it is done
+    as soon as the head of the page is passed (links can only be there).
     """
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, capture_scripts: bool = True, **kwargs):
+        """constructor
+
+        :param capture_scripts: capture embedded json-ld/turtle scripts,
+         else only the describedby links in the head are looked for
+        :type capture_scripts: bool
+        """
         super().__init__(*args, **kwargs)
+        self.capture_scripts = capture_scripts
         self.links = []
         self.scripts = []
         self.in_script = False
         self.type = None
+        self.done = False
+        self._script_data = []
 
     def handle_starttag(self, tag, attrs):
+        if tag == "body":
+            self._end_of_head()
+            return
         attrs = dict(attrs)
         if tag == "link" and "rel" in attrs and attrs["rel"] == "describedby":
             if "href" in attrs:
                 self.links.append(attrs["href"])
         elif (
-            tag == "script"
+            self.capture_scripts
+            and tag == "script"
             and "type" in attrs
             and (
                 attrs["type"] == "application/ld+json"
@@ -50,142 +1291,777 @@ class LODAwareHTMLParser(HTMLParser):
             self.type = attrs["type"]
 
     def handle_endtag(self, tag):
-        if tag == "script":
+        if tag == "head":
+            self._end_of_head()
+        elif tag == "script" and self.in_script:
+            # data can come in pieces when fed incrementally
+            self.scripts.append({self.type: "".join(self._script_data)})
+            self._script_data = []
             self.in_script = False
 
     def handle_data(self, data):
         if self.in_script:
-            self.scripts.append({self.type: data})
+            self._script_data.append(data)
+
+    def _end_of_head(self):
+        if not self.capture_scripts:
+            self.done = True
+
+    def scan(self, html: TextIO, chunk_size: int = 64 * 1024):
+        """feed the html in chunks, stopping as soon as done
+
+        :param html: the html to read
+        :type html: TextIO
+        :param chunk_size: number of characters fed at once
+        :type chunk_size: int
+        """
+        while not self.done and (chunk := html.read(chunk_size)):
+            self.feed(chunk)
+
+    def scan_chunks(self, chunks: Iterable[bytes], encoding: str = "utf-8"):
+        """feed the html as its bytes come in, stopping as soon as done
+
+        :param chunks: the bytes of the html, e.g. from a streaming response
+        :type chunks: Iterable[bytes]
+        :param encoding: the encoding to decode the bytes with
+        :type encoding: str
+        """
+        decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+        for chunk in chunks:
+            self.feed(decoder.decode(chunk))
+            if self.done:
+                return
+        self.feed(decoder.decode(b"", final=True))
+
+
+def accept_header(formats: List[str]) -> str:
+    """build a q-weighted Accept header preferring the formats in order,
+    with text/html as last resort (to allow for signposting)
+
+    :param formats: the rdf mimetypes, in order of preference
+    :type formats: List[str]
+    :returns: e.g. "text/turtle;q=1.0, application/ld+json;q=0.9, ..."
+    :rtype: str
+    """
+    weighted = []
+    q = 1.0
+    for format in dict.fromkeys(formats):
+        if format == "text/html":
+            continue
+        weighted.append(f"{format};q={q:.1f}")
+        q = max(0.2, q - 0.1)
+    weighted.append("text/html;q=0.1")
+    return ", ".join(weighted)
+
+
+def inline_contexts(
+    document: Any,
+    base: str,
+    resolve: Callable[[str], Optional[dict]],
+    depth: int = 0,
+) -> Any:
+    """replace the remote @context references (urls) in the json-ld
+    document by the contexts they refer to, as far as these resolve
+
+    :param document: the parsed json-ld document
+    :type document: Any
+    :param base: the url to resolve relative context urls against
+    :type base: str
+    :param resolve: gives the context document for a context url
+     (None if it is unavailable)
+    :type resolve: Callable[[str], Optional[dict]]
+    :returns: the document with its contexts inlined
+    :rtype: Any
+    """
+    if isinstance(document, list):
+        return [
+            inline_contexts(item, base, resolve, depth) for item in document
+        ]
+    if not isinstance(document, dict):
+        return document
+    # else
+    return {
+        key: (
+            _inline_context(value, base, resolve, depth)
+            if key == "@context"
+            else inline_contexts(value, base, resolve, depth)
+        )
+        for key, value in document.items()
+    }
+
+
+def _inline_context(
+    context: Any,
+    base: str,
+    resolve: Callable[[str], Optional[dict]],
+    depth: int,
+) -> Any:
+    if isinstance(context, list):
+        inlined = []
+        for item in context:
+            item = _inline_context(item, base, resolve, depth)
+            # a remote context can itself be a list, no nesting those
+            inlined.extend(item if isinstance(item, list) else [item])
+        return inlined
+    if isinstance(context, str):
+        url = urljoin(base, context)
+        remote = resolve(url) if depth < MAX_CONTEXT_DEPTH else None
+        if not isinstance(remote, dict):
+            return url  # left to the parser
+        return _inline_context(
+            remote.get("@context", {}), url, resolve, depth + 1
+        )
+    if isinstance(context, dict):
+        # scoped contexts in the term definitions
+        context = inline_contexts(context, base, resolve, depth)
+        imported = context.get("@import")
+        if isinstance(imported, str):
+            remote = _inline_context(imported, base, resolve, depth)
+            if isinstance(remote, dict):
+                del context["@import"]
+                context = {**remote, **context}
+    return context
+
+
+def _parse_jsonld(
+    graph: Graph, document: Any, subject_url: str, fetcher: WebFetcher
+):
+    """parse the json-ld document into the graph, with its remote
+    contexts inlined from the context cache of the fetcher"""
+    document = inline_contexts(document, subject_url, fetcher.jsonld_context)
+    fetcher.parsers.parse(graph, document, "json-ld", subject_url)
 
 
-def get_graph_for_format(subject_url: str, formats: str, graph: Graph = None):
+class DereferenceResult:
+    """
+    The outcome of dereferencing a single url.
+    Contents are :
+    - the url
+    - the discovered graph (None if nothing could be found)
+    - the mimetype the content came as
+    - the outcome: "ok", "parseError", "httpError", "unsupportedFormat",
+      "maxBytesExceeded", "maxSecondsExceeded" or "hostUnavailable"
+    - the http status code of a failed request (None if not known)
+    """
+
+    def __init__(
+        self,
+        url: str,
+        graph: Optional[Graph] = None,
+        mime_type: str = None,
+        outcome: str = "ok",
+        status_code: int = None,
+    ):
+        self.url = url
+        self.graph = graph
+        self.mime_type = mime_type
+        self.outcome = outcome
+        self.status_code = status_code
+
+    @property
+    def definitive(self) -> bool:
+        """if asking again later in the run would give the same outcome:
+        not so for budgets, unavailable hosts and server errors
+        (an httpError without status code is a known gone url)"""
+        if self.outcome in DEFINITIVE_OUTCOMES:
+            return True
+        if self.outcome != "httpError":
+            return False
+        if self.status_code is None:
+            return True
+        return (
+            400 <= self.status_code < 500
+            and self.status_code not in TRANSIENT_STATUSES
+        )
+
+
+class LinkWalk:
+    """
+    The links (to alternate descriptions) followed from a single
+    dereferenced url, however deep they go.
+    Each url is claimed once, under a lock, so link cycles are not
+    followed again, also not by the threads fetching concurrently.
+    The alternates are fetched on one pool of ALTERNATES_CONCURRENCY
+    threads, asking for the same formats as the url they were found on.
+    The links found while fetching an alternate are added to the pool
+    too, and all results are merged into the graph of the thread that
+    started the walk, as they come in.
+    """
+
+    def __init__(
+        self,
+        fetcher: WebFetcher,
+        formats: List[str],
+        html_scripts: bool = True,
+        max_workers: int = ALTERNATES_CONCURRENCY,
+    ):
+        """constructor
+
+        :param fetcher: the fetcher to dereference the alternates with
+        :type fetcher: WebFetcher
+        :param formats: the rdf mimetypes to ask for, in order of preference
+        :type formats: List[str]
+        :param html_scripts: also harvest the scripts embedded in html
+        :type html_scripts: bool
+        :param max_workers: max number of alternates fetched at once
+        :type max_workers: int
+        """
+        self.fetcher = fetcher
+        self.formats = formats
+        self.html_scripts = html_scripts
+        self.max_workers = max_workers
+        self._owner = threading.get_ident()
+        self._claimed: Set[str] = set()
+        self._pending: Dict[Future, str] = dict()
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def claim(self, url: str) -> bool:
+        """claim the url to be followed
+
+        :returns: False if it was claimed before
+        :rtype: bool
+        """
+        with self._lock:
+            if url in self._claimed:
+                return False
+            self._claimed.add(url)
+            return True
+
+    def follow(self, graph: Graph, subject_url: str, links: List[str]):
+        """dereference the links found for subject_url (not claimed before)
+        and add their content to the graph (in place).
+        Only waits for the results in the thread that started the walk,
+        the others leave their links for it to merge.
+        """
+        for link in links:
+            url = urljoin(subject_url, link)  # resolves relative links
+            if not self.claim(url):
+                log.debug(f"not following {url} again")
+                continue
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(self.max_workers)
+                future = self._pool.submit(self._dereference, url)
+                self._pending[future] = url
+        if threading.get_ident() != self._owner:
+            return graph
+        # else
+        try:
+            self._merge(graph)
+        finally:
+            with self._lock:
+                if self._pool is not None:
+                    self._pool.shutdown()
+                    self._pool = None
+        return graph
+
+    def _dereference(self, url: str) -> DereferenceResult:
+        return dereference(
+            url,
+            self.formats,
+            fetcher=self.fetcher,
+            walk=self,
+            html_scripts=self.html_scripts,
+        )
+
+    def _merge(self, graph: Graph) -> None:
+        # the pending include the links found by the alternates themselves
+        while True:
+            with self._lock:
+                pending = list(self._pending)
+            if not pending:
+                return
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                with self._lock:
+                    url = self._pending.pop(future)
+                try:
+                    alt_graph = future.result().graph
+                except Exception as e:
+                    log.warning(f"failed to get {url} error: {e}")
+                    continue
+                if alt_graph is not None:
+                    graph += alt_graph
+
+
+def dereference(
+    subject_url: str,
+    formats: List[str] = DEFAULT_FORMATS,
+    graph: Graph = None,
+    fetcher: WebFetcher = None,
+    walk: LinkWalk = None,
+    html_scripts: bool = True,
+) -> DereferenceResult:
     """
     Discover triples describing the subject (assumed at subject_url)
-    and add them to the graph
+    with a single content-negotiated request, dispatching on the
+    Content-Type that comes back: rdf gets parsed, signposting links
+    in the Link header get followed (without downloading the body),
+    and otherwise html gets searched for links and embedded rdf.
+    The body is streamed to the parser within the budgets of the fetcher,
+    exceeding those leaves the graph None with the outcome telling why.
 
-    :param subject_url: url (originally assumed from <uri>)
-    pointing to the subject to be discovered
+    :param subject_url: url pointing to the subject to be discovered
     :type subject_url: str
-    :param g: graph to be filled
-    :type g: rdflib.Graph
-    :param format: indicating what format should be retrieved json-ld, turtle
-    :type form: str
-    :returns: the graph whith added discovered triples
-    :rtype: rdflib.Graph
+    :param formats: the rdf mimetypes to ask for, in order of preference
+    :type formats: List[str]
+    :param graph: (optional) graph to be filled
+    :type graph: rdflib.Graph
+    :param fetcher: (optional) the shared fetcher to use for the requests
+     - If None, a private fetcher is created (and closed) for this call.
+    :type fetcher: WebFetcher
+    :param walk: (optional) the following of links this url was found by,
+     else a walk is started for the links found on this url
+    :type walk: LinkWalk
+    :param html_scripts: also harvest the json-ld/turtle scripts embedded
+     in html, else only the head of the html is scanned for links
+    :type html_scripts: bool
+    :returns: the result holding the discovered graph and its mimetype
+    :rtype: DereferenceResult
     """
-
     if subject_url is None:
-        return None
+        return DereferenceResult(subject_url)
 
     if graph is None:
         graph = Graph()  # create a fresh graph if you don't have it yet
 
-    total_retry = 8
-    session = requests.Session()
-    retry = Retry(
-        total=total_retry,
-        backoff_factor=0.4,
-        status_forcelist=[500, 502, 503, 504, 429],
-    )
-    adapter = HTTPAdapter(max_retries=retry)
-    session.mount("http://", adapter)
-    session.mount("https://", adapter)
+    if fetcher is None:
+        # no shared fetcher given, use a private one for this call
+        with WebFetcher() as fetcher:
+            return dereference(
+                subject_url, formats, graph, fetcher, walk, html_scripts
+            )
 
-    triples_found = False
+    if walk is None:
+        walk = LinkWalk(fetcher, formats, html_scripts)
+        walk.claim(subject_url)
 
-    ACCEPTABLE_MIMETYPES = {
-        "application/ld+json",
-        "text/turtle",
-        "application/json",
-    }
+    mirrored = fetcher.mirrored(subject_url)
+    if mirrored is not None:
+        log.debug(f"resolved {subject_url} from its local mirror")
+        mirror_graph, mime_type = mirrored
+        graph += mirror_graph
+        return DereferenceResult(subject_url, graph, mime_type)
 
-    for format in formats:
-        headers = {"Accept": format}
-        log.debug(f"requesting {subject_url} with {headers=}")
-        r = session.get(subject_url, headers=headers)
-        mime_type, options = cgi.parse_header(r.headers["Content-Type"])
-        log.debug(f"got {r.status_code=} {mime_type=}")
+    # put the formats known to work for this host first
+    accept = accept_header(fetcher.preferred_formats(subject_url, formats))
+    known_failure = fetcher.known_failure(subject_url, accept)
+    if known_failure is not None:
+        log.info(f"skipping {subject_url}, recently failed: {known_failure}")
+        return DereferenceResult(subject_url, None, None, known_failure)
 
-        if r.status_code == 200 and bool(mime_type in ACCEPTABLE_MIMETYPES):
-            triples_found = True
+    scanner = None
+    if not walk.html_scripts:
+        # only the links in the head of html are needed, scan the stream
+        scanner = LODAwareHTMLParser(capture_scripts=False)
+
+    headers = {"Accept": accept}
+    log.debug(f"requesting {subject_url} with {headers=}")
+    try:
+        r, body = fetcher.fetch(
+            subject_url,
+            headers=headers,
+            wants_body=_wants_body,
+            scanner=scanner,
+        )
+    except BudgetExceeded as e:
+        log.warning(f"skipping {subject_url}: {e}")
+        return DereferenceResult(subject_url, None, None, e.outcome)
+    except CircuitOpen as e:
+        log.warning(f"skipping {subject_url}: {e}")
+        return DereferenceResult(subject_url, None, None, "hostUnavailable")
+    mime_type, options = cgi.parse_header(r.headers.get("Content-Type", ""))
+    log.debug(f"got {r.status_code=} {mime_type=}")
+
+    if body is not None and mime_type in ACCEPTABLE_MIMETYPES:
+        outcome = "ok"
+        with body:
             try:
                 # if mimetype is application/json assume application/ld+json
                 # to satisfy the known formats of rdflib.parser
                 if mime_type == "application/json":
                     mime_type = "application/ld+json"
-                # TODO: find out how to configure local_server.py
-                # to return the correct mime types for the response header
-                if mime_type == "application/octet-stream":
-                    mime_type = "text/turtle"
-                graph.parse(
-                    data=r.text, format=mime_type, publicID=subject_url
-                )
-
+                if mime_type == "application/ld+json":
+                    _parse_jsonld(graph, json.load(body), subject_url, fetcher)
+                else:
+                    fetcher.parsers.parse(graph, body, mime_type, subject_url)
             except Exception as e:
                 log.warning(
-                    f"failed to parse {subject_url} in {format=} error: {e}"
+                    f"failed to parse {subject_url} as {mime_type=} error: {e}"
                 )
+                outcome = "parseError"
+        fetcher.record_format(subject_url, mime_type, outcome == "ok")
+        return DereferenceResult(subject_url, graph, mime_type, outcome)
 
-            finally:
-                return graph
-
-    if not triples_found:
-        # perform a check in the html to
-        # see if there is any link to fair signposting
-        # perform request to uri with accept header text/html
-        headers = {"Accept": "text/html"}
-        r = session.get(subject_url, headers=headers)
-        if r.status_code == 200 and "text/html" in r.headers["Content-Type"]:
-            # parse the html and check if there is any link to fair signposting
-            # if there is then download it to the triplestore
-            log.info(f"content of {subject_url} is html")
-            # go over the html file and find all the links in the head section
-            # and check if there is any links with rel="describedby" anf if so
-            # then follow it and download it to the triplestore
-
-            parser = LODAwareHTMLParser()
-            parser.feed(r.text)
-            log.info(f"found {len(parser.links)} links in the html file")
-            graph = Graph()
-            for alt_url in parser.links:
-                # check first if the link is absolute or relative
-                if alt_url.startswith("http"):
-                    alt_abs_url = alt_url
-                else:
-                    # Resolve the relative URL to an absolute URL
-                    alt_abs_url = urljoin(subject_url, alt_url)
-                # use this linked uri as the alternative for this subect
-                # determine the format of the file and use the correct parser
-                try:
-                    graph = graph + get_graph_for_format(
-                        alt_abs_url, formats=ACCEPTABLE_MIMETYPES
-                    )
-
-                except Exception as e:
-                    log.warning(
-                        f"failed to get {alt_abs_url} in {format=} error: {e}"
-                    )
+    links = signposting_links(r) if r.status_code == 200 else []
+    if links:
+        # the Link header already points to the rdf, no need for the body
+        log.info(f"found {len(links)} signposting links for {subject_url}")
+        fetcher.count("signpostingHeaders")
+        size = len(graph)
+        walk.follow(graph, subject_url, links)
+        fetcher.record_format(subject_url, mime_type, len(graph) > size)
+        return DereferenceResult(subject_url, graph, mime_type)
 
-            for script in parser.scripts:
-                # parse the script and check if it is json-ld or turtle
-                # if so then add it to the triplestore
-                log.info(f"script: {script}")
-                # { 'application/ld+json': '...'} | {'text/turtle': '...'}
-                for ctype, content in script.items():
-                    cformat: str = ctype_to_rdf_format(ctype)
-                    if format is None:  # ctype is not known as rdf-format
-                        continue  # skip
-                    log.info(f"found script with rdf {ctype=}, {cformat=}")
-                    graph.parse(
-                        data=content, format=cformat, publicID=subject_url
-                    )
+    scanned = scanner is not None and r.status_code == 200
+    if mime_type == "text/html" and (body is not None or scanned):
+        # check the html for links to fair signposting and embedded rdf
+        log.info(f"content of {subject_url} is html")
+        size = len(graph)
+        if body is not None:
+            scanner = LODAwareHTMLParser(capture_scripts=walk.html_scripts)
+            with TextIOWrapper(
+                body, encoding=r.encoding or "utf-8", errors="replace"
+            ) as html:
+                scanner.scan(html)
+        _graph_from_html(graph, subject_url, scanner, fetcher, walk)
+        fetcher.record_format(subject_url, mime_type, len(graph) > size)
+        return DereferenceResult(subject_url, graph, mime_type)
 
-            parser.close()
-            return graph
+    if r.status_code == 200 and mime_type not in ACCEPTABLE_MIMETYPES:
+        # served fine, but in none of the formats asked (nor html)
         log.warning(
-            f"request for {subject_url} failed "
-            f"with status code {r.status_code} "
-            f"and content type {r.headers['Content-Type']}"
+            f"request for {subject_url} got unsupported "
+            f"content type {r.headers.get('Content-Type')}"
+        )
+        if body is not None:
+            body.close()
+        fetcher.record_format(subject_url, mime_type, False)
+        fetcher.remember_failure(subject_url, "unsupportedFormat", accept)
+        return DereferenceResult(
+            subject_url, None, mime_type, "unsupportedFormat"
         )
 
-    return None
+    log.warning(
+        f"request for {subject_url} failed "
+        f"with status code {r.status_code} "
+        f"and content type {r.headers.get('Content-Type')}"
+    )
+    if body is not None:
+        body.close()
+    if r.status_code in GONE_STATUSES:
+        fetcher.remember_failure(subject_url, "httpError")
+    return DereferenceResult(
+        subject_url, None, mime_type, "httpError", r.status_code
+    )
+
+
+def get_graph_for_format(
+    subject_url: str,
+    formats: List[str],
+    graph: Graph = None,
+    fetcher: WebFetcher = None,
+):
+    """
+    Discover triples describing the subject (assumed at subject_url)
+    and add them to the graph
+
+    :param subject_url: url (originally assumed from <uri>)
+    pointing to the subject to be discovered
+    :type subject_url: str
+    :param formats: the rdf mimetypes to ask for, in order of preference
+    :type formats: List[str]
+    :param graph: graph to be filled
+    :type graph: rdflib.Graph
+    :param fetcher: (optional) the shared fetcher to use for the requests
+     - If None, a private fetcher is created for this call.
+    :type fetcher: WebFetcher
+    :returns: the graph whith added discovered triples
+    :rtype: rdflib.Graph
+    """
+    return dereference(subject_url, formats, graph, fetcher).graph
+
+
+def signposting_links(r: requests.Response) -> List[str]:
+    """
+    the links to rdf in the Link header of the response (FAIR signposting):
+    all rel="describedby" ones (unless typed as non rdf)
+    and the rel="alternate" ones typed as rdf
+
+    :param r: the response to check
+    :type r: requests.Response
+    :returns: the absolute urls of the links found, in order
+    :rtype: List[str]
+    """
+    links = []
+    for link in parse_header_links(r.headers.get("Link", "")):
+        rels = link.get("rel", "").split()
+        link_type = link.get("type")
+        if ("describedby" in rels and link_type is None) or (
+            ("describedby" in rels or "alternate" in rels)
+            and link_type in ACCEPTABLE_MIMETYPES
+        ):
+            links.append(urljoin(r.url, link["url"]))
+    return list(dict.fromkeys(links))
+
+
+def _wants_body(r: requests.Response) -> bool:
+    """only rdf, or html without signposting links, needs downloading"""
+    mime_type, _ = cgi.parse_header(r.headers.get("Content-Type", ""))
+    if mime_type in ACCEPTABLE_MIMETYPES:
+        return True
+    return mime_type == "text/html" and not signposting_links(r)
+
+
+def _graph_from_html(
+    graph: Graph,
+    subject_url: str,
+    parser: LODAwareHTMLParser,
+    fetcher: WebFetcher,
+    walk: LinkWalk,
+):
+    """
+    go over what the parser found scanning the html: follow the links in
+    the head section with rel="describedby" and add their content.
+    Also add the content of scripts with embedded rdf (if html_scripts).
+    All is added to the graph in place.
+    The html is scanned incrementally, and only up to the end of the head
+    if no scripts are wanted.
+    """
+    log.info(f"found {len(parser.links)} links in the html file")
+    walk.follow(graph, subject_url, parser.links)
+
+    for script in parser.scripts:
+        # parse the script and check if it is json-ld or turtle
+        # if so then add it to the graph
+        log.info(f"script: {script}")
+        # { 'application/ld+json': '...'} | {'text/turtle': '...'}
+        for ctype, content in script.items():
+            cformat: str = ctype_to_rdf_format(ctype)
+            if cformat is None:  # ctype is not known as rdf-format
+                continue  # skip
+            log.info(f"found script with rdf {ctype=}, {cformat=}")
+            if cformat == "json-ld":
+                _parse_jsonld(graph, json.loads(content), subject_url, fetcher)
+            else:
+                graph.parse(data=content, format=cformat, publicID=subject_url)
+
+    parser.close()
+    return graph
+
+
+class AsyncDereferencer:
+    """
+    asyncio driven engine to dereference many uris at once.
+    The blocking fetches are run on a thread pool, bounded by a global
+    concurrency limit and a limit per host.
+    The limits are shared by all calls on the instance, also when these
+    run at the same time from several threads (each in its own loop).
+    """
+
+    def __init__(
+        self,
+        fetcher: WebFetcher = None,
+        max_concurrency: int = 16,
+        max_per_host: int = 4,
+    ):
+        """constructor
+
+        :param fetcher: (optional) the shared WebFetcher to fetch through
+         - If None, a private one is used, released by close()
+        :type fetcher: WebFetcher
+        :param max_concurrency: max number of fetches in flight overall
+        :type max_concurrency: int
+        :param max_per_host: max number of fetches in flight per host
+        :type max_per_host: int
+        """
+        self._owns_fetcher = fetcher is None
+        self.fetcher = fetcher or WebFetcher(pool_maxsize=max_per_host)
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_per_host = max(1, max_per_host)
+        # shared by the loops of all calls, so these are thread-safe ones
+        self._global_slots = threading.BoundedSemaphore(self.max_concurrency)
+        self._host_slots: Dict[str, threading.BoundedSemaphore] = dict()
+        self._lock = threading.Lock()
+        log.debug(
+            f"AsyncDereferencer initialized with {self.max_concurrency=} "
+            f"{self.max_per_host=}"
+        )
+
+    def close(self) -> None:
+        """releases the private fetcher (a shared one is left open)"""
+        if self._owns_fetcher:
+            self.fetcher.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def dereference_all(
+        self,
+        uris: Iterable[str],
+        formats: List[str],
+        html_scripts: bool = True,
+    ) -> Dict[str, DereferenceResult]:
+        """dereference all uris concurrently (blocking till all are done),
+        runs its own event loop, so it can not be called from a coroutine
+        (await dereference_all_async there instead)
+
+        :param uris: the uris to dereference
+        :type uris: Iterable[str]
+        :param formats: the mimetypes to request, see dereference
+        :type formats: List[str]
+        :param html_scripts: harvest scripts embedded in html, see dereference
+        :type html_scripts: bool
+        :returns: the DereferenceResult per uri,
+         uris that raised an error while fetching are left out
+        :rtype: Dict[str, DereferenceResult]
+        :raises RuntimeError: when called from a running event loop
+        """
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            pass  # no loop running, as it should
+        else:
+            raise RuntimeError(
+                "dereference_all can not run inside an event loop, "
+                "await dereference_all_async instead"
+            )
+        return asyncio.run(
+            self.dereference_all_async(uris, formats, html_scripts)
+        )
+
+    async def dereference_all_async(
+        self,
+        uris: Iterable[str],
+        formats: List[str],
+        html_scripts: bool = True,
+    ) -> Dict[str, DereferenceResult]:
+        """coroutine version of dereference_all"""
+        uris = list(dict.fromkeys(uris))  # unique, but keeping the order
+        # these only order the fetches of this call over its threads,
+        # the limits across calls are held by the threads (see _dereference)
+        global_limit = asyncio.Semaphore(self.max_concurrency)
+        host_limits = defaultdict(lambda: asyncio.Semaphore(self.max_per_host))
+        loop = asyncio.get_running_loop()
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as pool:
+
+            async def dereference_one(uri: str):
+                # take the host slot first, so waiting on a busy host
+                # does not hold up a global slot
+                async with host_limits[urlparse(uri).netloc], global_limit:
+                    return await loop.run_in_executor(
+                        pool,
+                        partial(self._dereference, uri, formats, html_scripts),
+                    )
+
+            outcomes = await asyncio.gather(
+                *(dereference_one(uri) for uri in uris), return_exceptions=True
+            )
+
+        results = dict()
+        for uri, outcome in zip(uris, outcomes):
+            if isinstance(outcome, Exception):
+                log.warning(f"failed to dereference {uri} error: {outcome}")
+                continue
+            results[uri] = outcome
+        log.debug(f"dereferenced {len(results)} of {len(uris)} uris")
+        return results
+
+    def _dereference(
+        self, uri: str, formats: List[str], html_scripts: bool
+    ) -> DereferenceResult:
+        """dereference uri (in a worker thread) within the limits shared
+        by all calls, again taking the host slot first"""
+        host = urlparse(uri).netloc
+        with self._lock:
+            if host not in self._host_slots:
+                self._host_slots[host] = threading.BoundedSemaphore(
+                    self.max_per_host
+                )
+            host_slot = self._host_slots[host]
+        with host_slot, self._global_slots:
+            return dereference(
+                uri, formats, fetcher=self.fetcher, html_scripts=html_scripts
+            )
+
+
+class DereferenceMemo:
+    """
+    Run-scoped memo of dereferenced (uri, accept) pairs.
+    Keeps the definitive DereferenceResult (the graph may be None if
+    nothing was found) so the same uri is fetched only once per run,
+    however many subjects, paths, tasks or configs pass through it.
+    It also remembers which of these were already inserted into the graph
+    of which config (as which mimetype and with how many triples).
+    The kept graphs are bounded to max_triples in total,
+    evicting the least recently used ones first.
+    """
+
+    def __init__(self, max_triples: int = 1000000):
+        """constructor
+
+        :param max_triples: max total number of triples kept in memory
+        :type max_triples: int
+        """
+        self.max_triples = max_triples
+        self._results: OrderedDict = OrderedDict()
+        self._triples = 0
+        self._inserted: Dict[Tuple[str, str, str], Tuple[str, int]] = dict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _size(result: DereferenceResult) -> int:
+        return 0 if result.graph is None else len(result.graph)
+
+    def lookup(
+        self, uri: str, accept: str
+    ) -> Tuple[bool, Optional[DereferenceResult]]:
+        """get the memoized result for uri and Accept header
+
+        :returns: tuple of (found, result), the graph of the result
+         may be None if the uri was dereferenced before without success
+        :rtype: Tuple[bool, Optional[DereferenceResult]]
+        """
+        key = (uri, accept)
+        with self._lock:
+            if key not in self._results:
+                return False, None
+            self._results.move_to_end(key)
+            return True, self._results[key]
+
+    def put(self, uri: str, accept: str, result: DereferenceResult) -> None:
+        """memoize the result found for uri and Accept header,
+        if it is definitive (transient failures get another chance)"""
+        if not result.definitive:
+            log.debug(f"not memoizing {result.outcome} for {uri=}")
+            return
+        size = self._size(result)
+        if size > self.max_triples:
+            return  # would evict everything else and still not fit
+        key = (uri, accept)
+        with self._lock:
+            if key in self._results:
+                self._triples -= self._size(self._results.pop(key))
+            self._results[key] = result
+            self._triples += size
+            while self._triples > self.max_triples:
+                _, evicted = self._results.popitem(last=False)
+                self._triples -= self._size(evicted)
+
+    def inserted(
+        self, uri: str, accept: str, name_config: str
+    ) -> Optional[Tuple[str, int]]:
+        """the (mimetype, triple_count) of uri inserted for name_config,
+        None if it was not inserted yet"""
+        with self._lock:
+            return self._inserted.get((uri, accept, name_config))
+
+    def mark_inserted(
+        self,
+        uri: str,
+        accept: str,
+        name_config: str,
+        mime_type: str,
+        triple_count: int,
+    ) -> None:
+        """remember the graph of uri got inserted for name_config"""
+        with self._lock:
+            self._inserted[(uri, accept, name_config)] = (
+                mime_type,
+                triple_count,
+            )
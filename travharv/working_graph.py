@@ -0,0 +1,207 @@
+import logging
+import re
+import threading
+from collections import defaultdict
+from itertools import islice
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from pyrdfstore import create_rdf_store
+from rdflib import BNode, Graph, URIRef
+
+from travharv.config_build import AssertPathTrie
+from travharv.store import DEFAULT_URN_BASE, RDFStoreAccess
+
+log = logging.getLogger(__name__)
+
+# the path parts a working graph can be seeded for: a plain iri
+IRI_STEP = re.compile(r"^<([^<>\s]*)>$")
+
+# the named graph in the working graph holding the seeded triples
+SEED_GRAPH = f"{DEFAULT_URN_BASE}working-graph:seed"
+
+# a node of a seeding frontier: the uri it was reached from and the parts
+# leading from there through blank nodes to it (none for the uri itself)
+SeedNode = Tuple[str, Tuple[str, ...]]
+
+
+def step_predicate(part: str) -> Optional[URIRef]:
+    """get the predicate of a (resolved) path part that is a plain iri
+
+    :param part: the path part, e.g. <https://schema.org/geo>
+    :type part: str
+    :returns: the predicate, None for parts that are no plain iri
+    :rtype: URIRef
+    """
+    match = IRI_STEP.match(part.strip())
+    if match is None:
+        return None
+    return URIRef(match.group(1))
+
+
+class WorkingGraphAccess(RDFStoreAccess):
+    """
+    Local in-memory working graph standing in for the target store
+    while asserting paths, so the hop checks are local lookups
+    instead of round trips to a (remote) store.
+
+    The triples the target store already holds along the paths
+    get copied in (seeded) for batches of subjects. Harvested triples go
+    into the working graph and are kept aside, to be written back
+    to the target store in one bulk insert per config (see write_back).
+    Triples the target store holds about nodes that are first reached
+    during the run are not seen, unless those nodes get dereferenced.
+    Blank nodes can not be bound in a later query, so the hops through
+    them are selected along with the hops leading to them, from the last
+    uri on the way (copying those leading triples once more).
+    Seeding is only possible for paths of which each part is a plain iri
+    (as resolve_ppaths makes them), see supports.
+    """
+
+    def __init__(self, target: RDFStoreAccess, batch_size: int = 100):
+        """constructor
+
+        :param target: the store the working graph stands in for
+        :type target: RDFStoreAccess
+        :param batch_size: max number of nodes per seeding query
+        :type batch_size: int
+        """
+        super().__init__(create_rdf_store(), prepared_queries=True)
+        self.target = target
+        self.batch_size = max(1, batch_size)
+        # the nodes seeded per trie node, so no hop is queried twice
+        self._seeded: Set[Tuple[SeedNode, AssertPathTrie]] = set()
+        self._pending: Dict[str, Graph] = dict()
+        self._pending_lock = threading.Lock()
+
+    @staticmethod
+    def supports(path_trie: AssertPathTrie) -> bool:
+        """check if the working graph can be seeded for all paths in the trie
+
+        :param path_trie: the trie of the paths to assert
+        :type path_trie: AssertPathTrie
+        :rtype: bool
+        """
+        return all(
+            step_predicate(part) is not None
+            and WorkingGraphAccess.supports(child)
+            for part, child in path_trie.children.items()
+        )
+
+    def seed(self, subjects: List[str], path_trie: AssertPathTrie, NSM) -> int:
+        """copy the triples along the paths from the subjects
+        from the target store into the working graph, hop by hop
+        with a single query per batch of nodes and path part
+
+        :param subjects: the uris of the subjects
+        :type subjects: List[str]
+        :param path_trie: the trie of the paths to assert
+        :type path_trie: AssertPathTrie
+        :param NSM: the namespaces to resolve the paths with
+        :type NSM: NamespaceManager
+        :returns: the number of triples seeded
+        :rtype: int
+        """
+        seed = Graph()
+        frontier = [(str(s), ()) for s in subjects if isinstance(s, str)]
+        level = [(path_trie, frontier)]
+        while level:
+            next_level = []
+            for trie_node, frontier in level:
+                for child in trie_node.children.values():
+                    reached = self._seed_step(frontier, child, seed, NSM)
+                    if reached:
+                        next_level.append((child, reached))
+            level = next_level
+        if len(seed) > 0:
+            self.insert(seed, SEED_GRAPH)
+        log.debug(f"seeded {len(seed)} triples for {len(subjects)} subjects")
+        return len(seed)
+
+    def _seed_step(
+        self,
+        frontier: List[SeedNode],
+        trie_node: AssertPathTrie,
+        seed: Graph,
+        NSM,
+    ) -> List[SeedNode]:
+        """copy the triples of the hop of trie_node from the frontier,
+        with a single query per batch of nodes reached the same way
+
+        :returns: the nodes the hop reaches
+        :rtype: List[SeedNode]
+        """
+        nodes = [
+            node for node in frontier if (node, trie_node) not in self._seeded
+        ]
+        self._seeded.update((node, trie_node) for node in nodes)
+        anchors_by_via: Dict[Tuple[str, ...], List[str]] = defaultdict(list)
+        for anchor, via in nodes:
+            anchors_by_via[via].append(anchor)
+        reached = dict()
+        for via, anchors in anchors_by_via.items():
+            parts = via + (trie_node.part,)
+            anchors = iter(anchors)
+            while batch := list(islice(anchors, self.batch_size)):
+                chains = self.target.select_chains(batch, parts, NSM)
+                # blank node labels only hold within a single result
+                fresh: Dict[BNode, BNode] = defaultdict(BNode)
+                for anchor, rows in chains.items():
+                    for row in rows:
+                        obj = self._copy_chain(seed, anchor, parts, row, fresh)
+                        if isinstance(obj, URIRef):
+                            reached[(str(obj), ())] = None
+                        elif isinstance(obj, BNode):
+                            reached[(anchor, parts)] = None
+        return list(reached)
+
+    @staticmethod
+    def _copy_chain(
+        seed: Graph,
+        anchor: str,
+        parts: Tuple[str, ...],
+        row: Tuple,
+        fresh: Dict[BNode, BNode],
+    ) -> Any:
+        """add the triples of a chain of hops from the anchor to the seed,
+        with fresh blank nodes, and get the node it ends at"""
+        node = URIRef(anchor)
+        for part, obj in zip(parts, row):
+            if isinstance(obj, BNode):
+                obj = fresh[obj]
+            seed.add((node, step_predicate(part), obj))
+            node = obj
+        return node
+
+    def insert_for_config(self, graph: Graph, name_config: str) -> None:
+        """inserts the triples into the working graph,
+        keeping them aside to be written back to the target store
+
+        :param graph: the graph of triples to insert
+        :type graph: Graph
+        :param name_config: the name of the config
+        :type name_config: str
+        :rtype: None
+        """
+        if graph is None or len(graph) == 0:
+            return super().insert_for_config(graph, name_config)
+        # else
+        with self._pending_lock:
+            pending = self._pending.setdefault(name_config, Graph())
+            pending += graph
+        return super().insert_for_config(graph, name_config)
+
+    def write_back(self) -> int:
+        """writes the triples harvested since the last write back
+        to the target store, in one bulk insert per config
+
+        :returns: the number of triples written back
+        :rtype: int
+        """
+        with self._pending_lock:
+            pending, self._pending = self._pending, dict()
+        count = 0
+        for name_config, graph in pending.items():
+            log.info(f"writing back {len(graph)} triples for {name_config}")
+            self.target.insert_for_config(graph, name_config)
+            count += len(graph)
+        return count